@@ -0,0 +1,343 @@
+from .xlang.lang import XLang
+from .parser import (
+    build_ast,
+    XLangTokenizer,
+    Gather,
+    XLangASTParser,
+    XLangPrattParser,
+)
+from .parser.lexer import XLangLexer
+from .ir.IR import IRExecutor, IRType
+import time
+
+
+def bench(name, code, repeat=5, **kwargs):
+    xlang = XLang()
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        xlang.execute(code, output_printer=lambda *args: None, **kwargs)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    print(f"{name:<32}{best * 1000:10.2f} ms")
+    return best
+
+
+def bench_variants(name, code, variants, repeat=5, iterations=None):
+    """
+    交替执行同一段代码的几种配置，每种配置取最快的一次。variants 为 (标签, execute 的参数) 的列表，
+    依次测量时先测的配置会承担解释器与 CPU 的预热开销，交替执行使各配置的条件相同
+    """
+    xlang = XLang()
+    best = [None] * len(variants)
+    for _ in range(repeat):
+        for i, (_, kwargs) in enumerate(variants):
+            start = time.perf_counter()
+            xlang.execute(code, output_printer=lambda *args: None, **kwargs)
+            elapsed = time.perf_counter() - start
+            if best[i] is None or elapsed < best[i]:
+                best[i] = elapsed
+    for (label, _), elapsed in zip(variants, best):
+        print(f"{f'{name} ({label})':<32}{elapsed * 1000:10.2f} ms")
+        if iterations is not None:
+            print(f"{'  per iteration':<32}{elapsed / iterations * 1e6:10.2f} us")
+    return best
+
+
+def bench_example():
+    with open("examples/example-1.x", "r", encoding="utf-8") as f:
+        code = f.read()
+    bench("examples/example-1.x", code)
+
+
+def bench_while_loop():
+    code = """
+    i := 0;
+    total := 0;
+    while (i < 20000) {
+        total = total + i;
+        i = i + 1;
+    };
+    """
+    bench("while loop (20k)", code)
+
+
+def bench_nested_scopes():
+    code = """
+    i := 0;
+    total := 0;
+    while (i < 5000) {
+        {
+            {
+                if (i % 2 == 0) {
+                    total = total + i;
+                };
+            };
+        };
+        i = i + 1;
+    };
+    """
+    bench("nested scopes (5k)", code)
+
+
+def bench_loop_iteration(iterations=20000):
+    # 循环体与 if 分支都不声明变量，优化后不再为它们新建和弹出帧
+    code = f"""
+    i := 0;
+    total := 0;
+    while (i < {iterations}) {{
+        if (i % 2 == 0) {{
+            total = total + i;
+        }} else {{
+            total = total - 1;
+        }};
+        i = i + 1;
+    }};
+    """
+    bench_variants(
+        "loop iteration",
+        code,
+        [(f"-O {level}", {"optimization_level": level}) for level in (0, 1)],
+        iterations=iterations,
+    )
+
+
+def bench_counting_loop(iterations=20000):
+    # 比较合并超级指令前后每轮循环的耗时
+    code = f"""
+    i := 0;
+    total := 0;
+    while (i < {iterations}) {{
+        total = total + i;
+        i = i + 1;
+    }};
+    """
+    bench_variants(
+        "counting loop",
+        code,
+        [(f"-O {level}", {"optimization_level": level}) for level in (1, 2)],
+        iterations=iterations,
+    )
+
+
+def bench_accessors(iterations=5000):
+    # 通过小的存取函数读写对象的字段，比较内联前后每轮循环的耗时
+    code = f"""
+    point := ("x" : 0, "y" : 0);
+    get_x := (p => null) -> {{ return p.x }};
+    get_y := (p => null) -> {{ return p.y }};
+    set_x := (p => null, v => 0) -> {{ p.x = v }};
+    i := 0;
+    while (i < {iterations}) {{
+        set_x(point, get_x(point) + get_y(point) + 1);
+        i = i + 1;
+    }};
+    """
+    bench_variants(
+        "accessors",
+        code,
+        [(f"-O {level}", {"optimization_level": level}) for level in (2, 3)],
+        iterations=iterations,
+    )
+    functions = XLang().compile(code, optimization_level=3)
+    inlined = sum(
+        instr.ir_type == IRType.INLINE_CALL
+        for instructions in functions.function_instructions.values()
+        for instr in instructions
+    )
+    print(f"{'  inlined calls':<32}{inlined:10d}")
+
+
+def bench_tail_recursion(depth=2000):
+    # 尾递归复用函数帧，帧与栈不再随递归深度增长
+    code = f"""
+    sum := (n => 0, acc => 0) -> {{
+        if (n == 0) {{ return acc }};
+        return sum(n - 1, acc + n);
+    }};
+    sum({depth}, 0);
+    """
+    bench_variants(
+        "tail recursion",
+        code,
+        [(f"-O {level}", {"optimization_level": level}) for level in (0, 2)],
+    )
+
+
+def bench_quickening(iterations=5000):
+    # 运算、成员访问与调用的操作数类型不变，自适应执行将它们特化后比较每轮循环的耗时
+    code = f"""
+    point := ("x" : 0, "y" : 1.5, "z" : 2);
+    scale := (v => 0) -> {{ return v * 2 }};
+    i := 0;
+    total := 0;
+    while (i < {iterations}) {{
+        total = total + point.x + scale(i) + len("abc");
+        point.x = i % 7;
+        i = i + 1;
+    }};
+    """
+    bench_variants(
+        "quickening",
+        code,
+        [(f"adaptive={adaptive}", {"adaptive": adaptive}) for adaptive in (False, True)],
+        iterations=iterations,
+    )
+    executor = IRExecutor(code, output_printer=lambda *args: None)
+    executor.execute(XLang().compile(code))
+    print(f"{'  specialized':<32}{executor.specialized_count:10d}")
+    print(f"{'  deoptimized':<32}{executor.deoptimized_count:10d}")
+
+
+def bench_member_access(fields=20, iterations=3000):
+    # 读取字段较多的对象中靠后的字段与方法，内联缓存命中时不再逐个比较键
+    members = ", ".join(f'"f{i}" : {i}' for i in range(fields - 1))
+    code = f"""
+    obj := ({members}, "get" => () -> {{ return self.f{fields - 2} }});
+    i := 0;
+    total := 0;
+    while (i < {iterations}) {{
+        total = total + obj.f{fields - 2} + obj.get();
+        i = i + 1;
+    }};
+    """
+    best = bench(f"member access ({fields} fields)", code)
+    print(f"{'  per iteration':<32}{best / iterations * 1e6:10.2f} us")
+
+
+def bench_lookup_table(entries=2000, iterations=2000):
+    # 在键很多的元组中按键查找，键索引建立后每次查找不再随元组长度增长
+    members = ", ".join(f'"k{i}" : {i}' for i in range(entries))
+    code = f"""
+    table := ({members});
+    i := 0;
+    total := 0;
+    while (i < {iterations}) {{
+        total = total + table.k{entries - 1} + table.k{entries // 2};
+        i = i + 1;
+    }};
+    """
+    bench(f"lookup table ({entries} keys)", code)
+
+
+def bench_map(entries=20000):
+    # 散列表的插入、查找与删除都不随表的大小增长
+    code = f"""
+    table := map();
+    i := 0;
+    while (i < {entries}) {{
+        table[i] = i * 2;
+        i = i + 1;
+    }};
+    total := 0;
+    i = 0;
+    while (i < {entries}) {{
+        if (has(table, i)) {{ total = total + table[i] }};
+        remove(table, i);
+        i = i + 1;
+    }};
+    """
+    best = bench(f"map insert/lookup/remove ({entries})", code, repeat=3)
+    print(f"{'  per entry':<32}{best / entries * 1e6:10.2f} us")
+
+
+def bench_tuple_equality(size=2000, iterations=200):
+    # 比较大元组时逐个元素直接得到 Python 的布尔值，不再为每个元素创建 Bool
+    items = ", ".join(str(i) for i in range(size))
+    code = f"""
+    left := ({items});
+    right := ({items});
+    i := 0;
+    same := 0;
+    while (i < {iterations}) {{
+        if (left == right) {{ same = same + 1 }};
+        i = i + 1;
+    }};
+    """
+    best = bench(f"tuple equality ({size} items)", code)
+    print(f"{'  per comparison':<32}{best / iterations * 1e6:10.2f} us")
+
+
+def generate_config_script(lines):
+    # 生成类似大型配置脚本的代码，每行一个带嵌套表达式的键值元组
+    code = []
+    for i in range(lines):
+        code.append(
+            f'config_{i} := {{name : "item_{i}", value : {i} * 2 + 1, '
+            f"enabled : {i} % 3 == 0 and not ({i} < 10)}};"
+        )
+    return "\n".join(code)
+
+
+def bench_lex(lines=30000, repeat=3):
+    # 对生成的数MB源码做词法分析
+    code = generate_config_script(lines)
+    lexer = XLangLexer()
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        lexer.tokenize(code)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    size = f"{len(code) / 1024 / 1024:.1f} MB"
+    print(f"{'lexer (' + size + ')':<32}{best * 1000:10.2f} ms")
+
+
+def bench_parse(lines=10000, repeat=3):
+    # 只比较解析阶段，词法分析与 Gather 的结果复用
+    code = generate_config_script(lines)
+    gathered = Gather(XLangTokenizer().parse(code)).gather()
+    for name, parser_class in (
+        ("legacy parser", XLangASTParser),
+        ("precedence parser", XLangPrattParser),
+    ):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parser_class(gathered).parse_without_body()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        print(f"{name + f' ({lines} lines)':<32}{best * 1000:10.2f} ms")
+
+
+def generate_nested_literal(depth, width):
+    # 生成深度嵌套的数据字面量，每层元组带若干键值对
+    code = "0"
+    for level in range(depth):
+        fields = ", ".join(f"key_{level}_{i} : {i}" for i in range(width))
+        code = f"({code}, {fields})"
+    return f"data := {code};"
+
+
+def bench_parse_nested(depth=60, width=20, repeat=5):
+    # 包含词法分析、括号匹配与解析的完整过程
+    code = generate_nested_literal(depth, width)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build_ast(code)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    print(f"{f'nested literal (depth {depth})':<32}{best * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    bench_example()
+    bench_while_loop()
+    bench_nested_scopes()
+    bench_loop_iteration()
+    bench_counting_loop()
+    bench_accessors()
+    bench_tail_recursion()
+    bench_quickening()
+    bench_member_access()
+    bench_lookup_table()
+    bench_map()
+    bench_tuple_equality()
+    bench_lex()
+    bench_parse()
+    bench_parse_nested()
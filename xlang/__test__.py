@@ -1,4 +1,6 @@
 from .xlang.lang import XLang
+from .ir.IR import IRExecutor
+from .parser import build_ast
 import json
 
 def test():
@@ -192,5 +194,457 @@ def test_break_continue():
     print(result)
 
 
+def test_short_circuit_let():
+    # 测试代码：and/or 右侧的变量声明只在右侧被计算时执行
+    code = """
+    // 测试1: and 的左侧为假，右侧的声明不执行，读取外层的 x
+    x := 0;
+    c := false;
+    { c and (x := 1); print(x); };
+
+    // 测试2: and 的左侧为真，右侧的声明执行
+    c = true;
+    { c and (x := 1); print(x); };
+
+    // 测试3: or 的左侧为假，右侧的声明执行
+    f := (c => false) -> { c or (y := 5); return y; };
+    print(f());
+
+    // 测试4: or 的左侧为真，右侧的声明不执行，读取调用者作用域中的 y
+    y := "outer";
+    g := (c => true) -> { c or (y := 5); return y; };
+    print(g());
+    """
+
+    for level in range(4):
+        result = XLang().execute(code, optimization_level=level)
+        print(result)
+
+
+def test_map_keys():
+    # 测试代码：散列表的键区分布尔值与数值，整数与浮点数相等时是同一个键
+    code = """
+    m := map(1 : "int", 2 : "two");
+    m[true] = "bool";
+    m[1.0] = "float";
+    print(len(m), keys(m), values(m));
+    print(m[1], m[true], has(m, true), has(m, false));
+    remove(m, true);
+    print(len(m), keys(m));
+    print(m == map(1.0 : "float", 2 : "two"), map(true : 1) == map(1 : 1));
+    """
+
+    output, result = run_at_all_levels(code)
+    assert output == [
+        '3 [Int(1), Int(2), Bool(true)] [String("float"), String("two"), String("bool")]',
+        "float bool True False",
+        "2 [Int(1), Int(2)]",
+        "True False",
+    ], output
+    print(output)
+
+
+def test_map():
+    # 测试代码：散列表的插入、查找、删除与遍历
+    code = """
+    squares := map();
+    i := 0;
+    while (i < 50) { squares[i] = i * i; i = i + 1; };
+    removed := 0;
+    i = 0;
+    while (i < 50) {
+        if (i % 2 == 1) { removed = removed + remove(squares, i) };
+        i = i + 1;
+    };
+    print(len(squares), removed, has(squares, 4), has(squares, 5), squares[48]);
+
+    ages := map("alice" : 30, bob => 25);
+    ages.carol = 41;
+    ages["alice"] = ages["alice"] + 1;
+    print(keys(ages), values(ages), ages.alice);
+    del(ages, "bob");
+    print(keys(ages), has(ages, "bob"), len(ages));
+
+    // 键在插入时被复制，之后修改变量不影响散列表
+    k := "key";
+    m := map();
+    m[k] = 1;
+    k = "other";
+    print(keys(m), has(m, "key"), has(m, "other"));
+    """
+
+    output, result = run_at_all_levels(code)
+    assert output == [
+        "25 20825 True False 2304",
+        '[String("alice"), String("bob"), String("carol")] [Int(31), Int(25), Int(41)] 31',
+        '[String("alice"), String("carol")] False 2',
+        '[String("key")] True False',
+    ], output
+    print(output)
+
+
+def run_at_all_levels(code):
+    """
+    在 0 到 3 的所有优化级别下、关闭与开启自适应执行时运行 code，
+    断言每次的输出、错误与结果都相同，返回输出的行与结果
+    """
+    runs = []
+    for level in range(4):
+        for adaptive in (False, True):
+            output = []
+            errors = []
+            result = XLang().execute(
+                code,
+                error_printer=lambda *args: errors.append(" ".join(map(str, args))),
+                output_printer=lambda *args: output.append(" ".join(map(str, args))),
+                optimization_level=level,
+                adaptive=adaptive,
+            )
+            assert not errors, f"-O{level} adaptive={adaptive}: {errors}"
+            runs.append(((level, adaptive), output, str(result)))
+    (_, expected_output, expected_result) = runs[0]
+    for options, output, result in runs[1:]:
+        assert output == expected_output, f"{options}: {output} != {expected_output}"
+        assert result == expected_result, f"{options}: {result} != {expected_result}"
+    return expected_output, expected_result
+
+
+def test_key_mutation():
+    # 测试代码：通过 keyof 或别名原地修改键之后，按键查找使用新的键
+    code = """
+    t := ("a" : 1, "b" : 2);
+    print(t.a);
+    (keyof t[0]) = "c";
+    print(t.c);
+
+    // 修改后与后面的键同名时，按键查找返回第一个
+    u := ("a" : 1, "b" : 2);
+    print(u.b);
+    (keyof u[0]) = "b";
+    print(u.b);
+
+    // 键是变量的值时，给变量赋值同样修改了键
+    k := "x";
+    v := (k : 10, "y" : 20);
+    print(v.x);
+    k = "z";
+    print(v.z);
+
+    // 内联缓存已经记录了旧的键
+    i := 0;
+    w := ("p" : 1, "q" : 2);
+    while (i < 20) { w.p = w.p + 1; i = i + 1; };
+    (keyof w[0]) = "r";
+    print(w.r);
+    (keyof w[1]) = "p";
+    print(w.p);
+    """
+
+    output, result = run_at_all_levels(code)
+    assert output == ["1", "1", "2", "1", "10", "10", "21", "2"], output
+    print(output)
+
+
+def test_constant_folding():
+    # 测试代码：常量折叠的结果与逐条执行相同
+    code = """
+    print(1 + 2 * 3, (10 - 4) / 4, 7 % 3, 2 * 3.5, -(2 + 3));
+    print(1 < 2, 2 == 2.0, "a" + "b", "a" == "b", not (1 > 2));
+    print((1 + 2) * (3 + 4) - 5 % 3, 1 + 2 + 3 + 4 + 5);
+    x := 10;
+    print(x * 1, x + 0, 0 + x, x * (2 + 3), (4 - 4) * x);
+    print(if (1 + 1 == 2) "folded" else "not folded");
+    """
+
+    output, result = run_at_all_levels(code)
+    assert output == [
+        "7 1.5 1 7.0 -5",
+        "True True ab False True",
+        "19 15",
+        "10 10 10 50 0",
+        "folded",
+    ], output
+    print(output)
+
+
+def test_dead_code():
+    # 测试代码：return、break 与 continue 之后的代码被删除后，结果不变
+    code = """
+    f := (n => 0) -> {
+        if (n > 0) {
+            return "positive";
+            print("unreachable");
+        };
+        return "other";
+        print("unreachable");
+    };
+    print(f(1), f(-1));
+
+    i := 0;
+    while (true) {
+        i = i + 1;
+        if (i >= 3) {
+            break;
+            print("unreachable");
+        };
+        continue;
+        print("unreachable");
+    };
+    print(i);
+
+    g := () -> {
+        while (true) { return 42; i = 100; };
+        return 0;
+    };
+    print(g(), i);
+    """
+
+    output, result = run_at_all_levels(code)
+    assert output == ["positive other", "3", "42 3"], output
+    print(output)
+
+
+def test_fused_compare_jump():
+    # 测试代码：变量与常量、变量与变量的比较和条件跳转融合后，结果不变
+    code = """
+    i := 0;
+    n := 5;
+    total := 0;
+    while (i < n) {
+        if (i >= 2) { total = total + i * 10 } else { total = total + i };
+        i = i + 1;
+    };
+    print(total, i);
+
+    // 操作数不是数值时走通用的比较
+    s := "a";
+    count := 0;
+    while (s != "aaaa") { s = s + "a"; count = count + 1 };
+    print(s, count);
+
+    // 整数与浮点数的比较
+    x := 0;
+    while (x < 2.5) { x = x + 1 };
+    print(x, if (x == 3.0) "equal" else "different");
+    """
+
+    output, result = run_at_all_levels(code)
+    assert output == ["91 5", "aaaa 3", "3 equal"], output
+    print(output)
+
+
+def test_inline_default_argument():
+    # 测试代码：内联的函数修改默认参数，与调用时一样在之后的调用中保留
+    code = """
+    counter := (count => 0) -> { count = count + 1; return count; };
+    add := (a => 0, b => 10) -> { b = b + a; return b; };
+    i := 0;
+    while (i < 3) { counter(); add(i); i = i + 1; };
+    // add 返回的总是默认参数 b 本身，print 在所有参数求值之后输出它最终的值
+    print(counter(), add(), add(b => 1), add(5));
+
+    // 同名变量中是另一个函数时，不执行内联展开的函数体
+    {
+        counter := (count => 100) -> { return count; };
+        print(counter());
+    };
+
+    // 内联调用的参数直接取自栈顶，与普通调用一样，参数与作为实参的变量是同一个值
+    bump := (x => 0) -> { x = 5; return x; };
+    one := 1;
+    print(bump(one), one, 1);
+    """
+
+    output, result = run_at_all_levels(code)
+    assert output == ["4 16 9 9", "100", "5 5 1"], output
+    functions = XLang().compile(code, optimization_level=3)
+    inline_calls = [
+        instr.value
+        for instr in functions.function_instructions["__main__"]
+        if instr.ir_type.name == "INLINE_CALL"
+    ]
+    assert inline_calls and all(count is not None for _, count, _ in inline_calls), (
+        inline_calls
+    )
+    print(output)
+
+
+def test_tail_call():
+    # 测试代码：深层的尾递归，以及被调用的函数按动态作用域读取调用者的变量
+    code = """
+    sum_to := (n => 0, acc => 0) -> {
+        if (n == 0) { return acc; };
+        return sum_to(n - 1, acc + n);
+    };
+    print(sum_to(3000));
+
+    is_even := (n => 0) -> { if (n == 0) { return true; }; return is_odd(n - 1); };
+    is_odd := (n => 0) -> { if (n == 0) { return false; }; return is_even(n - 1); };
+    print(is_even(1001), is_odd(1001));
+
+    // inner 读取 outer 帧中的 marker，尾调用不能弹出 outer 的帧
+    inner := () -> { return marker; };
+    outer := (n => 0) -> { marker := n * 2; return inner(); };
+    print(outer(21));
+
+    // 参数覆盖了调用者的同名变量时，帧可以复用
+    depth := (n => 0, level => 0) -> {
+        if (n == 0) { return level; };
+        level := n;
+        return depth(n - 1, level + 1);
+    };
+    print(depth(2000));
+    """
+
+    output, result = run_at_all_levels(code)
+    assert output == ["4501500", "False True", "42", "2"], output
+    print(output)
+
+
+def test_deoptimize():
+    # 测试代码：循环中途操作数从整数变为浮点数，特化的指令退回通用形式后结果不变
+    code = """
+    i := 0;
+    total := 0;
+    while (i < 40) {
+        v := if (i < 20) i else i + 0.5;
+        total = total + v * 2;
+        i = i + 1;
+    };
+    print(total);
+
+    point := ("x" : 1, "y" : 2);
+    i = 0;
+    sum := 0;
+    while (i < 30) {
+        p := if (i < 15) point else ("y" : 3, "x" : 4.5);
+        sum = sum + p.x;
+        i = i + 1;
+    };
+    print(sum);
+    """
+
+    output, result = run_at_all_levels(code)
+    assert output == ["1580.0", "82.5"], output
+    executor = IRExecutor(code, output_printer=lambda *args: None)
+    executor.execute(XLang().compile(code))
+    assert executor.specialized_count > 0 and executor.deoptimized_count > 0, (
+        executor.specialized_count,
+        executor.deoptimized_count,
+    )
+    print(output, executor.specialized_count, executor.deoptimized_count)
+
+
+def test_equality_and_hash():
+    # 测试代码：元组与散列表按结构比较，标量按值散列，元组不可散列
+    code = """
+    a := (1, (2, "x"), null, true);
+    b := (1.0, (2, "x"), null, true);
+    print(a == b, a != b, a == (1, (2, "x"), null), (1, 2) == (1, 3));
+    print((1, true) == (1, 1), ("k" : 1, "j" : 2) == ("k" : 1, "j" : 2), () == ());
+    n := 2;
+    print((a => 1, b => n) == (a => 1, b => 2), (a => 1) == ("a" : 1));
+    b[1][1] = "y";
+    print(a == b, map(1 : (1, 2)) == map(1.0 : (1, 2)));
+    """
+
+    output, result = run_at_all_levels(code)
+    assert output == [
+        "True False False False",
+        "False True True",
+        "True False",
+        "False True",
+    ], output
+
+    from .ir.variable import Int, Float, Bool, String, NoneType, Tuple
+
+    assert len({Int(1), Float(1.0), String("1"), Bool(True), NoneType(), NoneType()}) == 4
+    try:
+        hash(Tuple([Int(1)]))
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("Tuple should not be hashable")
+    print(output)
+
+
+def test_shared_values():
+    # 测试代码：共享的 true/false/null 与小整数被赋值、修改后不影响其他位置的同一常量
+    code = """
+    a := 1; b := a; b = 2; print(a, b);
+    c := d := 3; d = 7; print(c, d);
+    e := true; f := e; f = false; print(e, f);
+    counter := (count => 0) -> { count = count + 1; return count; };
+    print(counter(), counter(), counter(), 0, 1);
+    h := (p => true) -> { p = false; return p; };
+    print(h(), h(), true);
+    (1) = 50; print(1);
+    s := 0; k := 0;
+    while (k < 300) { s = s + k; k = k + 1; };
+    print(s, k, 256, 255);
+    big := 1000; big2 := big; big2 = 1; print(big, big2, 1000);
+    cmp := 1 < 2; cmp = false; print(cmp, 1 < 2, true);
+    n := null; print(n == null, null);
+    """
+
+    output, result = run_at_all_levels(code)
+    assert output == [
+        "2 2",
+        "7 7",
+        "False False",
+        "3 3 3 0 1",
+        "False False True",
+        "1",
+        "44850 300 256 255",
+        "1 1 1000",
+        "False True True",
+        "True None",
+    ], output
+    print(output)
+
+
+def test_unicode_escape():
+    # 测试代码：\u 之后不足4个十六进制数字时报错，而不是吃掉之后的引号和代码
+    output, result = run_at_all_levels('print("\\u00e9\\u0041b", \'\\u4e2d\');')
+    assert output == ["éAb 中"], output
+    for code in ('x := "\\u12"; print(1);', 'x := "\\u"; print(1);', "x := '\\uZZ12';"):
+        try:
+            XLang().execute(code, output_printer=lambda *args: None)
+        except Exception as e:
+            assert str(e).startswith("Invalid unicode escape"), e
+        else:
+            raise AssertionError(code)
+    print(output)
+
+
+def test_member_name():
+    # 测试代码：成员名只能是单个标识符，新旧两个解析器都拒绝 a.(b) 这样带括号的成员名
+    for code in ("x := a.b(1).c;", "a.b = a.c;"):
+        assert str(build_ast(code)) == str(build_ast(code, legacy=True)), code
+    for code in ("a.(b);", "x := a.(b) + 1;", "a.b.[c];"):
+        for legacy in (False, True):
+            try:
+                build_ast(code, legacy=legacy)
+            except Exception:
+                continue
+            raise AssertionError((code, legacy))
+    print("member name ok")
+
+
 if __name__ == "__main__":
     test()
+    test_break_continue()
+    test_short_circuit_let()
+    test_map_keys()
+    test_map()
+    test_key_mutation()
+    test_constant_folding()
+    test_dead_code()
+    test_fused_compare_jump()
+    test_inline_default_argument()
+    test_tail_call()
+    test_deoptimize()
+    test_equality_and_hash()
+    test_shared_values()
+    test_unicode_escape()
+    test_member_name()
@@ -14,12 +14,21 @@ from .variable import (
     GetAttr,
     IndexOf,
     BuiltIn,
+    MemberCache,
+    Map,
     Variable,
     Named,
-    Wrap
+    Wrap,
+    NONE,
+    boolean,
+    small_int,
+    owned,
+    SHARED_TYPES,
+    key_mutated,
 )
 
 import json
+import operator
 import textwrap
 
 class IRType(enum.Enum):
@@ -37,36 +46,91 @@ class IRType(enum.Enum):
     UNARY_OP = auto()  # 一元运算符
     LET_VAL = auto()  # 定义变量，参数为变量名
     GET_VAL = auto()  # 获取变量，参数为变量名
+    LET_SLOT = auto()  # 定义变量并写入槽位，参数为 [变量名, 槽位]
+    GET_SLOT = auto()  # 按帧深度和槽位获取变量，参数为 [变量名, 帧深度, 槽位]
     SET_VAL = auto()  # 设置变量，为 栈[-1] = 栈[-2]
     GET_ATTR = auto()  # 获取对象属性
     INDEX_OF = auto()  # 获取元组索引
     KEY_OF = auto()  # 获取键值对的值
     VALUE_OF = auto()  # 获取值
     SELF_OF = auto()  # 获取 self
-    CALL_LAMBDA = auto()  # 调用栈顶对象，参数为参数个数
+    CALL_LAMBDA = auto()  # 调用栈顶对象，参数不为 None 时是可以内联的函数签名，由优化器展开
+    # 尾调用：复用当前函数的帧调用栈顶对象，之后紧跟的 RETURN 只在无法复用时执行
+    TAIL_CALL = auto()
     RETURN = auto()  # 返回栈顶对象
     RETURN_NONE = auto()  # 返回 None
     NEW_FRAME = auto()  # 新建帧
     POP_FRAME = auto()  # 弹出帧
     JUMP_OFFSET = auto()  # 无条件跳转到特定位置
     JUMP_IF_FALSE = auto()  # 如果栈顶为真则跳转
+    JUMP_IF_TRUE = auto()  # 弹出栈顶的 Bool，为真时跳转
     RESET_STACK = auto()  # 重置栈
     COPY_VAL = auto()  # 复制值
     REF_VAL = auto()  # 引用值
     DEREF_VAL = auto()  # 取消引用值
     ASSERT = auto()  # 断言
-    DEBUG_INFO = auto()  # 调试信息
+    DEBUG_INFO = auto()  # 调试信息，仅在生成阶段使用，最终记录到指令的位置表中
     IMPORT = auto()  # 导入IR并执行
 
+    # 超级指令：由优化器合并常见的指令序列得到，执行时不经过中间的压栈与出栈
+    # 变量的帧深度和槽位为 None 时按名字查找（对应 GET_VAL）
+    BINARY_OP_VAR_INT = auto()  # 变量与整数常量的二元运算，参数为 [变量名, 帧深度, 槽位, 整数, 运算符]
+    BINARY_OP_VAR_VAR = auto()  # 两个变量的二元运算，参数为两组 [变量名, 帧深度, 槽位] 与运算符
+    CALL_WITH_ARGS = auto()  # 用栈顶的若干参数构建元组并调用，参数为参数个数
+    # 比较并在结果为假时跳转，参数的最后两项为运算符和相对偏移
+    COMPARE_JUMP_IF_FALSE = auto()  # 比较栈顶的两个值，参数为 [运算符, 偏移]
+    COMPARE_VAR_INT_JUMP_IF_FALSE = auto()  # 比较变量与整数常量，参数同 BINARY_OP_VAR_INT 加偏移
+    COMPARE_VAR_VAR_JUMP_IF_FALSE = auto()  # 比较两个变量，参数同 BINARY_OP_VAR_VAR 加偏移
+    # 内联调用：函数体直接展开在调用处，偏移指向展开的函数体之后
+    # 调用栈顶对象，参数为 [函数签名, 参数个数, 偏移]，对象不是该函数时跳过函数体正常调用。
+    # 参数个数为 None 时参数是栈顶的元组，否则是栈顶的若干值（同 CALL_WITH_ARGS）
+    INLINE_CALL = auto()
+    RETURN_INLINE = auto()  # 从展开的函数体返回栈顶对象，参数为偏移
+
     REDIRECT_JUMP = auto()  # 重定向跳转
     REDIRECT_JUMP_IF_FALSE = auto()  # 重定向跳转
+    REDIRECT_JUMP_IF_TRUE = auto()  # 重定向跳转
     REDIRECT_LABEL = auto()  # 重定向标签
 
 
+# 比较并跳转的指令，相对偏移是参数列表的最后一项
+COMPARE_JUMP_TYPES = (
+    IRType.COMPARE_JUMP_IF_FALSE,
+    IRType.COMPARE_VAR_INT_JUMP_IF_FALSE,
+    IRType.COMPARE_VAR_VAR_JUMP_IF_FALSE,
+)
+
+# 带相对偏移的跳转指令，偏移通过 jump_offset 与 set_jump_offset 读写
+JUMP_TYPES = (
+    IRType.JUMP_OFFSET,
+    IRType.JUMP_IF_FALSE,
+    IRType.JUMP_IF_TRUE,
+    IRType.INLINE_CALL,
+    IRType.RETURN_INLINE,
+) + COMPARE_JUMP_TYPES
+
+# 相对偏移是参数列表最后一项的跳转指令
+LIST_JUMP_TYPES = COMPARE_JUMP_TYPES + (IRType.INLINE_CALL,)
+
+
+def jump_offset(instr):
+    if instr.ir_type in LIST_JUMP_TYPES:
+        return instr.value[-1]
+    return instr.value
+
+
+def set_jump_offset(instr, offset):
+    if instr.ir_type in LIST_JUMP_TYPES:
+        instr.value[-1] = offset
+    else:
+        instr.value = offset
+
+
 class IR:
-    def __init__(self, ir_type, value=None):
+    def __init__(self, ir_type, value=None, position=None):
         self.ir_type = ir_type
         self.value = value
+        self.position = position  # 对应的源代码位置，只在报错时查询
 
     def __str__(self):
         if self.value is None:
@@ -77,6 +141,28 @@ class IR:
         return str(self)
 
 
+class Code:
+    # 函数的代码对象：函数自己的指令列表，入口为第一条指令。
+    # functions 是同一编译单元中签名到代码对象的映射，LOAD_LAMBDA 通过它找到函数；
+    # handlers 是 executor 链接得到的处理函数表，换了执行器时重新链接；
+    # caches 与指令一一对应，GET_ATTR 的位置是它的内联缓存，其余为 None
+    __slots__ = ("name", "instructions", "functions", "handlers", "caches", "executor")
+
+    def __init__(self, name, instructions, functions):
+        self.name = name
+        self.instructions = instructions
+        self.functions = functions
+        self.handlers = None
+        self.caches = None
+        self.executor = None
+
+    def __str__(self):
+        return f"Code({self.name}, {len(self.instructions)} instructions)"
+
+    def __repr__(self):
+        return str(self)
+
+
 class Functions:
     def __init__(self):
         self.function_instructions = {}
@@ -84,14 +170,15 @@ class Functions:
     def add(self, name, func):
         self.function_instructions[name] = func
 
-    def build_instructions(self):
-        func_ips = {}
-        instructions = []
-        for name, instruction in self.function_instructions.items():
-            func_ips[name] = len(instructions)
-            instructions.extend(instruction)
+    def build_codes(self):
+        """为每个函数建立代码对象，返回签名 -> 代码对象"""
+        codes = {}
+        for name, instructions in self.function_instructions.items():
+            codes[name] = Code(name, instructions, codes)
+        return codes
 
-        return instructions, func_ips
+    def instruction_count(self):
+        return sum(len(v) for v in self.function_instructions.values())
 
     def __str__(self):
         formatted = ""
@@ -107,18 +194,237 @@ class Functions:
     def export_to_dict(self):
         json_data = {}
         for name, instructions in self.function_instructions.items():
-            json_data[name] = []
-            for instr in instructions:
-                json_data[name].append({instr.ir_type.name: instr.value})
+            json_data[name] = {
+                "instructions": [
+                    {instr.ir_type.name: instr.value} for instr in instructions
+                ],
+                "positions": encode_positions(instructions),
+            }
         return json_data
 
     def import_from_dict(self, json_data):
         self.function_instructions = {}
-        for name, instructions in json_data.items():
-            self.function_instructions[name] = []
-            for instr in instructions:
-                for ir_type, value in instr.items():
-                    self.function_instructions[name].append(IR(IRType[ir_type], value))
+        for name, function in json_data.items():
+            if isinstance(function, dict):
+                instructions = []
+                for instr in function["instructions"]:
+                    for ir_type, value in instr.items():
+                        instructions.append(IR(IRType[ir_type], value))
+                decode_positions(instructions, function.get("positions", []))
+            else:
+                # 旧格式：DEBUG_INFO 内联在指令流中
+                instructions = []
+                for instr in function:
+                    for ir_type, value in instr.items():
+                        instructions.append(IR(IRType[ir_type], value))
+                instructions = strip_debug_info(instructions)
+            self.function_instructions[name] = instructions
+
+
+def encode_positions(instructions):
+    """将指令的源代码位置压缩为 [起始ip, 位置] 的列表，位置不变的连续指令只记录一次"""
+    table = []
+    last_position = None
+    for ip, instr in enumerate(instructions):
+        if instr.position != last_position:
+            table.append([ip, instr.position])
+            last_position = instr.position
+    return table
+
+
+def decode_positions(instructions, table):
+    """根据位置表恢复每条指令的源代码位置"""
+    for index, (start, position) in enumerate(table):
+        end = table[index + 1][0] if index + 1 < len(table) else len(instructions)
+        for ip in range(start, min(end, len(instructions))):
+            instructions[ip].position = position
+
+
+def strip_debug_info(instructions):
+    """移除内联的 DEBUG_INFO 指令，将位置记录到后续指令上，并修正跳转偏移"""
+    kept = []
+    new_index = []  # 旧ip -> 新ip，被移除的指令映射到其后第一条保留的指令
+    position = None
+    for instr in instructions:
+        new_index.append(len(kept))
+        if instr.ir_type == IRType.DEBUG_INFO:
+            if instr.value and instr.value.get("code_position") is not None:
+                position = instr.value["code_position"]
+            continue
+        if instr.position is None:
+            instr.position = position
+        kept.append(instr)
+    new_index.append(len(kept))
+
+    for old_ip, instr in enumerate(instructions):
+        if instr.ir_type in JUMP_TYPES:
+            target = new_index[old_ip + 1 + jump_offset(instr)]
+            set_jump_offset(instr, target - new_index[old_ip] - 1)
+    return kept
+
+
+# 运算符 -> 运算函数，执行器在链接时按运算符绑定，运行时不再比较字符串
+BINARY_OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "%": operator.mod,
+    "and": lambda left, right: boolean(left and right),
+    "or": lambda left, right: boolean(left or right),
+}
+
+# 可以与条件跳转合并的比较运算符，两侧都是 Int 或 Float 时直接比较 Python 数值
+COMPARISON_OPERATORS = ("==", "!=", "<", "<=", ">", ">=")
+NUMBER_TYPES = (Int, Float)
+
+UNARY_OPERATORS = {
+    "-": operator.neg,
+    "not": lambda value: boolean(not value),
+}
+
+# 自适应执行：指令执行 QUICKEN_THRESHOLD 次后按操作数的类型改写为特化的处理函数，
+# 特化失败或退回通用形式后等待的次数每次翻倍，最多 QUICKEN_MAX_BACKOFF 次
+QUICKEN_THRESHOLD = 8
+QUICKEN_MAX_BACKOFF = 1024
+
+BINARY_OPERATOR_NAMES = {
+    "+": "ADD",
+    "-": "SUBTRACT",
+    "*": "MULTIPLY",
+    "/": "DIVIDE",
+    "%": "MODULO",
+    "==": "EQUAL",
+    "!=": "NOT_EQUAL",
+    "<": "LESS",
+    "<=": "LESS_EQUAL",
+    ">": "GREATER",
+    ">=": "GREATER_EQUAL",
+}
+
+
+def build_specialized_binary_operators():
+    """
+    (运算符, 左操作数类型, 右操作数类型) -> (特化形式的名字, 结果类型, 运算函数)
+
+    运算函数直接作用于两个操作数的 Python 值，只收录结果与 Int、Float、String
+    的运算方法完全一致的组合
+    """
+    forms = {}
+
+    def add(op, left_type, right_type, result_type):
+        name = (
+            f"BINARY_{BINARY_OPERATOR_NAMES[op]}_"
+            f"{left_type.__name__.upper()}_{right_type.__name__.upper()}"
+        )
+        forms[(op, left_type, right_type)] = (name, result_type, BINARY_OPERATORS[op])
+
+    for left_type, right_type in ((Int, Int), (Int, Float), (Float, Int), (Float, Float)):
+        number_type = Int if left_type is Int and right_type is Int else Float
+        for op in ("+", "-", "*"):
+            add(op, left_type, right_type, number_type)
+        add("/", left_type, right_type, Float)
+        for op in COMPARISON_OPERATORS:
+            add(op, left_type, right_type, Bool)
+    # Int 只能对 Int 取模
+    add("%", Int, Int, Int)
+    add("%", Float, Int, Float)
+    add("%", Float, Float, Float)
+    add("+", String, String, String)
+    add("==", String, String, Bool)
+    add("!=", String, String, Bool)
+    return forms
+
+
+SPECIALIZED_BINARY_OPERATORS = build_specialized_binary_operators()
+
+# 特化运算的结果类型 -> 由 Python 值构造结果的函数，Int 与 Bool 的结果使用共享的实例
+RESULT_CONSTRUCTORS = {Int: small_int, Bool: boolean}
+
+# 只压入常量的指令，不会改变任何变量
+CONSTANT_LOAD_TYPES = (
+    IRType.LOAD_NONE,
+    IRType.LOAD_INT,
+    IRType.LOAD_FLOAT,
+    IRType.LOAD_BOOL,
+    IRType.LOAD_STRING,
+)
+
+
+def consumed_operand_count(instr):
+    """指令弹出后立即取值（object_ref）的栈顶操作数的个数"""
+    ir_type = instr.ir_type
+    if ir_type in (
+        IRType.BINARAY_OP,
+        IRType.BUILD_KEY_VAL,
+        IRType.CALL_LAMBDA,
+        IRType.TAIL_CALL,
+        IRType.COMPARE_JUMP_IF_FALSE,
+    ):
+        return 2
+    if ir_type in (
+        IRType.UNARY_OP,
+        IRType.GET_ATTR,
+        IRType.INDEX_OF,
+        IRType.JUMP_IF_FALSE,
+        IRType.JUMP_IF_TRUE,
+        IRType.COPY_VAL,
+        IRType.DEREF_VAL,
+        IRType.BUILD_WRAP,
+        IRType.LOAD_LAMBDA,
+        IRType.KEY_OF,
+        IRType.VALUE_OF,
+        IRType.SELF_OF,
+        IRType.ASSERT,
+    ):
+        return 1
+    if ir_type == IRType.BUILD_TUPLE:
+        return instr.value
+    if ir_type == IRType.CALL_WITH_ARGS:
+        return instr.value + 1
+    if ir_type == IRType.INLINE_CALL:
+        count = instr.value[1]
+        return 2 if count is None else count + 1
+    return 0
+
+
+def consumed_immediately(instructions, ip):
+    """
+    ip 处指令压入的值是否在之后第一条不是常量加载的指令中就被取值
+
+    GET_ATTR 与 INDEX_OF 压入的是惰性求值的引用，只有在求值之前不会有变量被修改时，
+    才可以在压入时直接求值
+    """
+    skipped = 0
+    for next_ip in range(ip + 1, len(instructions)):
+        instr = instructions[next_ip]
+        if instr.ir_type in CONSTANT_LOAD_TYPES:
+            skipped += 1
+            continue
+        return consumed_operand_count(instr) > skipped
+    return False
+
+
+def binary_operation(op, left, right):
+    """计算二元运算，执行器与编译期的常量折叠共用，保证两者语义一致"""
+    function = BINARY_OPERATORS.get(op)
+    if function is None:
+        raise ValueError(f"Unknown binary operator: {op}")
+    return function(left, right)
+
+
+def unary_operation(op, value):
+    """计算一元运算"""
+    function = UNARY_OPERATORS.get(op)
+    if function is None:
+        raise ValueError(f"Unknown unary operator: {op}")
+    return function(value)
 
 
 def create_builtins(context, output_printer=print, input_reader=input):
@@ -134,12 +440,14 @@ def create_builtins(context, output_printer=print, input_reader=input):
     def len_func(args):
         obj = args[0]
         if isinstance(obj, Tuple):
-            return Int(len(obj.value))
+            return small_int(len(obj.value))
         elif isinstance(obj, String):
-            return Int(len(obj.value))
+            return small_int(len(obj.value))
+        elif isinstance(obj, Map):
+            return small_int(len(obj.value))
         else:
             raise ValueError(
-                f"len function's argument must be Tuple or String, but got {obj}"
+                f"len function's argument must be Tuple, String or Map, but got {obj}"
             )
 
     def type_func(args):
@@ -160,7 +468,7 @@ def create_builtins(context, output_printer=print, input_reader=input):
 
     def bool_func(args):
         obj = args[0]
-        return Bool(bool(obj.value))
+        return boolean(obj.value)
 
     def range_func(args):
         start = args[0]
@@ -173,11 +481,16 @@ def create_builtins(context, output_printer=print, input_reader=input):
         key = args[1]
         if isinstance(value, Tuple):
             value.value.pop(key.value)
+            value.invalidate_layout()
         elif isinstance(value, String):
             value.value = value.value[: key.value] + value.value[key.value + 1 :]
+            if value.used_as_key:
+                key_mutated()
+        elif isinstance(value, Map):
+            value.remove(key)
         else:
             raise ValueError(
-                f"Delete function's first argument must be Tuple or String, but got {value}"
+                f"Delete function's first argument must be Tuple, String or Map, but got {value}"
             )
         return NoneType()
 
@@ -197,6 +510,7 @@ def create_builtins(context, output_printer=print, input_reader=input):
                         f"Index out of range: {key.value}/{len(value.value)}"
                     )
                 value.value[key.value] = new_value
+                value.invalidate_layout()
             elif isinstance(value, String):
                 if key.value < 0 or key.value >= len(value.value):
                     raise ValueError(
@@ -207,6 +521,8 @@ def create_builtins(context, output_printer=print, input_reader=input):
                     + new_value.value
                     + value.value[key.value + 1 :]
                 )
+                if value.used_as_key:
+                    key_mutated()
             else:
                 raise ValueError(
                     f"Replace function's first argument must be Tuple or String, but got {value}"
@@ -219,6 +535,7 @@ def create_builtins(context, output_printer=print, input_reader=input):
             for i, v in enumerate(value.value):
                 if isinstance(v, KeyValue) and v.key == key:
                     value.value[i] = KeyValue(key, new_value)
+                    value.invalidate_layout()
                     return NoneType()
         else:
             raise ValueError(
@@ -304,6 +621,38 @@ def create_builtins(context, output_printer=print, input_reader=input):
     def repr_func(args):
         return String(repr(args[0]))
 
+    def map_func(args):
+        # map("a" : 1, b => 2) 或 map(元组)，元组中的键值对与具名参数成为散列表的项
+        if len(args) == 1 and isinstance(args[0], Tuple):
+            args = args[0].value
+        result = Map()
+        for arg in args:
+            if not isinstance(arg, (KeyValue, Named)):
+                raise ValueError(
+                    f"map function's arguments must be KeyValue or Named, but got {arg}"
+                )
+            result.set_member(arg.key.object_ref(), arg.value.object_ref())
+        return result
+
+    def check_map(name, obj):
+        if not isinstance(obj, Map):
+            raise ValueError(
+                f"{name} function's first argument must be Map, but got {obj}"
+            )
+        return obj
+
+    def keys_func(args):
+        return check_map("keys", args[0]).keys()
+
+    def values_func(args):
+        return check_map("values", args[0]).values()
+
+    def has_func(args):
+        return boolean(args[1] in check_map("has", args[0]))
+
+    def remove_func(args):
+        return check_map("remove", args[0]).remove(args[1])
+
     context.let("print", BuiltIn(print_func))
     context.let("input", BuiltIn(input_func))
     context.let("len", BuiltIn(len_func))
@@ -320,22 +669,119 @@ def create_builtins(context, output_printer=print, input_reader=input):
     context.let("min", BuiltIn(min_func))
     context.let("slice", BuiltIn(slice_func))
     context.let("repr", BuiltIn(repr_func))
+    context.let("map", BuiltIn(map_func))
+    context.let("keys", BuiltIn(keys_func))
+    context.let("values", BuiltIn(values_func))
+    context.let("has", BuiltIn(has_func))
+    context.let("remove", BuiltIn(remove_func))
 
 
 class IRExecutor:
-    def __init__(self, origin_code=None, error_printer = print, output_printer=print, input_reader=input, should_stop_func=None, open_func=open):
+    def __init__(self, origin_code=None, error_printer = print, output_printer=print, input_reader=input, should_stop_func=None, open_func=open, adaptive=True):
         self.stack = []
         self.context = Context()
         self.ip = 0  # 指令指针
-        self.instructions = [] # 使用列表存储多个ir，用于支持 import
-        self.func_ips = []
+        self.code = None  # 正在执行的代码对象
         self.origin_code = origin_code
-        self.debug_info = None
         self.error_printer = error_printer
         self.output_printer = output_printer
         self.input_reader = input_reader
         self.check_should_stop = should_stop_func
         self.open = open_func
+        # adaptive 为 True 时按运行时的操作数类型特化指令，
+        # 两个计数器分别记录特化与退回通用形式的次数
+        self.adaptive = adaptive
+        self.specialized_count = 0
+        self.deoptimized_count = 0
+        self.dispatch_table = {
+            IRType.LOAD_NONE: self.execute_load_none,
+            IRType.LOAD_INT: self.execute_load_int,
+            IRType.LOAD_FLOAT: self.execute_load_float,
+            IRType.LOAD_BOOL: self.execute_load_bool,
+            IRType.LOAD_STRING: self.execute_load_string,
+            IRType.LOAD_LAMBDA: self.execute_load_lambda,
+            IRType.BUILD_TUPLE: self.execute_build_tuple,
+            IRType.BUILD_KEY_VAL: self.execute_build_key_val,
+            IRType.BUILD_NAMED: self.execute_build_named,
+            IRType.BUILD_WRAP: self.execute_build_wrap,
+            IRType.BINARAY_OP: self.execute_binary_op,
+            IRType.UNARY_OP: self.execute_unary_op,
+            IRType.LET_VAL: self.execute_let_val,
+            IRType.GET_VAL: self.execute_get_val,
+            IRType.LET_SLOT: self.execute_let_slot,
+            IRType.GET_SLOT: self.execute_get_slot,
+            IRType.SET_VAL: self.execute_set_val,
+            IRType.GET_ATTR: self.execute_get_attr,
+            IRType.INDEX_OF: self.execute_index_of,
+            IRType.KEY_OF: self.execute_key_of,
+            IRType.VALUE_OF: self.execute_value_of,
+            IRType.SELF_OF: self.execute_self_of,
+            IRType.CALL_LAMBDA: self.execute_call_lambda,
+            IRType.TAIL_CALL: self.execute_tail_call,
+            IRType.RETURN: self.execute_return,
+            IRType.RETURN_NONE: self.execute_return,
+            IRType.NEW_FRAME: self.execute_new_frame,
+            IRType.POP_FRAME: self.execute_pop_frame,
+            IRType.JUMP_OFFSET: self.execute_jump_offset,
+            IRType.JUMP_IF_FALSE: self.execute_jump_if_false,
+            IRType.JUMP_IF_TRUE: self.execute_jump_if_true,
+            IRType.RESET_STACK: self.execute_reset_stack,
+            IRType.COPY_VAL: self.execute_copy_val,
+            IRType.REF_VAL: self.execute_ref_val,
+            IRType.DEREF_VAL: self.execute_deref_val,
+            IRType.ASSERT: self.execute_assert,
+            IRType.IMPORT: self.execute_import,
+            IRType.BINARY_OP_VAR_INT: self.execute_binary_op_var_int,
+            IRType.BINARY_OP_VAR_VAR: self.execute_binary_op_var_var,
+            IRType.CALL_WITH_ARGS: self.execute_call_with_args,
+            IRType.COMPARE_JUMP_IF_FALSE: self.execute_compare_jump_if_false,
+            IRType.COMPARE_VAR_INT_JUMP_IF_FALSE: self.execute_compare_var_int_jump_if_false,
+            IRType.COMPARE_VAR_VAR_JUMP_IF_FALSE: self.execute_compare_var_var_jump_if_false,
+            IRType.INLINE_CALL: self.execute_inline_call,
+            IRType.RETURN_INLINE: self.execute_return_inline,
+        }
+        # 带运算符的指令在链接时直接绑定到对应运算符的处理函数，
+        # 未知的运算符使用 dispatch_table 中的通用处理函数，在执行时报错
+        self.operator_handlers = {
+            IRType.BINARAY_OP: {
+                op: self.make_binary_op_handler(function)
+                for op, function in BINARY_OPERATORS.items()
+            },
+            IRType.UNARY_OP: {
+                op: self.make_unary_op_handler(function)
+                for op, function in UNARY_OPERATORS.items()
+            },
+            IRType.BINARY_OP_VAR_INT: {
+                op: self.make_binary_op_var_int_handler(function)
+                for op, function in BINARY_OPERATORS.items()
+            },
+            IRType.BINARY_OP_VAR_VAR: {
+                op: self.make_binary_op_var_var_handler(function)
+                for op, function in BINARY_OPERATORS.items()
+            },
+            IRType.COMPARE_JUMP_IF_FALSE: {
+                op: self.make_compare_jump_handler(BINARY_OPERATORS[op])
+                for op in COMPARISON_OPERATORS
+            },
+            IRType.COMPARE_VAR_INT_JUMP_IF_FALSE: {
+                op: self.make_compare_var_int_jump_handler(BINARY_OPERATORS[op])
+                for op in COMPARISON_OPERATORS
+            },
+            IRType.COMPARE_VAR_VAR_JUMP_IF_FALSE: {
+                op: self.make_compare_var_var_jump_handler(BINARY_OPERATORS[op])
+                for op in COMPARISON_OPERATORS
+            },
+        }
+        # 可以特化的指令 -> 根据当前操作数生成特化处理函数的函数
+        self.specializers = {
+            IRType.BINARAY_OP: self.specialize_binary_op,
+            IRType.BINARY_OP_VAR_INT: self.specialize_binary_op_var_int,
+            IRType.BINARY_OP_VAR_VAR: self.specialize_binary_op_var_var,
+            IRType.GET_ATTR: self.specialize_get_attr,
+            IRType.INDEX_OF: self.specialize_index_of,
+            IRType.CALL_LAMBDA: self.specialize_call_lambda,
+            IRType.CALL_WITH_ARGS: self.specialize_call_with_args,
+        }
 
     def calculate_line_column(self, code_position):
         lines = self.origin_code.split("\n")
@@ -352,8 +798,7 @@ class IRExecutor:
 
         return line, column
 
-    def print_debug_info(self):
-        code_positon = self.debug_info["code_position"]
+    def print_debug_info(self, code_positon):
 
         line, column = self.calculate_line_column(code_positon)
         lines = self.origin_code.split("\n")
@@ -380,25 +825,27 @@ class IRExecutor:
 
     def execute(self, functions, entry="__main__"):
 
-        lambda_ir, lambda_ir_table = functions.build_instructions()
-        self.instructions.append(lambda_ir)
-        self.func_ips.append(lambda_ir_table)
-        self.ip = self.func_ips[-1][entry]
-        self.stack.append((0, True))  # 保存当前ip和是否是新ir
+        self.enter_code(functions.build_codes()[entry])
 
-        self.context.new_frame(
+        frame = self.context.new_frame(
             self.stack, enter_func=True, funciton_code_position=0, hidden=True
         )
+        # 入口返回后没有要执行的代码，执行结束
+        frame.return_ip = 0
+        frame.return_code = None
         create_builtins(self.context, self.output_printer, self.input_reader)
 
         result = NoneType()
 
         try:
-            while len(self.instructions) > 0 and self.ip < len(self.instructions[-1]):
-                instr = self.instructions[-1][self.ip]
-                self.execute_instruction(instr)
+            instr = None
+            should_stop = self.check_should_stop
+            while self.code is not None and self.ip < len(self.code.instructions):
+                code = self.code
+                instr = code.instructions[self.ip]
+                code.handlers[self.ip](instr)
                 self.ip += 1
-                if self.check_should_stop is not None and self.check_should_stop():
+                if should_stop is not None and should_stop():
                     raise ValueError("Cancelled due to should_stop_func")
             if len(self.stack) == 0:
                 raise ValueError("No return value")
@@ -407,8 +854,9 @@ class IRExecutor:
             self.error_printer(f"# Error: {e}\n")
             self.error_printer(f"# ip: {self.ip}, ir: {instr}\n")
 
-            if self.origin_code is not None and self.debug_info is not None:
-                self.print_debug_info()
+            position = instr.position if instr is not None else None
+            if self.origin_code is not None and position is not None:
+                self.print_debug_info(position)
 
             error, code_positions = self.context.format_stack_and_frames(self.stack)
             self.error_printer(error)
@@ -431,21 +879,20 @@ class IRExecutor:
     def execute_with_provided_context(self, functions, entry="__main__", context=None, stack=None):
         self.context = context
         self.stack = stack
-        lambda_ir, lambda_ir_table = functions.build_instructions()
-        self.instructions.append(lambda_ir)
-        self.func_ips.append(lambda_ir_table)
-        self.ip = self.func_ips[-1][entry]
-        self.stack.append((0, True))  # 保存当前ip和是否是新ir
+        self.enter_code(functions.build_codes()[entry])
 
         current_frame_size = self.context.sizeof()
 
         result = NoneType()
         try:
-            while len(self.instructions[-1]) > 0 and self.ip < len(self.instructions[-1]):
-                instr = self.instructions[-1][self.ip]
-                self.execute_instruction(instr)
+            instr = None
+            should_stop = self.check_should_stop
+            while self.code is not None and self.ip < len(self.code.instructions):
+                code = self.code
+                instr = code.instructions[self.ip]
+                code.handlers[self.ip](instr)
                 self.ip += 1
-                if self.check_should_stop is not None and self.check_should_stop():
+                if should_stop is not None and should_stop():
                     raise ValueError("Cancelled due to should_stop_func")
             if len(self.stack) == 0:
                 raise ValueError("No return value")
@@ -454,8 +901,9 @@ class IRExecutor:
             self.error_printer(f"# Error: {e}\n")
             self.error_printer(f"# ip: {self.ip}, ir: {instr}\n")
 
-            if self.origin_code is not None and self.debug_info is not None:
-                self.print_debug_info()
+            position = instr.position if instr is not None else None
+            if self.origin_code is not None and position is not None:
+                self.print_debug_info(position)
 
             error, code_positions = self.context.format_stack_and_frames(self.stack)
             self.error_printer(error)
@@ -498,280 +946,790 @@ class IRExecutor:
             self.context.pop_frame(self.stack, exit_func=True)
             return result
 
-    def execute_instruction(self, instr):
-        if instr.ir_type == IRType.LOAD_INT:
-            self.stack.append(Int(instr.value))
-
-        elif instr.ir_type == IRType.LOAD_FLOAT:
-            self.stack.append(Float(instr.value))
-
-        elif instr.ir_type == IRType.LOAD_BOOL:
-            self.stack.append(Bool(instr.value))
-
-        elif instr.ir_type == IRType.LOAD_STRING:
-            self.stack.append(String(instr.value))
-
-        elif instr.ir_type == IRType.LOAD_NONE:
-            self.stack.append(NoneType())
-
-        elif instr.ir_type == IRType.LOAD_LAMBDA:
-            default_args = (
-                self.stack.pop().object_ref()
-            )  # 获取默认参数，这里是一个tuple
-            self.stack.append(Lambda(instr.value[1], default_args, instr.value[0], self.func_ips[-1], self.instructions[-1]))
-
-        elif instr.ir_type == IRType.BUILD_TUPLE:
-            count = instr.value
-            values = []
-            for _ in range(count):
-                values.insert(0, self.stack.pop().object_ref())
-            self.stack.append(Tuple(values))
-
-        elif instr.ir_type == IRType.BUILD_KEY_VAL:
-            value = self.stack.pop().object_ref()
-            key = self.stack.pop().object_ref()
-            self.stack.append(KeyValue(key, value))
-
-        elif instr.ir_type == IRType.BUILD_WRAP:
-            value = self.stack.pop().object_ref()
-            self.stack.append(Wrap(value))
-
-        elif instr.ir_type == IRType.BINARAY_OP:
-            right = self.stack.pop().object_ref()
-            left = self.stack.pop().object_ref()
-            op = instr.value
-
-            if op == "+":
-                self.stack.append(left + right)
-            elif op == "-":
-                self.stack.append(left - right)
-            elif op == "*":
-                self.stack.append(left * right)
-            elif op == "/":
-                self.stack.append(left / right)
-            elif op == "==":
-                self.stack.append(left == right)
-            elif op == "!=":
-                self.stack.append(left != right)
-            elif op == "<":
-                self.stack.append(left < right)
-            elif op == "<=":
-                self.stack.append(left <= right)
-            elif op == ">":
-                self.stack.append(left > right)
-            elif op == ">=":
-                self.stack.append(left >= right)
-            elif op == "%":
-                self.stack.append(left % right)
-            elif op == "and":
-                self.stack.append(Bool(left and right))
-            elif op == "or":
-                self.stack.append(Bool(left or right))
+    def link(self, code):
+        """将代码对象的指令链接为处理函数表，每个代码对象在同一执行器中只解析一次"""
+        code.handlers = [self.link_handler(instr) for instr in code.instructions]
+        code.caches = [
+            MemberCache() if instr.ir_type == IRType.GET_ATTR else None
+            for instr in code.instructions
+        ]
+        if self.adaptive:
+            for ip, instr in enumerate(code.instructions):
+                if self.can_specialize(code, ip):
+                    code.handlers[ip] = self.make_adaptive_handler(
+                        code, ip, code.handlers[ip]
+                    )
+        code.executor = self
+
+    def link_handler(self, instr):
+        operator_handlers = self.operator_handlers.get(instr.ir_type)
+        if operator_handlers is not None:
+            # BINARAY_OP 与 UNARY_OP 的参数就是运算符，超级指令的运算符在参数的最后，
+            # 比较并跳转的指令的运算符在偏移之前
+            if isinstance(instr.value, str):
+                op = instr.value
+            elif instr.ir_type in COMPARE_JUMP_TYPES:
+                op = instr.value[-2]
             else:
-                raise ValueError(f"Unknown binary operator: {op}")
+                op = instr.value[-1]
+            handler = operator_handlers.get(op)
+            if handler is not None:
+                return handler
+        return self.dispatch_table.get(instr.ir_type, self.execute_unknown)
+
+    def can_specialize(self, code, ip):
+        instr = code.instructions[ip]
+        if instr.ir_type not in self.specializers:
+            return False
+        if instr.ir_type in self.operator_handlers:
+            op = instr.value if isinstance(instr.value, str) else instr.value[-1]
+            return op in BINARY_OPERATOR_NAMES
+        # GET_ATTR 与 INDEX_OF 只在结果被立即取值时特化，其余的不包装，避免每次执行都经过自适应的处理函数
+        if instr.ir_type in (IRType.GET_ATTR, IRType.INDEX_OF):
+            return consumed_immediately(code.instructions, ip)
+        return True
+
+    def make_adaptive_handler(self, code, ip, generic):
+        """
+        自适应执行的指令：执行 QUICKEN_THRESHOLD 次后按当时操作数的类型改写 code.handlers[ip]
+        为特化的处理函数。特化的处理函数只做廉价的类型检查，检查失败时调用 deoptimize
+        退回通用的处理函数，之后等待更多次再重新特化
+        """
+        specialize = self.specializers[code.instructions[ip].ir_type]
+        countdown = QUICKEN_THRESHOLD
+        backoff = QUICKEN_THRESHOLD
+
+        def deoptimize():
+            nonlocal countdown, backoff
+            backoff = min(backoff * 2, QUICKEN_MAX_BACKOFF)
+            countdown = backoff
+            code.handlers[ip] = execute_adaptive
+            self.deoptimized_count += 1
+
+        def execute_adaptive(instr):
+            nonlocal countdown, backoff
+            countdown -= 1
+            if countdown > 0:
+                generic(instr)
+                return
+            specialized = specialize(code, ip, instr, generic, deoptimize)
+            if specialized is None:
+                backoff = min(backoff * 2, QUICKEN_MAX_BACKOFF)
+                countdown = backoff
+                generic(instr)
+                return
+            code.handlers[ip] = specialized
+            self.specialized_count += 1
+            specialized(instr)
+
+        return execute_adaptive
+
+    def binary_form(self, op, left, right):
+        """
+        特化的二元运算的 (名字, 运算函数, 由 Python 值构造结果的函数, 左操作数类型, 右操作数类型)，
+        特化的处理函数直接读取操作数，类型与特化时相同时对 Python 值运算，否则退回通用形式
+        """
+        form = SPECIALIZED_BINARY_OPERATORS.get((op, type(left), type(right)))
+        if form is None:
+            return None
+        name, result_type, function = form
+        make_result = RESULT_CONSTRUCTORS.get(result_type, result_type)
+        return name, function, make_result, type(left), type(right)
+
+    def specialize_binary_op(self, code, ip, instr, generic, deoptimize):
+        if len(self.stack) < 2:
+            return None
+        form = self.binary_form(
+            instr.value, self.stack[-2].object_ref(), self.stack[-1].object_ref()
+        )
+        if form is None:
+            return None
+        name, function, make_result, left_type, right_type = form
+
+        def execute_specialized_binary_op(instr):
+            stack = self.stack
+            left = stack[-2].object_ref()
+            right = stack[-1].object_ref()
+            if type(left) is not left_type or type(right) is not right_type:
+                deoptimize()
+                generic(instr)
+                return
+            del stack[-2:]
+            stack.append(make_result(function(left.value, right.value)))
 
-        elif instr.ir_type == IRType.UNARY_OP:
-            value = self.stack.pop().object_ref()
-            op = instr.value
+        execute_specialized_binary_op.__name__ = name
+        return execute_specialized_binary_op
 
-            if op == "-":
-                self.stack.append(-value)
-            elif op == "not":
-                self.stack.append(Bool(not value))
+    def specialize_binary_op_var_int(self, code, ip, instr, generic, deoptimize):
+        variable, depth, slot, constant, op = instr.value
+        if depth is None:
+            left = self.context.get(variable)
+        else:
+            left = self.context.get_slot(depth, slot)
+        form = self.binary_form(op, left.object_ref(), small_int(constant))
+        if form is None:
+            return None
+        name, function, make_result, left_type, _ = form
+
+        def execute_specialized_binary_op_var_int(instr):
+            if depth is None:
+                left = self.context.get(variable).object_ref()
             else:
-                raise ValueError(f"Unknown unary operator: {op}")
-
-        elif instr.ir_type == IRType.LET_VAL:
-            value = self.stack.pop()
-            self.context.let(instr.value, Variable(value.object_ref()))
-            self.stack.append(value)
-
-        elif instr.ir_type == IRType.GET_VAL:
-            self.stack.append(self.context.get(instr.value))
-
-        elif instr.ir_type == IRType.SET_VAL:
-            value = self.stack.pop()
-            key = self.stack.pop()
-            key.assgin(value.object_ref())
-            self.stack.append(value)
-
-        elif instr.ir_type == IRType.CALL_LAMBDA:
-            arg_tuple = self.stack.pop().object_ref()
-            func = self.stack.pop().object_ref()
-            if isinstance(func, BuiltIn):
-                result = func.call(arg_tuple)
-                self.stack.append(result)
+                left = self.context.get_slot(depth, slot).object_ref()
+            if type(left) is not left_type:
+                deoptimize()
+                generic(instr)
                 return
-            elif isinstance(func, Lambda):
+            self.stack.append(make_result(function(left.value, constant)))
 
-                not_local_ir = False
-                if not (func.lambda_ir is self.instructions[-1]):
-                    self.instructions.append(func.lambda_ir)
-                    self.func_ips.append(func.lambda_ir_table)
-                    not_local_ir = True
+        execute_specialized_binary_op_var_int.__name__ = name
+        return execute_specialized_binary_op_var_int
 
-                self.stack.append((self.ip, not_local_ir))  # 保存当前ip和是否是新ir
+    def specialize_binary_op_var_var(self, code, ip, instr, generic, deoptimize):
+        left_name, left_depth, left_slot, right_name, right_depth, right_slot, op = (
+            instr.value
+        )
 
-                # 建立参数帧
-                self.context.new_frame(
-                    self.stack,
-                    enter_func=True,
-                    funciton_code_position=func.code_position,
-                )
-                # 获取函数
-                signature = func.signature  # 获取函数签名
-                default_args = func.default_args_tuple  # 获取默认参数
+        def fetch():
+            context = self.context
+            if left_depth is None:
+                left = context.get(left_name)
+            else:
+                left = context.get_slot(left_depth, left_slot)
+            if right_depth is None:
+                right = context.get(right_name)
+            else:
+                right = context.get_slot(right_depth, right_slot)
+            return left.object_ref(), right.object_ref()
+
+        form = self.binary_form(op, *fetch())
+        if form is None:
+            return None
+        name, function, make_result, left_type, right_type = form
+
+        def execute_specialized_binary_op_var_var(instr):
+            left, right = fetch()
+            if type(left) is not left_type or type(right) is not right_type:
+                deoptimize()
+                generic(instr)
+                return
+            self.stack.append(make_result(function(left.value, right.value)))
+
+        execute_specialized_binary_op_var_var.__name__ = name
+        return execute_specialized_binary_op_var_var
+
+    def specialize_get_attr(self, code, ip, instr, generic, deoptimize):
+        # 结果会被之后的指令立即取值（见 can_specialize），直接压入成员而不是惰性求值的 GetAttr
+        if len(self.stack) < 2:
+            return None
+        if type(self.stack[-2].object_ref()) is not Tuple:
+            return None
+        if type(self.stack[-1].object_ref()) is not String:
+            return None
+        cache = code.caches[ip]
+
+        def execute_get_attr_tuple(instr):
+            stack = self.stack
+            obj = stack[-2].object_ref()
+            key = stack[-1].object_ref()
+            if type(obj) is not Tuple or type(key) is not String:
+                deoptimize()
+                generic(instr)
+                return
+            try:
+                value = obj.get_member(key, cache).object_ref()
+            except Exception:
+                # 找不到成员时由通用形式压入 GetAttr，在求值时报错
+                deoptimize()
+                generic(instr)
+                return
+            del stack[-2:]
+            stack.append(value)
+
+        execute_get_attr_tuple.__name__ = "GET_ATTR_TUPLE"
+        return execute_get_attr_tuple
+
+    def specialize_index_of(self, code, ip, instr, generic, deoptimize):
+        # 与 GET_ATTR 相同，只在结果被立即取值时直接压入元素
+        if len(self.stack) < 2:
+            return None
+        obj_type = type(self.stack[-2].object_ref())
+        if obj_type not in (Tuple, String):
+            return None
+        if type(self.stack[-1].object_ref()) is not Int:
+            return None
+
+        def execute_index_of(instr):
+            stack = self.stack
+            obj = stack[-2].object_ref()
+            index = stack[-1].object_ref()
+            if type(obj) is not obj_type or type(index) is not Int:
+                deoptimize()
+                generic(instr)
+                return
+            try:
+                value = obj[index.value].object_ref()
+            except Exception:
+                deoptimize()
+                generic(instr)
+                return
+            del stack[-2:]
+            stack.append(value)
 
-                default_args.assgin_members(arg_tuple)  # 将参数赋值给默认参数
+        execute_index_of.__name__ = f"INDEX_OF_{obj_type.__name__.upper()}_INT"
+        return execute_index_of
 
-                # 将默认参数进行let
-                for v in default_args.value:
-                    if not isinstance(v, Named):
-                        raise ValueError(
-                            f"Lambda {func} default args must be Named, but got {v}"
-                        )
-                    self.context.let(v.key.value, v.value)
+    def specialize_call_lambda(self, code, ip, instr, generic, deoptimize):
+        if len(self.stack) < 2:
+            return None
+        return self.make_specialized_call_handler(
+            type(self.stack[-2].object_ref()), False, deoptimize
+        )
 
-                if not isinstance(func.self_object, NoneType):
-                    self.context.let("self", func.self_object)
+    def specialize_call_with_args(self, code, ip, instr, generic, deoptimize):
+        if len(self.stack) < instr.value + 1:
+            return None
+        return self.make_specialized_call_handler(
+            type(self.stack[-instr.value - 1].object_ref()), True, deoptimize
+        )
 
-                ip = self.func_ips[-1][signature]  # 获取函数入口地址
-                self.ip = ip - 1  # -1是因为后面会+1
+    def make_specialized_call_handler(self, func_type, with_args, deoptimize):
+        """
+        特化的调用，func_type 为 BuiltIn 时直接调用内置函数，为 Lambda 时直接进入函数。
+        with_args 为 True 时参数是栈顶的 instr.value 个值（CALL_WITH_ARGS），否则是栈顶的元组
+        """
+        if func_type is BuiltIn:
+            name = "CALL_BUILTIN"
+        elif func_type is Lambda:
+            name = "CALL_LAMBDA_EXACT"
+        else:
+            return None
+
+        def execute_specialized_call(instr):
+            stack = self.stack
+            if with_args:
+                start = len(stack) - instr.value
+                arg_tuple = Tuple([owned(value.object_ref()) for value in stack[start:]])
+                del stack[start:]
             else:
-                raise ValueError(f"Object: {func} is not callable")
-        elif instr.ir_type == IRType.RETURN:
-            if len(self.stack) < self.context.stack_pointers[-1]:
-                raise ValueError(f"Cant return without value")
-            result = self.stack.pop()
-            del self.stack[self.context.stack_pointers[-1]:]
-            ip_info = self.stack.pop()
-            self.ip = ip_info[0]
-            if ip_info[1]:
-                self.instructions.pop() # 删除外部ir
-                self.func_ips.pop()
-            self.context.pop_frame(self.stack, exit_func=True)
-            self.stack.append(result)
+                arg_tuple = stack.pop().object_ref()
+            func = stack.pop().object_ref()
+            if type(func) is not func_type:
+                deoptimize()
+                self.call_object(func, arg_tuple)
+            elif func_type is BuiltIn:
+                stack.append(func.call(arg_tuple))
+            else:
+                self.call_lambda(func, arg_tuple)
 
-        elif instr.ir_type == IRType.RETURN_NONE:
-            if len(self.stack) < self.context.stack_pointers[-1]:
-                raise ValueError(f"Cant return without value")
-            result = self.stack.pop()
-            del self.stack[self.context.stack_pointers[-1]:]
-            ip_info = self.stack.pop()
-            self.ip = ip_info[0]
-            if ip_info[1]:
-                self.instructions.pop()
-                self.func_ips.pop()
-            self.context.pop_frame(self.stack, exit_func=True)
+        execute_specialized_call.__name__ = name
+        return execute_specialized_call
+
+    def enter_code(self, code):
+        """从代码对象的第一条指令开始执行"""
+        if code.executor is not self:
+            self.link(code)
+        self.code = code
+        self.ip = 0
+
+    def execute_instruction(self, instr):
+        self.dispatch_table.get(instr.ir_type, self.execute_unknown)(instr)
+
+    def execute_unknown(self, instr):
+        raise ValueError(f"Unknown instruction: {instr}")
+
+    def execute_load_int(self, instr):
+        self.stack.append(small_int(instr.value))
+
+    def execute_load_float(self, instr):
+        self.stack.append(Float(instr.value))
+
+    def execute_load_bool(self, instr):
+        self.stack.append(boolean(instr.value))
+
+    def execute_load_string(self, instr):
+        self.stack.append(String(instr.value))
+
+    def execute_load_none(self, instr):
+        self.stack.append(NONE)
+
+    def execute_load_lambda(self, instr):
+        default_args = (
+            self.stack.pop().object_ref()
+        )  # 获取默认参数，这里是一个tuple
+        signature, code_position = instr.value
+        code = self.code.functions[signature]
+        self.stack.append(Lambda(code_position, default_args, signature, code))
+
+    def execute_build_tuple(self, instr):
+        count = instr.value
+        values = []
+        for _ in range(count):
+            values.insert(0, owned(self.stack.pop().object_ref()))
+        self.stack.append(Tuple(values))
+
+    def execute_build_key_val(self, instr):
+        value = self.stack.pop().object_ref()
+        key = self.stack.pop().object_ref()
+        self.stack.append(KeyValue(key, value))
+
+    def execute_build_wrap(self, instr):
+        value = self.stack.pop().object_ref()
+        self.stack.append(Wrap(value))
+
+    def execute_binary_op(self, instr):
+        right = self.stack.pop().object_ref()
+        left = self.stack.pop().object_ref()
+        self.stack.append(binary_operation(instr.value, left, right))
+
+    def execute_unary_op(self, instr):
+        value = self.stack.pop().object_ref()
+        self.stack.append(unary_operation(instr.value, value))
+
+    def make_binary_op_handler(self, function):
+        def execute_binary_op(instr):
+            stack = self.stack
+            right = stack.pop().object_ref()
+            left = stack.pop().object_ref()
+            stack.append(function(left, right))
+
+        return execute_binary_op
+
+    def make_unary_op_handler(self, function):
+        def execute_unary_op(instr):
+            stack = self.stack
+            stack.append(function(stack.pop().object_ref()))
+
+        return execute_unary_op
+
+    def make_binary_op_var_int_handler(self, function):
+        def execute_binary_op_var_int(instr):
+            name, depth, slot, constant, _ = instr.value
+            if depth is None:
+                left = self.context.get(name)
+            else:
+                left = self.context.get_slot(depth, slot)
+            self.stack.append(function(left.object_ref(), small_int(constant)))
+
+        return execute_binary_op_var_int
+
+    def make_binary_op_var_var_handler(self, function):
+        def execute_binary_op_var_var(instr):
+            left_name, left_depth, left_slot, right_name, right_depth, right_slot, _ = (
+                instr.value
+            )
+            if left_depth is None:
+                left = self.context.get(left_name)
+            else:
+                left = self.context.get_slot(left_depth, left_slot)
+            if right_depth is None:
+                right = self.context.get(right_name)
+            else:
+                right = self.context.get_slot(right_depth, right_slot)
+            self.stack.append(function(left.object_ref(), right.object_ref()))
+
+        return execute_binary_op_var_var
+
+    def make_compare_jump_handler(self, function):
+        def execute_compare_jump_if_false(instr):
+            stack = self.stack
+            right = stack.pop().object_ref()
+            left = stack.pop().object_ref()
+            if type(left) in NUMBER_TYPES and type(right) in NUMBER_TYPES:
+                if not function(left.value, right.value):
+                    self.ip += instr.value[-1]
+            else:
+                self.jump_if_false(function(left, right), instr.value[-1])
+
+        return execute_compare_jump_if_false
+
+    def make_compare_var_int_jump_handler(self, function):
+        def execute_compare_var_int_jump_if_false(instr):
+            name, depth, slot, constant, _, offset = instr.value
+            if depth is None:
+                left = self.context.get(name).object_ref()
+            else:
+                left = self.context.get_slot(depth, slot).object_ref()
+            if type(left) in NUMBER_TYPES:
+                if not function(left.value, constant):
+                    self.ip += offset
+            else:
+                self.jump_if_false(function(left, small_int(constant)), offset)
+
+        return execute_compare_var_int_jump_if_false
+
+    def make_compare_var_var_jump_handler(self, function):
+        def execute_compare_var_var_jump_if_false(instr):
+            (
+                left_name,
+                left_depth,
+                left_slot,
+                right_name,
+                right_depth,
+                right_slot,
+                _,
+                offset,
+            ) = instr.value
+            if left_depth is None:
+                left = self.context.get(left_name).object_ref()
+            else:
+                left = self.context.get_slot(left_depth, left_slot).object_ref()
+            if right_depth is None:
+                right = self.context.get(right_name).object_ref()
+            else:
+                right = self.context.get_slot(right_depth, right_slot).object_ref()
+            if type(left) in NUMBER_TYPES and type(right) in NUMBER_TYPES:
+                if not function(left.value, right.value):
+                    self.ip += offset
+            else:
+                self.jump_if_false(function(left, right), offset)
+
+        return execute_compare_var_var_jump_if_false
+
+    def execute_let_val(self, instr):
+        value = self.stack.pop()
+        variable = Variable(value.object_ref())
+        self.context.let(instr.value, variable)
+        self.push_let_result(value, variable)
+
+    def execute_get_val(self, instr):
+        self.stack.append(self.context.get(instr.value))
+
+    def execute_let_slot(self, instr):
+        value = self.stack.pop()
+        variable = Variable(value.object_ref())
+        self.context.let_slot(instr.value[0], instr.value[1], variable)
+        self.push_let_result(value, variable)
+
+    def push_let_result(self, value, variable):
+        # 共享的值存入变量时被复制，压入变量中的副本，使 a := b := 1 中的 a 与 b 仍是同一个对象
+        if type(value) in SHARED_TYPES and value.shared:
+            value = variable.value
+        self.stack.append(value)
+
+    def execute_get_slot(self, instr):
+        self.stack.append(self.context.get_slot(instr.value[1], instr.value[2]))
+
+    def execute_set_val(self, instr):
+        value = self.stack.pop()
+        key = self.stack.pop()
+        key.assgin(value.object_ref())
+        self.stack.append(value)
+
+    def execute_binary_op_var_int(self, instr):
+        name, depth, slot, constant, op = instr.value
+        if depth is None:
+            left = self.context.get(name)
+        else:
+            left = self.context.get_slot(depth, slot)
+        self.stack.append(binary_operation(op, left.object_ref(), small_int(constant)))
+
+    def execute_binary_op_var_var(self, instr):
+        left_name, left_depth, left_slot, right_name, right_depth, right_slot, op = (
+            instr.value
+        )
+        if left_depth is None:
+            left = self.context.get(left_name)
+        else:
+            left = self.context.get_slot(left_depth, left_slot)
+        if right_depth is None:
+            right = self.context.get(right_name)
+        else:
+            right = self.context.get_slot(right_depth, right_slot)
+        self.stack.append(binary_operation(op, left.object_ref(), right.object_ref()))
+
+    def execute_call_lambda(self, instr):
+        arg_tuple = self.stack.pop().object_ref()
+        func = self.stack.pop().object_ref()
+        self.call_object(func, arg_tuple)
+
+    def execute_tail_call(self, instr):
+        arg_tuple = self.stack.pop().object_ref()
+        func = self.stack.pop().object_ref()
+        if not (isinstance(func, Lambda) and self.can_reuse_frame(func)):
+            # 无法复用帧时正常调用，返回后由之后的 RETURN 返回结果
+            self.call_object(func, arg_tuple)
+            return
+        # 弹出当前函数的所有帧，新的函数帧沿用调用者的返回地址，被调用的函数返回时直接回到调用者
+        caller = self.context.pop_frame(self.stack, exit_func=True)
+        frame = self.context.new_frame(
+            self.stack,
+            enter_func=True,
+            funciton_code_position=func.code_position,
+        )
+        frame.return_ip = caller.return_ip
+        frame.return_code = caller.return_code
+        self.bind_arguments(func, arg_tuple)
+        self.enter_code(func.code)
+        self.ip = -1
+
+    def can_reuse_frame(self, func):
+        """
+        尾调用能否弹出当前函数的帧
+
+        变量按名字在所有帧中查找，被调用的函数（以及它调用的函数）可能读取当前函数帧中的变量，
+        只有这些变量都会被被调用函数的参数覆盖时，弹出它们才不会改变查找的结果
+        """
+        names = func.get_parameter_layout()
+        if names is None:
+            names = {
+                v.key.value
+                for v in func.default_args_tuple.value
+                if isinstance(v, Named)
+            }
+        names = set(names)
+        if not isinstance(func.self_object, NoneType):
+            names.add("self")
+        for frame in reversed(self.context.frames):
+            if not names.issuperset(frame.variables):
+                return False
+            if frame.enter_func:
+                return True
+        return False
+
+    def execute_call_with_args(self, instr):
+        stack = self.stack
+        start = len(stack) - instr.value
+        arg_tuple = Tuple([owned(value.object_ref()) for value in stack[start:]])
+        del stack[start:]
+        func = stack.pop().object_ref()
+        self.call_object(func, arg_tuple)
+
+    def call_object(self, func, arg_tuple):
+        if isinstance(func, BuiltIn):
+            result = func.call(arg_tuple)
             self.stack.append(result)
+            return
+        elif isinstance(func, Lambda):
+            self.call_lambda(func, arg_tuple)
+        else:
+            raise ValueError(f"Object: {func} is not callable")
+
+    def call_lambda(self, func, arg_tuple):
+        # 建立参数帧，保存返回地址
+        frame = self.context.new_frame(
+            self.stack,
+            enter_func=True,
+            funciton_code_position=func.code_position,
+        )
+        frame.return_ip = self.ip
+        frame.return_code = self.code
+        self.bind_arguments(func, arg_tuple)
+
+        self.enter_code(func.code)
+        self.ip = -1  # -1是因为后面会+1
+
+    def bind_arguments(self, func, arg_tuple):
+        """在刚建立的函数帧中 let 参数与 self"""
+        default_args = func.default_args_tuple  # 获取默认参数
+
+        func.assgin_arguments(arg_tuple)  # 将参数赋值给默认参数
 
-        elif instr.ir_type == IRType.NEW_FRAME:
-            # print("new frame")
-            self.context.new_frame(self.stack)
+        # 将默认参数进行let
+        for v in default_args.value:
+            if not isinstance(v, Named):
+                raise ValueError(
+                    f"Lambda {func} default args must be Named, but got {v}"
+                )
+            self.context.let(v.key.value, v.value)
 
-        elif instr.ir_type == IRType.POP_FRAME:
-            # print("pop frame")
+        if not isinstance(func.self_object, NoneType):
+            self.context.let("self", func.self_object)
+
+    def execute_inline_call(self, instr):
+        signature, count, offset = instr.value
+        stack = self.stack
+        if count is None:
+            arg_tuple = stack.pop().object_ref()
+        else:
+            start = len(stack) - count
+            arg_tuple = Tuple([owned(value.object_ref()) for value in stack[start:]])
+            del stack[start:]
+        func = stack.pop().object_ref()
+        if not (
+            isinstance(func, Lambda)
+            and func.signature == signature
+            and func.code.functions is self.code.functions
+        ):
+            # 变量中不是编译期内联的函数，跳过展开的函数体，返回后继续执行之后的指令
+            self.ip += offset
+            self.call_object(func, arg_tuple)
+            return
+        self.context.new_frame(
+            self.stack,
+            enter_func=True,
+            funciton_code_position=func.code_position,
+        )
+        self.bind_arguments(func, arg_tuple)
+
+    def execute_return_inline(self, instr):
+        if len(self.stack) <= self.context.frames[-1].stack_pointer:
+            raise ValueError(f"Cant return without value")
+        result = self.stack.pop()
+        self.context.pop_frame(self.stack, exit_func=True)
+        self.stack.append(result)
+        self.ip += instr.value
+
+    def execute_return(self, instr):
+        if len(self.stack) <= self.context.frames[-1].stack_pointer:
+            raise ValueError(f"Cant return without value")
+        result = self.stack.pop()
+        frame = self.context.pop_frame(self.stack, exit_func=True)
+        self.ip = frame.return_ip
+        self.code = frame.return_code
+        self.stack.append(result)
+
+    def execute_new_frame(self, instr):
+        self.context.new_frame(self.stack)
+
+    def execute_pop_frame(self, instr):
+        # 空代码块没有留下值，结果为 None
+        if len(self.stack) > self.context.frames[-1].stack_pointer:
             obj = self.stack.pop()
-            self.context.pop_frame(self.stack)
-            self.stack.append(obj)
+        else:
+            obj = NONE
+        self.context.pop_frame(self.stack)
+        self.stack.append(obj)
+
+    def execute_jump_offset(self, instr):
+        self.ip += instr.value
+
+    def execute_jump_if_false(self, instr):
+        condition = self.stack.pop().object_ref()
+        if not isinstance(condition, Bool):
+            raise ValueError(f"Condition is not bool: {condition}")
+        if not condition.value:
+            self.ip += instr.value
 
-        elif instr.ir_type == IRType.JUMP_OFFSET:
+    def execute_jump_if_true(self, instr):
+        condition = self.stack.pop().object_ref()
+        if not isinstance(condition, Bool):
+            raise ValueError(f"Condition is not bool: {condition}")
+        if condition.value:
             self.ip += instr.value
 
-        elif instr.ir_type == IRType.JUMP_IF_FALSE:
-            condition = self.stack.pop().object_ref()
-            if not isinstance(condition, Bool):
-                raise ValueError(f"Condition is not bool: {condition}")
-            if not condition.value:
-                self.ip += instr.value
+    def jump_if_false(self, condition, offset):
+        # 比较结果不是两个数值时与 JUMP_IF_FALSE 的检查完全一致
+        condition = condition.object_ref()
+        if not isinstance(condition, Bool):
+            raise ValueError(f"Condition is not bool: {condition}")
+        if not condition.value:
+            self.ip += offset
+
+    def execute_compare_jump_if_false(self, instr):
+        right = self.stack.pop().object_ref()
+        left = self.stack.pop().object_ref()
+        op, offset = instr.value
+        self.jump_if_false(binary_operation(op, left, right), offset)
+
+    def execute_compare_var_int_jump_if_false(self, instr):
+        name, depth, slot, constant, op, offset = instr.value
+        if depth is None:
+            left = self.context.get(name)
+        else:
+            left = self.context.get_slot(depth, slot)
+        condition = binary_operation(op, left.object_ref(), small_int(constant))
+        self.jump_if_false(condition, offset)
 
-        elif instr.ir_type == IRType.GET_ATTR:
-            attr_name = self.stack.pop().object_ref()
-            obj = self.stack.pop()
-            self.stack.append(GetAttr(obj, attr_name))
+    def execute_compare_var_var_jump_if_false(self, instr):
+        left_name, left_depth, left_slot, right_name, right_depth, right_slot = (
+            instr.value[:6]
+        )
+        op, offset = instr.value[6:]
+        if left_depth is None:
+            left = self.context.get(left_name)
+        else:
+            left = self.context.get_slot(left_depth, left_slot)
+        if right_depth is None:
+            right = self.context.get(right_name)
+        else:
+            right = self.context.get_slot(right_depth, right_slot)
+        condition = binary_operation(op, left.object_ref(), right.object_ref())
+        self.jump_if_false(condition, offset)
 
-        elif instr.ir_type == IRType.INDEX_OF:
-            index = self.stack.pop().object_ref().value
-            obj = self.stack.pop()
-            self.stack.append(IndexOf(obj, index))
+    def execute_get_attr(self, instr):
+        attr_name = self.stack.pop().object_ref()
+        obj = self.stack.pop()
+        self.stack.append(GetAttr(obj, attr_name, self.code.caches[self.ip]))
 
-        elif instr.ir_type == IRType.RESET_STACK:
-            del self.stack[self.context.stack_pointers[-1]:]
+    def execute_index_of(self, instr):
+        index = self.stack.pop().object_ref()
+        obj = self.stack.pop()
+        self.stack.append(IndexOf(obj, index))
 
-        elif instr.ir_type == IRType.COPY_VAL:
-            self.stack.append(self.stack.pop().object_ref().copy())
+    def execute_reset_stack(self, instr):
+        del self.stack[self.context.frames[-1].stack_pointer:]
 
-        elif instr.ir_type == IRType.REF_VAL:
-            self.stack.append(Ref(self.stack.pop()))
+    def execute_copy_val(self, instr):
+        self.stack.append(self.stack.pop().object_ref().copy())
 
-        elif instr.ir_type == IRType.DEREF_VAL:
-            v = self.stack.pop().object_ref()
-            if isinstance(v, Ref):
-                self.stack.append(v.deref())
-            else:
-                raise ValueError(f"Can't deref non-ref value: {v}")
-
-        elif instr.ir_type == IRType.KEY_OF:
-            obj = self.stack.pop().object_ref()
-            if isinstance(obj, KeyValue) or isinstance(obj, Named):
-                self.stack.append(obj.key)
-            elif isinstance(obj, Lambda):
-                self.stack.append(obj.default_args_tuple)
-            else:
-                raise ValueError(f"Object is not KeyValue or Named: {obj}")
+    def execute_ref_val(self, instr):
+        self.stack.append(Ref(self.stack.pop()))
 
-        elif instr.ir_type == IRType.VALUE_OF:
-            obj = self.stack.pop().object_ref()
-            if isinstance(obj, KeyValue) or isinstance(obj, Named) or isinstance(obj, Wrap):
-                self.stack.append(obj.value)
-            else:
-                raise ValueError(f"Object is not KeyValue or Named: {obj}")
-
-        elif instr.ir_type == IRType.ASSERT:
-            value = self.stack.pop().object_ref()
-            if not isinstance(value, Bool):
-                raise ValueError(f"Assert value is not Bool: {value}")
-            if not value.value:
-                raise ValueError(f"Assert failed")
-            self.stack.append(NoneType())
-
-        elif instr.ir_type == IRType.SELF_OF:
-            value = self.stack.pop().object_ref()
-            if not isinstance(value, Lambda):
-                raise ValueError(f"Object is not Lambda: {value}")
-            self.stack.append(value.self_object)
-
-        elif instr.ir_type == IRType.BUILD_NAMED:
-            value = self.stack.pop()
-            key = self.stack.pop()
-            self.stack.append(Named(key, value))
-
-        elif instr.ir_type == IRType.DEBUG_INFO:
-            self.debug_info = instr.value
-
-        elif instr.ir_type == IRType.IMPORT:
-            # 导入IR并执行
-            named_path = self.stack.pop().object_ref()
-            if not isinstance(named_path, Named):
-                raise ValueError(f"Import arg must be Named, but got {named_path}")
-
-            path = named_path.key
-            default_args = named_path.value
-
-            if not isinstance(path, String):
-                raise ValueError(f"Import path must be String, but got {path}")
-
-            if not isinstance(default_args, Tuple):
-                # 包装
-                default_args = Tuple([default_args])
-
-            with self.open(path.value, "r", encoding="utf-8") as f:
-                code = f.read()
-            irs = json.loads(code)
-            functions = Functions()
-            functions.import_from_dict(irs)
-            lambda_ir, lambda_ir_table = functions.build_instructions()
-            self.stack.append(Lambda(instr.value, default_args, "__main__", lambda_ir_table, lambda_ir))
+    def execute_deref_val(self, instr):
+        v = self.stack.pop().object_ref()
+        if isinstance(v, Ref):
+            self.stack.append(v.deref())
+        else:
+            raise ValueError(f"Can't deref non-ref value: {v}")
+
+    def execute_key_of(self, instr):
+        obj = self.stack.pop().object_ref()
+        if isinstance(obj, KeyValue) or isinstance(obj, Named):
+            self.stack.append(obj.key)
+        elif isinstance(obj, Lambda):
+            self.stack.append(obj.default_args_tuple)
+        else:
+            raise ValueError(f"Object is not KeyValue or Named: {obj}")
 
+    def execute_value_of(self, instr):
+        obj = self.stack.pop().object_ref()
+        if isinstance(obj, KeyValue) or isinstance(obj, Named) or isinstance(obj, Wrap):
+            self.stack.append(obj.value)
         else:
-            raise ValueError(f"Unknown instruction: {instr}")
+            raise ValueError(f"Object is not KeyValue or Named: {obj}")
+
+    def execute_assert(self, instr):
+        value = self.stack.pop().object_ref()
+        if not isinstance(value, Bool):
+            raise ValueError(f"Assert value is not Bool: {value}")
+        if not value.value:
+            raise ValueError(f"Assert failed")
+        self.stack.append(NONE)
+
+    def execute_self_of(self, instr):
+        value = self.stack.pop().object_ref()
+        if not isinstance(value, Lambda):
+            raise ValueError(f"Object is not Lambda: {value}")
+        self.stack.append(value.self_object)
+
+    def execute_build_named(self, instr):
+        value = self.stack.pop()
+        key = self.stack.pop()
+        self.stack.append(Named(key, value))
+
+    def execute_import(self, instr):
+        # 导入IR并执行
+        named_path = self.stack.pop().object_ref()
+        if not isinstance(named_path, Named):
+            raise ValueError(f"Import arg must be Named, but got {named_path}")
+
+        path = named_path.key
+        default_args = named_path.value
+
+        if not isinstance(path, String):
+            raise ValueError(f"Import path must be String, but got {path}")
+
+        if not isinstance(default_args, Tuple):
+            # 包装
+            default_args = Tuple([default_args])
+
+        with self.open(path.value, "r", encoding="utf-8") as f:
+            code = f.read()
+        irs = json.loads(code)
+        functions = Functions()
+        functions.import_from_dict(irs)
+        codes = functions.build_codes()
+        self.stack.append(
+            Lambda(instr.value, default_args, "__main__", codes["__main__"])
+        )
@@ -1,41 +1,87 @@
 from .variable import Tuple, KeyValue, Lambda
 
 
+class Frame:
+    # 帧记录：variables 按名字保存全部变量，slots 保存编译期确定了槽位的变量，
+    # stack_pointer 是建立帧时值栈的高度。函数帧还记录返回地址：
+    # 返回后继续执行的代码对象 return_code 与其中的 return_ip
+    __slots__ = (
+        "variables",
+        "slots",
+        "enter_func",
+        "code_position",
+        "hidden",
+        "stack_pointer",
+        "return_ip",
+        "return_code",
+    )
+
+    def __init__(
+        self, enter_func=False, code_position=None, hidden=False, stack_pointer=0
+    ):
+        self.variables = {}
+        self.slots = []
+        self.enter_func = enter_func
+        self.code_position = code_position
+        self.hidden = hidden
+        self.stack_pointer = stack_pointer
+        self.return_ip = None
+        self.return_code = None
+
+    def __str__(self):
+        return f"Frame({self.variables})"
+
+    def __repr__(self):
+        return str(self)
+
+
 class Context:
     def __init__(self):
-        self.frames = []
-        self.stack_pointers = []
+        self.frames = []  # 调用栈，值栈中只保存值
 
     def new_frame(self, stack, enter_func = False, funciton_code_position = None, hidden = False):
-        self.frames.append(({}, enter_func, funciton_code_position, hidden))
-        self.stack_pointers.append(len(stack))
+        frame = Frame(enter_func, funciton_code_position, hidden, len(stack))
+        self.frames.append(frame)
+        return frame
 
     def pop_frame(self, stack, exit_func = False):
+        """弹出帧并把值栈恢复到建帧时的高度，exit_func 时弹出到函数帧为止，返回最后弹出的帧"""
+        frames = self.frames
         if exit_func:
-            while len(self.frames) > 0 and not self.frames[-1][1]:
-                stack_pointer = self.stack_pointers.pop()
-                self.frames.pop()
-                del stack[stack_pointer:]
-            stack_pointer = self.stack_pointers.pop()
-            self.frames.pop()
-            del stack[stack_pointer:]            
-        else:
-            stack_pointer = self.stack_pointers.pop()
-            self.frames.pop()
-            del stack[stack_pointer:]
+            while len(frames) > 1 and not frames[-1].enter_func:
+                frames.pop()
+        frame = frames.pop()
+        del stack[frame.stack_pointer:]
+        return frame
+
     def let(self, key, value):
-        self.frames[-1][0][key] = value
+        self.frames[-1].variables[key] = value
+
+    def let_slot(self, key, slot, value):
+        """在当前帧中定义变量，同时写入编译期分配的槽位"""
+        frame = self.frames[-1]
+        frame.variables[key] = value
+        slots = frame.slots
+        if slot < len(slots):
+            slots[slot] = value
+        else:
+            slots.extend([None] * (slot - len(slots)))
+            slots.append(value)
 
     def get(self, key):
         for frame in reversed(self.frames):
-            if key in frame[0]:
-                return frame[0][key]
+            if key in frame.variables:
+                return frame.variables[key]
         raise KeyError(f"'{key}' not found in Context")
 
+    def get_slot(self, depth, slot):
+        """按 (帧深度, 槽位) 直接获取变量，深度 0 为当前帧"""
+        return self.frames[-1 - depth].slots[slot]
+
     def set(self, key, value):
         for frame in reversed(self.frames):
-            if key in frame[0]:
-                frame[0][key] = value
+            if key in frame.variables:
+                frame.variables[key] = value
                 return
         raise KeyError(f"'{key}' not found in Context")
 
@@ -47,7 +93,7 @@ class Context:
 
     def __contains__(self, key):
         for frame in reversed(self.frames):
-            if key in frame[0]:
+            if key in frame.variables:
                 return True
         return False
 
@@ -71,14 +117,12 @@ class Context:
             raise ValueError("Size must be greater than 0")
         if size == 0:
             self.frames = []
-            self.stack_pointers = []
             stack.clear()
         if len(self.frames) < size:
             raise ValueError("Unable to slice context: size is greater than current size")
         else:
-            self.frames = self.frames[:size]
-            self.stack_pointers = self.stack_pointers[:size]
-            stack_pointer = self.stack_pointers[-1] if self.stack_pointers else 0
+            del self.frames[size:]
+            stack_pointer = self.frames[-1].stack_pointer if self.frames else 0
             del stack[stack_pointer:]
 
     def format_stack_and_frames(self, stack):
@@ -97,30 +141,32 @@ class Context:
 
         # 格式化栈指针
         result.append("\n## Stack Pointers:")
-        if not self.stack_pointers:
+        if not self.frames:
             result.append("  - <Empty>")
         else:
-            for i, pointer in enumerate(self.stack_pointers):
-                result.append(f"  + Frame {i} -> {pointer}")
+            for i, frame in enumerate(self.frames):
+                result.append(f"  + Frame {i} -> {frame.stack_pointer}")
 
         # 格式化变量帧
         result.append("\n## Frames")
         if not self.frames:
             result.append("  - <Empty>")
         else:
-            for i, (frame, is_func, code_position, hidden) in enumerate(self.frames):
-                if is_func:
-                    collected_code_positions.append(code_position)
+            for i, frame in enumerate(self.frames):
+                if frame.enter_func:
+                    collected_code_positions.append(frame.code_position)
                 frame_type = (
-                    f"function, code_position = {code_position}" if is_func else "normal"
+                    f"function, code_position = {frame.code_position}"
+                    if frame.enter_func
+                    else "normal"
                 )
                 result.append(f"  + frame {i} ({frame_type}):")
-                if hidden:
+                if frame.hidden:
                     result.append("    - <Hidden>")
-                elif not frame:
+                elif not frame.variables:
                     result.append("    - <Empty>")
                 else:
-                    for var_name, var_value in frame.items():
+                    for var_name, var_value in frame.variables.items():
                         value_repr = str(var_value)
                         if len(value_repr) > 70:  # 截断过长的输出
                             value_repr = value_repr[:67] + "..."
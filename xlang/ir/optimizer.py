@@ -0,0 +1,561 @@
+from .IR import (
+    IR,
+    IRType,
+    JUMP_TYPES,
+    COMPARISON_OPERATORS,
+    binary_operation,
+    unary_operation,
+    jump_offset,
+    set_jump_offset,
+)
+from .variable import Int, Float, Bool, String, NoneType
+from typing import List
+
+
+def jump_targets(irs: List[IR]) -> set:
+    """返回所有跳转指令的目标ip"""
+    targets = set()
+    for ip, instr in enumerate(irs):
+        if instr.ir_type in JUMP_TYPES:
+            targets.add(ip + 1 + jump_offset(instr))
+    return targets
+
+
+def relink_jumps(irs: List[IR], new_index: List[int]) -> None:
+    """
+    指令被删除或合并后重新计算跳转偏移
+
+    Args:
+        irs: 优化前的IR指令列表，其中的跳转指令会被原地修改
+        new_index: 旧ip -> 新ip，长度为 len(irs) + 1，最后一项对应指令列表末尾
+    """
+    for old_ip, instr in enumerate(irs):
+        if instr.ir_type in JUMP_TYPES:
+            target = new_index[old_ip + 1 + jump_offset(instr)]
+            set_jump_offset(instr, target - new_index[old_ip] - 1)
+
+
+def load_constant(instr: IR):
+    """如果指令加载的是常量则返回对应的值，否则返回 None"""
+    ir_type = instr.ir_type
+    if ir_type == IRType.LOAD_INT:
+        return Int(instr.value)
+    if ir_type == IRType.LOAD_FLOAT:
+        return Float(instr.value)
+    if ir_type == IRType.LOAD_STRING:
+        return String(instr.value)
+    if ir_type == IRType.LOAD_BOOL:
+        return Bool(instr.value)
+    if ir_type == IRType.LOAD_NONE:
+        return NoneType()
+    return None
+
+
+def constant_instruction(value, position=None):
+    """生成加载常量的指令，值不是可以直接加载的类型时返回 None"""
+    value_type = type(value)
+    if value_type is Int:
+        return IR(IRType.LOAD_INT, value.value, position)
+    if value_type is Float:
+        return IR(IRType.LOAD_FLOAT, value.value, position)
+    if value_type is String:
+        return IR(IRType.LOAD_STRING, value.value, position)
+    if value_type is Bool:
+        return IR(IRType.LOAD_BOOL, value.value, position)
+    if value_type is NoneType:
+        return IR(IRType.LOAD_NONE, None, position)
+    return None
+
+
+def fold_constants(irs: List[IR]) -> List[IR]:
+    """
+    常量折叠：操作数都是常量的 BINARAY_OP 与 UNARY_OP 在编译期直接计算
+
+    运算通过 binary_operation 与 unary_operation 完成，与执行器的语义一致；
+    运算出错或结果不是可以直接加载的值时保留原指令，错误仍在运行时报告。
+    被合并的指令中除第一条外都不能是跳转目标
+
+    Args:
+        irs: 已经重定向过跳转的IR指令列表
+
+    Returns:
+        处理后的IR指令列表
+    """
+    targets = jump_targets(irs)
+    result = []
+    starts = []  # result 中每条指令对应的原始起始ip
+    new_index = []
+    for ip, instr in enumerate(irs):
+        new_index.append(len(result))
+        folded = None
+        if (
+            instr.ir_type == IRType.BINARAY_OP
+            and len(result) >= 2
+            and ip not in targets
+            and starts[-1] not in targets
+        ):
+            left = load_constant(result[-2])
+            right = load_constant(result[-1])
+            if left is not None and right is not None:
+                try:
+                    folded = constant_instruction(
+                        binary_operation(instr.value, left, right),
+                        result[-2].position,
+                    )
+                except Exception:
+                    folded = None
+                if folded is not None:
+                    del result[-2:]
+                    del starts[-1]
+        elif (
+            instr.ir_type == IRType.UNARY_OP
+            and len(result) >= 1
+            and ip not in targets
+        ):
+            value = load_constant(result[-1])
+            if value is not None:
+                try:
+                    folded = constant_instruction(
+                        unary_operation(instr.value, value), result[-1].position
+                    )
+                except Exception:
+                    folded = None
+                if folded is not None:
+                    del result[-1]
+        if folded is not None:
+            # 折叠后的指令占据第一个操作数的位置，起始ip不变
+            result.append(folded)
+        else:
+            result.append(instr)
+            starts.append(ip)
+    new_index.append(len(result))
+    relink_jumps(irs, new_index)
+    return result
+
+
+# 这些指令之后不会顺序执行下一条指令
+NO_FALLTHROUGH_TYPES = (
+    IRType.JUMP_OFFSET,
+    IRType.RETURN,
+    IRType.RETURN_NONE,
+    IRType.RETURN_INLINE,
+)
+
+CONSTANT_LOAD_TYPES = (
+    IRType.LOAD_NONE,
+    IRType.LOAD_INT,
+    IRType.LOAD_FLOAT,
+    IRType.LOAD_BOOL,
+    IRType.LOAD_STRING,
+)
+
+# 指令对当前帧内栈深度的影响，NEW_FRAME、POP_FRAME、RESET_STACK 与 BUILD_TUPLE 单独处理
+STACK_EFFECTS = {
+    IRType.LOAD_NONE: 1,
+    IRType.LOAD_INT: 1,
+    IRType.LOAD_FLOAT: 1,
+    IRType.LOAD_BOOL: 1,
+    IRType.LOAD_STRING: 1,
+    IRType.LOAD_LAMBDA: 0,
+    IRType.BUILD_KEY_VAL: -1,
+    IRType.BUILD_NAMED: -1,
+    IRType.BUILD_WRAP: 0,
+    IRType.BINARAY_OP: -1,
+    IRType.UNARY_OP: 0,
+    IRType.LET_VAL: 0,
+    IRType.GET_VAL: 1,
+    IRType.LET_SLOT: 0,
+    IRType.GET_SLOT: 1,
+    IRType.SET_VAL: -1,
+    IRType.GET_ATTR: -1,
+    IRType.INDEX_OF: -1,
+    IRType.KEY_OF: 0,
+    IRType.VALUE_OF: 0,
+    IRType.SELF_OF: 0,
+    IRType.CALL_LAMBDA: -1,
+    IRType.TAIL_CALL: -1,
+    IRType.RETURN: 0,
+    IRType.RETURN_NONE: 0,
+    IRType.JUMP_OFFSET: 0,
+    IRType.JUMP_IF_FALSE: -1,
+    IRType.JUMP_IF_TRUE: -1,
+    IRType.COPY_VAL: 0,
+    IRType.REF_VAL: 0,
+    IRType.DEREF_VAL: 0,
+    IRType.ASSERT: 0,
+    IRType.IMPORT: 0,
+    IRType.BINARY_OP_VAR_INT: 1,
+    IRType.BINARY_OP_VAR_VAR: 1,
+    IRType.COMPARE_JUMP_IF_FALSE: -2,
+    IRType.COMPARE_VAR_INT_JUMP_IF_FALSE: 0,
+    IRType.COMPARE_VAR_VAR_JUMP_IF_FALSE: 0,
+}
+
+
+def thread_jumps(irs: List[IR]) -> None:
+    """跳转目标是无条件跳转时直接跳到最终目标，原地修改跳转偏移"""
+    for ip, instr in enumerate(irs):
+        if instr.ir_type not in JUMP_TYPES:
+            continue
+        target = ip + 1 + jump_offset(instr)
+        visited = {ip}
+        while (
+            target < len(irs)
+            and irs[target].ir_type == IRType.JUMP_OFFSET
+            and target not in visited
+        ):
+            visited.add(target)
+            target = target + 1 + irs[target].value
+        set_jump_offset(instr, target - ip - 1)
+
+
+def step_stack_depth(instr: IR, depths):
+    """
+    计算执行一条指令后的栈深度
+
+    Args:
+        instr: IR指令
+        depths: 每一层帧内相对帧底的栈深度，None 表示深度未知
+
+    Returns:
+        新的深度元组，帧结构无法确定时返回 None
+    """
+    ir_type = instr.ir_type
+    if ir_type == IRType.RESET_STACK:
+        return depths[:-1] + (0,)
+    if ir_type == IRType.NEW_FRAME:
+        return depths + (0,)
+    if ir_type == IRType.POP_FRAME:
+        # 弹出帧后把原来的栈顶对象压回外层帧
+        if len(depths) < 2:
+            return None
+        outer = depths[-2]
+        return depths[:-2] + (None if outer is None else outer + 1,)
+    if ir_type == IRType.BUILD_TUPLE:
+        effect = 1 - instr.value
+    elif ir_type == IRType.CALL_WITH_ARGS:
+        effect = -instr.value
+    elif ir_type in STACK_EFFECTS:
+        effect = STACK_EFFECTS[ir_type]
+    else:
+        return None
+    depth = depths[-1]
+    if depth is None:
+        return depths
+    depth += effect
+    # 低于帧底说明分析与实际不符，按未知处理
+    return depths[:-1] + (depth if depth >= 0 else None,)
+
+
+def analyze_stack_depths(irs: List[IR], stack_at_base: bool) -> list:
+    """
+    从入口开始沿控制流计算每条指令执行前的栈深度
+
+    Args:
+        irs: IR指令列表
+        stack_at_base: 入口处栈是否一定位于帧底
+
+    Returns:
+        每条指令执行前的深度元组；不可达的指令为 False，帧结构无法确定时为 None
+    """
+    states = [False] * len(irs)
+    if not irs:
+        return states
+    states[0] = (0,) if stack_at_base else (None,)
+    worklist = [0]
+    while worklist:
+        ip = worklist.pop()
+        instr = irs[ip]
+        state = states[ip]
+        after = None if state is None else step_stack_depth(instr, state)
+        successors = []
+        if instr.ir_type in JUMP_TYPES:
+            successors.append(ip + 1 + jump_offset(instr))
+        if instr.ir_type not in NO_FALLTHROUGH_TYPES:
+            successors.append(ip + 1)
+        for target in successors:
+            if target >= len(irs):
+                continue
+            old = states[target]
+            if old is False:
+                merged = after
+            elif old is None or after is None or len(old) != len(after):
+                merged = None
+            else:
+                merged = tuple(a if a == b else None for a, b in zip(old, after))
+            if merged != old or old is False:
+                states[target] = merged
+                worklist.append(target)
+    return states
+
+
+def remove_instructions(irs: List[IR], removed: set) -> List[IR]:
+    """删除指定ip的指令，跳到被删除指令的跳转改为跳到其后第一条保留的指令"""
+    result = []
+    new_index = []
+    for ip, instr in enumerate(irs):
+        new_index.append(len(result))
+        if ip not in removed:
+            result.append(instr)
+    new_index.append(len(result))
+    relink_jumps(irs, new_index)
+    return result
+
+
+def peephole(irs: List[IR], stack_at_base: bool = False) -> List[IR]:
+    """
+    窥孔优化与死代码消除，反复执行直到没有可以删除的指令
+
+    - 跳转到无条件跳转的指令直接跳到最终目标
+    - 删除偏移为 0 的 JUMP_OFFSET
+    - 删除紧接着 RESET_STACK 的常量加载
+    - 删除 RETURN 与无条件跳转之后不可达的指令
+    - 删除栈一定已经位于帧底时的 RESET_STACK
+    - 条件是布尔常量的跳转改为无条件跳转或直接删除
+
+    Args:
+        irs: 已经重定向过跳转的IR指令列表
+        stack_at_base: 入口处栈是否一定位于帧底。函数体由调用时新建的帧进入，
+            主程序可能在已有的栈上执行（见 execute_with_context），不能假设
+
+    Returns:
+        处理后的IR指令列表
+    """
+    while True:
+        thread_jumps(irs)
+        states = analyze_stack_depths(irs, stack_at_base)
+        targets = jump_targets(irs)
+        removed = set()
+        for ip, instr in enumerate(irs):
+            state = states[ip]
+            ir_type = instr.ir_type
+            if state is False:
+                removed.add(ip)
+            elif ir_type == IRType.JUMP_OFFSET and instr.value == 0:
+                removed.add(ip)
+            elif (
+                ir_type == IRType.RESET_STACK
+                and state is not None
+                and state[-1] == 0
+            ):
+                removed.add(ip)
+            elif (
+                ir_type in CONSTANT_LOAD_TYPES
+                and ip + 1 < len(irs)
+                and irs[ip + 1].ir_type == IRType.RESET_STACK
+            ):
+                removed.add(ip)
+            elif (
+                ir_type == IRType.LOAD_BOOL
+                and ip + 1 < len(irs)
+                and irs[ip + 1].ir_type in (IRType.JUMP_IF_FALSE, IRType.JUMP_IF_TRUE)
+                and ip + 1 not in targets
+            ):
+                removed.add(ip)
+                jump = irs[ip + 1]
+                if (jump.ir_type == IRType.JUMP_IF_TRUE) == bool(instr.value):
+                    jump.ir_type = IRType.JUMP_OFFSET
+                else:
+                    removed.add(ip + 1)
+        if not removed:
+            return irs
+        irs = remove_instructions(irs, removed)
+
+
+def variable_operand(instr: IR):
+    """GET_SLOT 与 GET_VAL 对应的 (变量名, 帧深度, 槽位)，其他指令返回 None"""
+    if instr.ir_type == IRType.GET_SLOT:
+        return tuple(instr.value)
+    if instr.ir_type == IRType.GET_VAL:
+        return instr.value, None, None
+    return None
+
+
+def fuse_instructions(irs: List[IR]) -> List[IR]:
+    """
+    将常见的指令序列合并为超级指令
+
+    - 变量; LOAD_INT; BINARAY_OP -> BINARY_OP_VAR_INT
+    - 变量; 变量; BINARAY_OP -> BINARY_OP_VAR_VAR
+    - BUILD_TUPLE; CALL_LAMBDA -> CALL_WITH_ARGS
+    - BUILD_TUPLE; INLINE_CALL -> 带参数个数的 INLINE_CALL
+    - 比较运算之后紧跟 JUMP_IF_FALSE 时连同跳转一起合并为
+      COMPARE_JUMP_IF_FALSE、COMPARE_VAR_INT_JUMP_IF_FALSE 或 COMPARE_VAR_VAR_JUMP_IF_FALSE
+
+    被合并的指令中除第一条外都不能是跳转目标，合并后的指令使用运算或调用指令的位置
+
+    Args:
+        irs: 已经重定向过跳转的IR指令列表
+
+    Returns:
+        处理后的IR指令列表
+    """
+    targets = jump_targets(irs)
+
+    def fusible(start, length):
+        return start + length <= len(irs) and all(
+            ip not in targets for ip in range(start + 1, start + length)
+        )
+
+    def compare_jump(ip):
+        # irs[ip] 是比较运算并且之后紧跟着可以合并的 JUMP_IF_FALSE
+        return (
+            irs[ip].value in COMPARISON_OPERATORS
+            and fusible(ip, 2)
+            and irs[ip + 1].ir_type == IRType.JUMP_IF_FALSE
+        )
+
+    result = []
+    new_index = []
+    absorbed_jumps = []  # (合并后的指令, 被合并的 JUMP_IF_FALSE 或 INLINE_CALL)
+    ip = 0
+    while ip < len(irs):
+        instr = irs[ip]
+        fused = None
+        length = 1
+        left = variable_operand(instr)
+        if (
+            left is not None
+            and fusible(ip, 3)
+            and irs[ip + 2].ir_type == IRType.BINARAY_OP
+        ):
+            operand = irs[ip + 1]
+            right = variable_operand(operand)
+            if operand.ir_type == IRType.LOAD_INT:
+                operands = [*left, operand.value]
+                fused_types = (
+                    IRType.BINARY_OP_VAR_INT,
+                    IRType.COMPARE_VAR_INT_JUMP_IF_FALSE,
+                )
+            elif right is not None:
+                operands = [*left, *right]
+                fused_types = (
+                    IRType.BINARY_OP_VAR_VAR,
+                    IRType.COMPARE_VAR_VAR_JUMP_IF_FALSE,
+                )
+            else:
+                fused_types = None
+            if fused_types is not None:
+                op_instr = irs[ip + 2]
+                if compare_jump(ip + 2):
+                    fused = IR(
+                        fused_types[1],
+                        [*operands, op_instr.value, None],
+                        op_instr.position,
+                    )
+                    absorbed_jumps.append((fused, irs[ip + 3]))
+                    length = 4
+                else:
+                    fused = IR(
+                        fused_types[0], [*operands, op_instr.value], op_instr.position
+                    )
+                    length = 3
+        elif instr.ir_type == IRType.BINARAY_OP and compare_jump(ip):
+            fused = IR(IRType.COMPARE_JUMP_IF_FALSE, [instr.value, None], instr.position)
+            absorbed_jumps.append((fused, irs[ip + 1]))
+            length = 2
+        elif (
+            instr.ir_type == IRType.BUILD_TUPLE
+            and fusible(ip, 2)
+            and irs[ip + 1].ir_type == IRType.CALL_LAMBDA
+        ):
+            fused = IR(IRType.CALL_WITH_ARGS, instr.value, irs[ip + 1].position)
+            length = 2
+        elif (
+            instr.ir_type == IRType.BUILD_TUPLE
+            and fusible(ip, 2)
+            and irs[ip + 1].ir_type == IRType.INLINE_CALL
+            and irs[ip + 1].value[1] is None
+        ):
+            call = irs[ip + 1]
+            fused = IR(
+                IRType.INLINE_CALL, [call.value[0], instr.value, None], call.position
+            )
+            absorbed_jumps.append((fused, call))
+            length = 2
+        result.append(instr if fused is None else fused)
+        new_index.extend([len(result) - 1] * length)
+        ip += length
+    new_index.append(len(result))
+    relink_jumps(irs, new_index)
+    # 被合并的跳转与合并后的指令位于同一个新ip，重新计算后的偏移可以直接使用
+    for fused, jump in absorbed_jumps:
+        set_jump_offset(fused, jump_offset(jump))
+    return result
+
+
+def copy_instruction(instr: IR) -> IR:
+    """复制指令，列表形式的参数一并复制，重新计算跳转偏移时不会影响原指令"""
+    value = instr.value
+    if isinstance(value, list):
+        value = list(value)
+    return IR(instr.ir_type, value, instr.position)
+
+
+def inline_calls(irs: List[IR], functions) -> List[IR]:
+    """
+    展开参数为函数签名的 CALL_LAMBDA：调用处改为 INLINE_CALL，之后紧跟函数体的副本
+
+    函数体中的 RETURN 与 RETURN_NONE 改为跳到函数体之后的 RETURN_INLINE，
+    TAIL_CALL 改为 CALL_LAMBDA。函数体内部的跳转是相对偏移，复制后仍然有效
+
+    Args:
+        irs: 已经重定向过跳转的IR指令列表
+        functions: 保存被内联函数指令的 Functions
+
+    Returns:
+        处理后的IR指令列表
+    """
+    result = []
+    new_index = []
+    for instr in irs:
+        new_index.append(len(result))
+        if instr.ir_type != IRType.CALL_LAMBDA or instr.value is None:
+            result.append(instr)
+            continue
+        body = functions.function_instructions[instr.value]
+        result.append(
+            IR(IRType.INLINE_CALL, [instr.value, None, len(body)], instr.position)
+        )
+        for ip, body_instr in enumerate(body):
+            # 函数体中已经内联的调用有自己的 RETURN_INLINE，原样复制
+            if body_instr.ir_type in (IRType.RETURN, IRType.RETURN_NONE):
+                result.append(
+                    IR(IRType.RETURN_INLINE, len(body) - ip - 1, body_instr.position)
+                )
+            elif body_instr.ir_type == IRType.TAIL_CALL:
+                # 展开的函数体没有可以复用的函数帧，改为普通调用
+                result.append(IR(IRType.CALL_LAMBDA, None, body_instr.position))
+            else:
+                result.append(copy_instruction(body_instr))
+    new_index.append(len(result))
+    relink_jumps(irs, new_index)
+    return result
+
+
+def optimize(
+    irs: List[IR], level: int, stack_at_base: bool = False, functions=None
+) -> List[IR]:
+    """
+    按优化等级对已经重定向过跳转的IR指令列表进行优化
+
+    Args:
+        irs: IR指令列表
+        level: 优化等级，0 表示不优化，1 表示进行常量折叠、窥孔优化与死代码消除，
+            IRGenerator 在该等级下还会省略不声明变量的代码块的帧；
+            2 表示在此基础上合并超级指令；3 表示在合并之前展开 IRGenerator
+            标记为可以内联的函数调用
+        stack_at_base: 入口处栈是否一定位于帧底，见 peephole
+        functions: 被内联函数所在的 Functions，等级 3 时使用
+
+    Returns:
+        处理后的IR指令列表
+    """
+    if level >= 1:
+        irs = fold_constants(irs)
+        irs = peephole(irs, stack_at_base)
+    if level >= 3:
+        irs = inline_calls(irs, functions)
+    if level >= 2:
+        irs = fuse_instructions(irs)
+    return irs
@@ -1,4 +1,7 @@
 class Int:
+    shared = False  # 是否是小整数缓存中共享的实例
+    used_as_key = False  # 是否是某个键布局中的键，见 key_mutated
+
     def __init__(self, value):
         self.value = int(value)
 
@@ -13,69 +16,78 @@ class Int:
 
     def __add__(self, other):
         if isinstance(other, Int):
-            return Int(self.value + other.value)
+            return small_int(self.value + other.value)
         if isinstance(other, Float):
             return Float(self.value + other.value)
-        return NoneType()
+        return NONE
 
     def __sub__(self, other):
         if isinstance(other,  Int):
-            return Int(self.value - other.value)
+            return small_int(self.value - other.value)
         if isinstance(other, Float):
             return Float(self.value - other.value)
-        return NoneType()
+        return NONE
 
     def __mul__(self, other):
         if isinstance(other, Int):
-            return Int(self.value * other.value)
+            return small_int(self.value * other.value)
         if isinstance(other, Float):
             return Float(self.value * other.value)
-        return NoneType()
+        return NONE
 
     def __truediv__(self, other):
         if isinstance(other, (Int, Float)):
             return Float(self.value / other.value)
-        return NoneType()
+        return NONE
     
     def __floordiv__(self, other):
         if isinstance(other, Int):
-            return Int(self.value // other.value)
-        return NoneType()
+            return small_int(self.value // other.value)
+        return NONE
     
     def __mod__(self, other):
         if isinstance(other, Int):
-            return Int(self.value % other.value)
-        return NoneType()
+            return small_int(self.value % other.value)
+        return NONE
 
     def __eq__(self, other):
         if isinstance(other, (Int, Float)):
-            return Bool(self.value == other.value)
-        return NoneType()
+            return boolean(self.value == other.value)
+        return NONE
     def __ne__(self, other):
-        return Bool(self.value != other.value)
+        return boolean(self.value != other.value)
+
+    def __hash__(self):
+        """
+        按值散列，与 == 相等的 Float 散列值相同
+
+        value 会被 assgin 原地修改，作为 Python 字典或集合的键之后不能再被赋值，
+        否则无法再找到；X 语言的散列表按 Map.hash_key 复制键，不受影响
+        """
+        return hash(self.value)
 
     def __lt__(self, other):
         if isinstance(other, (Int, Float)):
-            return Bool(self.value < other.value)
-        return NoneType()
+            return boolean(self.value < other.value)
+        return NONE
 
     def __le__(self, other):
         if isinstance(other, (Int, Float)):
-            return Bool(self.value <= other.value)
-        return NoneType()
+            return boolean(self.value <= other.value)
+        return NONE
 
     def __gt__(self, other):
         if isinstance(other, (Int, Float)):
-            return Bool(self.value > other.value)
-        return NoneType()
+            return boolean(self.value > other.value)
+        return NONE
 
     def __ge__(self, other):
         if isinstance(other, (Int, Float)):
-            return Bool(self.value >= other.value)
-        return NoneType()
+            return boolean(self.value >= other.value)
+        return NONE
 
     def __neg__(self):
-        return Int(-self.value)
+        return small_int(-self.value)
 
     def __bool__(self):
         return bool(self.value)
@@ -89,7 +101,12 @@ class Int:
     def assgin(self, value):
         if not isinstance(value, (Int, Float)):
             raise ValueError("Cannot assign value to Int")
+        if self.shared:
+            # 共享的实例只会是栈上的临时值，对它赋值没有可见的效果
+            return
         self.value = value.value
+        if self.used_as_key:
+            key_mutated()
 
     def object_ref(self):
         return self
@@ -99,6 +116,8 @@ class Int:
 
 
 class Float:
+    used_as_key = False
+
     def __init__(self, value):
         self.value = float(value)
 
@@ -114,60 +133,64 @@ class Float:
     def __add__(self, other):
         if isinstance(other, (Float, Int)):
             return Float(self.value + other.value)
-        return NoneType()
+        return NONE
 
     def __sub__(self, other):
         if isinstance(other, (Float, Int)):
             return Float(self.value - other.value)
-        return NoneType()
+        return NONE
 
     def __mul__(self, other):
         if isinstance(other, (Float, Int)):
             return Float(self.value * other.value)
-        return NoneType()
+        return NONE
 
     def __truediv__(self, other):
         if isinstance(other, (Float, Int)):
             return Float(self.value / other.value)
-        return NoneType()
+        return NONE
     
     def __floordiv__(self, other):
         if isinstance(other, (Float, Int)):
             return Float(self.value // other.value)
-        return NoneType()
+        return NONE
     
     def __mod__(self, other):
         if isinstance(other, (Float, Int)):
             return Float(self.value % other.value)
-        return NoneType()
+        return NONE
 
     def __eq__(self, other):
         if not isinstance(other, (Float, Int)):
             return False
-        return Bool(self.value == other.value)
+        return boolean(self.value == other.value)
 
     def __ne__(self, other):
-        return Bool(self.value != other.value)
+        return boolean(self.value != other.value)
+
+    def __hash__(self):
+        # 与 Int.__hash__ 相同，作为键之后不能再被赋值
+        return hash(self.value)
 
     def __lt__(self, other):
         if isinstance(other, (Float, Int)):
-            return Bool(self.value < other.value)
-        return NoneType()
+            return boolean(self.value < other.value)
+        return NONE
 
     def __le__(self, other):
         if isinstance(other, (Float, Int)):
-            return Bool(self.value <= other.value)
-        return NoneType()
+            return boolean(self.value <= other.value)
+        return NONE
 
     def __gt__(self, other):
         if isinstance(other, (Float, Int)):
-            return Bool(self.value > other.value)
-        return NoneType()
+            return boolean(self.value > other.value)
+        return NONE
 
     def __ge__(self, other):
         if isinstance(other, (Float, Int)):
-            return Bool(self.value >= other.value)
-        return NoneType()
+            return boolean(self.value >= other.value)
+        return NONE
     
     def __neg__(self):
         return Float(-self.value)
@@ -185,6 +208,8 @@ class Float:
         if not isinstance(value, (Float, Int)):
             raise ValueError("Cannot assign value to Float")
         self.value = value.value
+        if self.used_as_key:
+            key_mutated()
 
     def object_ref(self):
         return self
@@ -194,6 +219,9 @@ class Float:
 
 
 class Bool:
+    shared = False  # 是否是执行器共享的 TRUE 或 FALSE
+    used_as_key = False
+
     def __init__(self, value):
         self.value = bool(value)
 
@@ -208,22 +236,25 @@ class Bool:
 
     def __eq__(self, other):
         if not isinstance(other, Bool):
-            return Bool(False)
-        return Bool(self.value == other.value)
+            return FALSE
+        return boolean(self.value == other.value)
 
     def __ne__(self, other):
-        return Bool(self.value != other.value)
+        return boolean(self.value != other.value)
 
+    def __hash__(self):
+        # 与 Int.__hash__ 相同，作为键之后不能再被赋值
+        return hash(self.value)
 
     def __and__(self, other):
         if not isinstance(other, Bool):
-            return NoneType()
-        return Bool(self.value and other.value)
+            return NONE
+        return boolean(self.value and other.value)
     
     def __or__(self, other):
         if not isinstance(other, Bool):
-            return NoneType()
-        return Bool(self.value or other.value)
+            return NONE
+        return boolean(self.value or other.value)
 
     def __bool__(self):
         return self.value
@@ -237,7 +268,11 @@ class Bool:
     def assgin(self, value):
         if not isinstance(value, Bool):
             raise ValueError("Cannot assign value to Bool")
+        if self.shared:
+            return
         self.value = value.value
+        if self.used_as_key:
+            key_mutated()
 
     def object_ref(self):
         return self
@@ -247,6 +282,8 @@ class Bool:
 
 
 class String:
+    used_as_key = False
+
     def __init__(self, value):
         self.value = str(value)
 
@@ -262,32 +299,38 @@ class String:
     def __add__(self, other):
         if isinstance(other, String):
             return String(self.value + other.value)
-        return NoneType()
+        return NONE
 
     def __eq__(self, other):
         if not isinstance(other, String):
-            return Bool(False)
-        return Bool(self.value == other.value)
+            return FALSE
+        return boolean(self.value == other.value)
 
     def __ne__(self, other):
-        return Bool(self.value != other.value)
+        return boolean(self.value != other.value)
 
     def __len__(self):
-        return Int(len(self.value))
+        return small_int(len(self.value))
 
     def __getitem__(self, index):
         return String(self.value[index])
 
     def __contains__(self, item):
         if isinstance(item, String):
-            return Bool(item.value in self.value)
-        return Bool(item in self.value)
+            return boolean(item.value in self.value)
+        return boolean(item in self.value)
 
     def __bool__(self):
-        return Bool(self.value)
+        return bool(self.value)
+
+    def __hash__(self):
+        # 与 Int.__hash__ 相同，作为键之后不能再被赋值
+        return hash(self.value)
 
     def assgin(self, value):
         self.value = value.value
+        if self.used_as_key:
+            key_mutated()
 
     def object_ref(self):
         return self
@@ -306,13 +349,16 @@ class NoneType:
         return str(self)
 
     def __bool__(self):
-        return Bool(False)
+        return False
 
     def __eq__(self, other):
-        return Bool(isinstance(other, NoneType))
+        return boolean(isinstance(other, NoneType))
     
     def __ne__(self, other):
-        return Bool(not isinstance(other, NoneType))
+        return boolean(not isinstance(other, NoneType))
+
+    def __hash__(self):
+        return hash(None)
 
     def object_ref(self):
         return self
@@ -321,13 +367,52 @@ class NoneType:
         raise ValueError("Cannot assign value to NoneType")
 
     def copy(self):
-        return NoneType()
+        return NONE
+
+
+# 共享的实例：执行器把它们压入操作数栈而不是每次新建。
+# 操作数栈上的值可以是共享的，变量、元组元素、键值对等存储位置中的值则不可以，
+# 写入存储位置时由 owned 换成新的副本，因此 assgin 原地修改的总是存储位置自己的值。
+# NoneType 不能被赋值，NONE 不需要复制
+NONE = NoneType()
+TRUE = Bool(True)
+FALSE = Bool(False)
+TRUE.shared = True
+FALSE.shared = True
+
+# 与 CPython 相同，缓存 -5 到 256 的整数
+SMALL_INT_MIN = -5
+SMALL_INT_MAX = 256
+SMALL_INTS = [Int(i) for i in range(SMALL_INT_MIN, SMALL_INT_MAX + 1)]
+for _small_int in SMALL_INTS:
+    _small_int.shared = True
+del _small_int
+
+SHARED_TYPES = (Int, Bool)
+
+
+def boolean(value):
+    return TRUE if value else FALSE
+
+
+def small_int(value):
+    """与 Int(value) 相等的值，小整数返回共享的实例"""
+    if type(value) is int and SMALL_INT_MIN <= value <= SMALL_INT_MAX:
+        return SMALL_INTS[value - SMALL_INT_MIN]
+    return Int(value)
+
+
+def owned(value):
+    """写入存储位置的值，共享的实例换成新的副本"""
+    if type(value) in SHARED_TYPES and value.shared:
+        return value.copy()
+    return value
 
 
 class KeyValue:
     def __init__(self, key, value):
-        self.key = key
-        self.value = value
+        self.key = owned(key)
+        self.value = owned(value)
 
     def __str__(self):
         return f"{self.key}: {self.value}"
@@ -338,25 +423,106 @@ class KeyValue:
     def check_key(self, key):
         return self.key.value == key.value
 
+    def __eq__(self, other):
+        return Bool(values_equal(self, other))
+
+    def __ne__(self, other):
+        return Bool(not values_equal(self, other))
+
     def copy(self):
         return KeyValue(self.key.copy(), self.value.copy())
 
     def assgin(self, value):
-        self.value = value
+        self.value = owned(value)
 
     def object_ref(self):
         return self
-    def get_member(self, key):
-        return self.value.object_ref().get_member(key)
+    def get_member(self, key, cache=None):
+        return self.value.object_ref().get_member(key, cache)
 
 class Lambda:
-    def __init__(self, code_position, default_args_tuple, signature, lambda_ir_table, lambda_ir):
+    def __init__(self, code_position, default_args_tuple, signature, code):
         self.code_position = code_position
         self.signature = signature
         self.default_args_tuple = default_args_tuple
         self.self_object = NoneType()
-        self.lambda_ir_table = lambda_ir_table # 用于存储 lambda 函数的 IR 的映射表
-        self.lambda_ir = lambda_ir # 用于存储 lambda 函数的 IR
+        self.code = code # 函数的代码对象
+        self.parameter_layout = self.build_parameter_layout()
+
+    def build_parameter_layout(self):
+        """
+        默认参数都是以字符串为键的 Named 时返回参数名 -> 位置的映射，否则返回 None
+
+        同名参数只记录第一个，与 Tuple.assgin_members 查找键的顺序一致。
+        参数名与元组的键一样被标记为 used_as_key，被修改后按 Tuple.key_version 重新建立
+        """
+        self.layout_version = Tuple.key_version
+        if not isinstance(self.default_args_tuple, Tuple):
+            return None
+        layout = {}
+        for i, param in enumerate(self.default_args_tuple.value):
+            if not (isinstance(param, Named) and isinstance(param.key, String)):
+                return None
+            param.key.used_as_key = True
+            layout.setdefault(param.key.value, i)
+        return layout
+
+    def get_parameter_layout(self):
+        """参数名被修改过时先重新建立 parameter_layout"""
+        if self.layout_version != Tuple.key_version:
+            self.parameter_layout = self.build_parameter_layout()
+        return self.parameter_layout
+
+    def assgin_arguments(self, args):
+        """
+        将调用参数赋值给默认参数，结果与 default_args_tuple.assgin_members(args) 相同
+
+        具名参数通过 parameter_layout 直接找到位置，不再逐个比较键；
+        不认识的具名参数同样追加到默认参数的末尾，并记录到 parameter_layout 中
+        """
+        layout = self.get_parameter_layout()
+        if layout is None or any(
+            isinstance(arg, Named) and not isinstance(arg.key, String)
+            for arg in args.value
+        ):
+            try:
+                self.default_args_tuple.assgin_members(args)
+            finally:
+                self.parameter_layout = self.build_parameter_layout()
+            return
+        params = self.default_args_tuple.value
+        count = len(params)
+        assigned = None  # 被具名参数赋值的位置，只有出现具名参数时才需要
+        index = 0
+        for arg in args.value:
+            if not isinstance(arg, Named):
+                continue
+            if assigned is None:
+                assigned = [False] * count
+            position = layout.get(arg.key.value)
+            if position is None:
+                layout[arg.key.value] = len(params)
+                arg.key.used_as_key = True
+                params.append(arg)
+                self.default_args_tuple.invalidate_layout()
+                continue
+            params[position].value = arg.value
+            if position < count:
+                assigned[position] = True
+        for arg in args.value:
+            if isinstance(arg, Named):
+                continue
+            # 跳过已经被具名参数赋值的位置
+            if assigned is not None:
+                while index < count and assigned[index]:
+                    index += 1
+            if index < len(params):
+                params[index].assgin(arg.object_ref())
+                index += 1
+            else:
+                params.append(arg)
+                self.default_args_tuple.invalidate_layout()
+                self.parameter_layout = None  # 不是 Named 的参数，之后按原来的方式处理
 
     def __str__(self):
         return f"Lambda({self.signature}, default_args = {self.default_args_tuple}, self = {self.self_object}, code_position = {self.code_position})"
@@ -371,12 +537,83 @@ class Lambda:
         return self
 
     def copy(self):
-        return Lambda(self.code_position, self.default_args_tuple.copy(), self.signature, self.lambda_ir_table, self.lambda_ir)
+        return Lambda(self.code_position, self.default_args_tuple.copy(), self.signature, self.code)
+
+
+# 可以作为键索引的键的值类型，它们的 value 都是可散列的 Python 值，
+# 散列表按 == 查找的结果与 check_key 逐个比较的结果相同
+SCALAR_TYPES = (String, Int, Float, Bool, NoneType)
+
+
+def key_mutated():
+    """作为键的标量的值被原地修改后调用，所有元组与参数的键布局在下次查找时重新建立"""
+    Tuple.key_version += 1
+
+
+def values_equal(left, right):
+    """
+    结构相等，结果与 left == right 的真值相同，但直接返回 Python 的 bool，
+    比较元组与散列表时不再为每个元素创建 Bool
+    """
+    if left is right:
+        return True
+    left_type = type(left)
+    right_type = type(right)
+    if left_type is Int or left_type is Float:
+        return (right_type is Int or right_type is Float) and left.value == right.value
+    if left_type is String or left_type is Bool:
+        return right_type is left_type and left.value == right.value
+    if left_type is NoneType:
+        return right_type is NoneType
+    if left_type is Tuple:
+        if right_type is not Tuple or len(left.value) != len(right.value):
+            return False
+        for left_item, right_item in zip(left.value, right.value):
+            if not values_equal(left_item, right_item):
+                return False
+        return True
+    if left_type is KeyValue or left_type is Named:
+        return (
+            right_type is left_type
+            and values_equal(left.key.object_ref(), right.key.object_ref())
+            and values_equal(left.value.object_ref(), right.value.object_ref())
+        )
+    if left_type is Map:
+        if right_type is not Map or left.value.keys() != right.value.keys():
+            return False
+        for key, value in left.value.items():
+            if not values_equal(value, right.value[key]):
+                return False
+        return True
+    # 其余的值按它们自己的 == 比较，结果不是 Bool 时视为不相等
+    result = left == right
+    if isinstance(result, Bool):
+        return result.value
+    return result is True
+
+
+class MemberCache:
+    # GET_ATTR 的内联缓存：上次查找的元组形状、键与成员的下标
+    # 只在元组当前的形状与 shape 相同时命中；键被原地修改后 member_index 先按
+    # Tuple.key_version 重建形状，旧的缓存因此不会再命中
+    __slots__ = ("shape", "key", "index")
+
+    def __init__(self):
+        self.shape = None
+        self.key = None
+        self.index = None
 
 
 class Tuple:
+    # 作为键的标量被原地修改的次数，与建立键布局时记录的不同时布局已经失效
+    key_version = 0
+
     def __init__(self, values):
         self.value = values
+        # 键的布局，由 build_layout 在第一次按键查找时建立
+        self.shape = None
+        self.key_index = None
+        self.layout_version = None
         for value in values:
             if isinstance(value, Named) and isinstance(value.value, Lambda):
                 value.value.self_object = self  # 传递调用者，以便在 Lambda 中访问 Tuple 的值
@@ -391,7 +628,8 @@ class Tuple:
         return self.value[index]
 
     def __setitem__(self, index, value):
-        self.value[index] = value
+        self.value[index] = owned(value)
+        self.invalidate_layout()
 
     def __len__(self):
         return len(self.value)
@@ -403,31 +641,90 @@ class Tuple:
         return item in self.value
 
     def __eq__(self, other):
-        if not isinstance(other, Tuple):
-            return Bool(False)
-        return self.value == other.value
+        return Bool(values_equal(self, other))
 
     def __ne__(self, other):
-        return not self.__eq__(other)
+        return Bool(not values_equal(self, other))
+
+    # 元组会被原地修改（set_member、assgin 等），按内容散列的键会在修改后失效，
+    # 因此元组不可散列，按结构比较使用 values_equal
+    __hash__ = None
 
     def __add__(self, other):
         if not isinstance(other, Tuple):
             return NoneType()
         return Tuple(self.value + other.value)
 
-    def get_member(self, key):
-        for value in self.value:
-            if value.check_key(key):
-                return value.value
+    def build_layout(self):
+        """
+        建立元组的键布局：形状是按顺序排列的所有元素的键，键索引是键 -> 第一个该键的元素的下标。
+        有元素不是 Named 或 KeyValue、或者键不是可散列的标量时两者都为 False，按顺序逐个比较键
+
+        键对象会被标记为 used_as_key，它们之后被原地修改（如 (keyof t[0]) = "c"）时
+        key_mutated 使所有元组的布局失效
+        """
+        self.layout_version = Tuple.key_version
+        keys = []
+        key_index = {}
+        for i, value in enumerate(self.value):
+            if type(value) not in (Named, KeyValue) or type(value.key) not in SCALAR_TYPES:
+                self.shape = self.key_index = False
+                return
+            value.key.used_as_key = True
+            key = value.key.value
+            keys.append(key)
+            key_index.setdefault(key, i)
+        self.shape = tuple(keys)
+        self.key_index = key_index
+
+    def invalidate_layout(self):
+        # 增删或替换元素后调用，下次按键查找时重新建立
+        self.shape = None
+        self.key_index = None
+
+    def member_index(self, key, cache=None):
+        """
+        查找键对应的元素下标，形状与键都与内联缓存相同时直接使用缓存的下标。
+        找不到键时返回 -1，元组或键不能建立索引时返回 None，由调用者逐个比较键
+        """
+        if self.key_index is None or self.layout_version != Tuple.key_version:
+            self.build_layout()
+        if self.key_index is False or type(key) not in SCALAR_TYPES:
+            return None
+        name = key.value
+        shape = self.shape
+        if cache is not None and cache.key == name:
+            if cache.shape is shape or cache.shape == shape:
+                return cache.index
+        index = self.key_index.get(name, -1)
+        if cache is not None and index >= 0:
+            cache.shape = shape
+            cache.key = name
+            cache.index = index
+        return index
+
+    def get_member(self, key, cache=None):
+        index = self.member_index(key, cache)
+        if index is None:
+            for value in self.value:
+                if value.check_key(key):
+                    return value.value
+        elif index >= 0:
+            return self.value[index].value
         raise KeyError(f"'{key}' not found in Tuple")
 
-    def set_member(self, key, value):
-        for item in self.value:
-            if item.check_key(key):
-                item.value = value
-                return
+    def set_member(self, key, value, cache=None):
+        index = self.member_index(key, cache)
+        if index is None:
+            for item in self.value:
+                if item.check_key(key):
+                    item.value = owned(value)
+                    return
+        elif index >= 0:
+            self.value[index].value = owned(value)
+            return
         raise KeyError(f"'{key}' not found in Tuple")
-    
+
     def copy(self):
         copyed_values = []
         for value in self.value:
@@ -438,6 +735,7 @@ class Tuple:
         if not isinstance(value, Tuple):
             raise ValueError("Cannot assign value to Tuple")
         self.value = value.value.copy() # 浅拷贝
+        self.invalidate_layout()
 
     def object_ref(self):
         return self
@@ -445,6 +743,8 @@ class Tuple:
     def assgin_members(self, tuple):
         # 先尝试将所有 named args 对按照 key 进行赋值
         # 剩下的值按照顺序赋值
+        # 未匹配的值会追加到末尾，元组的键布局随之改变
+        self.invalidate_layout()
 
         # 分离 key-value 对和普通值
         key_values = []
@@ -493,10 +793,107 @@ class Tuple:
                 self.value.append(value)
 
 
+# 散列表的键按 (类型标签, Python 值) 散列：Int 与 Float 共用一个标签，
+# 与 1 == 1.0 一致；Bool 的标签不同，true 与 1 是不同的键，与 true == 1 为假一致
+MAP_KEY_TAGS = {Int: Int, Float: Int, Bool: Bool, String: String, NoneType: NoneType}
+
+
+class Map:
+    # 散列表：键是 SCALAR_TYPES 中的标量，插入、查找与删除都是 O(1)
+    # value 是 hash_key(键) -> 值的字典，key_objects 记录每一项第一次插入时的键对象
+    def __init__(self):
+        self.value = {}
+        self.key_objects = {}
+
+    def __str__(self):
+        items = ", ".join(
+            f"{self.key_objects[key]}: {value}" for key, value in self.value.items()
+        )
+        return f"Map({{{items}}})"
+
+    def __repr__(self):
+        return str(self)
+
+    def hash_key(self, key):
+        tag = MAP_KEY_TAGS.get(type(key))
+        if tag is None:
+            raise ValueError(f"Map key must be Int, Float, String, Bool or None, but got {key}")
+        return (tag, key.value)
+
+    def __getitem__(self, key):
+        return self.get_member(key)
+
+    def __setitem__(self, key, value):
+        self.set_member(key, value)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __contains__(self, key):
+        return self.hash_key(key) in self.value
+
+    def __eq__(self, other):
+        return Bool(values_equal(self, other))
+
+    def __ne__(self, other):
+        return Bool(not values_equal(self, other))
+
+    def get_member(self, key, cache=None):
+        try:
+            return self.value[self.hash_key(key)]
+        except KeyError:
+            raise KeyError(f"'{key}' not found in Map")
+
+    def set_member(self, key, value, cache=None):
+        hashed = self.hash_key(key)
+        if hashed not in self.key_objects:
+            # 键对象可能是之后还会被赋值的变量，保存副本
+            self.key_objects[hashed] = key.copy()
+        self.value[hashed] = owned(value)
+
+    def remove(self, key):
+        """删除键并返回它的值"""
+        hashed = self.hash_key(key)
+        try:
+            value = self.value.pop(hashed)
+        except KeyError:
+            raise KeyError(f"'{key}' not found in Map")
+        del self.key_objects[hashed]
+        return value
+
+    def keys(self):
+        return Tuple([key.copy() for key in self.key_objects.values()])
+
+    def values(self):
+        return Tuple(list(self.value.values()))
+
+    def items(self):
+        """(键对象, 值) 的迭代器"""
+        key_objects = self.key_objects
+        return ((key_objects[key], value) for key, value in self.value.items())
+
+    def copy(self):
+        result = Map()
+        result.value = {key: value.copy() for key, value in self.value.items()}
+        result.key_objects = {key: obj.copy() for key, obj in self.key_objects.items()}
+        return result
+
+    def assgin(self, value):
+        if not isinstance(value, Map):
+            raise ValueError("Cannot assign value to Map")
+        # 浅拷贝
+        self.value = value.value.copy()
+        self.key_objects = value.key_objects.copy()
+
+    def object_ref(self):
+        return self
+
+
 class GetAttr:
-    def __init__(self, obj, key):
+    def __init__(self, obj, key, cache=None):
         self.obj = obj
         self.key = key
+        self.cache = cache  # 产生它的 GET_ATTR 指令的内联缓存
 
     def __str__(self):
         return f"{self.obj}.{self.key}"
@@ -508,16 +905,16 @@ class GetAttr:
         return self.obj.copy()
 
     def object_ref(self):
-        return self.obj.object_ref().get_member(self.key).object_ref()
+        return self.obj.object_ref().get_member(self.key, self.cache).object_ref()
 
     def assgin(self, value):
-        self.obj.object_ref().set_member(self.key, value)
+        self.obj.object_ref().set_member(self.key, value, self.cache)
 
 
 class IndexOf:
     def __init__(self, obj, index):
         self.obj = obj
-        self.index = index
+        self.index = index  # 下标或键的对象
 
     def __str__(self):
         return f"{self.obj}[{self.index}]"
@@ -526,16 +923,22 @@ class IndexOf:
         return str(self)
 
     def __call__(self):
-        return self.obj.value[self.index]
+        return self.obj.value[self.index.value]
 
     def copy(self):
         return self.obj.copy()
 
+    def item_key(self, obj):
+        # 散列表按键对象查找，保留键的类型；元组与字符串按下标的 Python 值
+        return self.index if type(obj) is Map else self.index.value
+
     def object_ref(self):
-        return self.obj.object_ref()[self.index].object_ref()
+        obj = self.obj.object_ref()
+        return obj[self.item_key(obj)].object_ref()
 
     def assgin(self, value):
-        self.obj.object_ref()[self.index] = value
+        obj = self.obj.object_ref()
+        obj[self.item_key(obj)] = value
 
 
 class BuiltIn:
@@ -565,7 +968,7 @@ class BuiltIn:
 
 class Ref:
     def __init__(self, value):
-        self.value = value
+        self.value = owned(value)
 
     def __str__(self):
         return f"Ref({self.value})"
@@ -580,7 +983,7 @@ class Ref:
         return self
 
     def assgin(self, value):
-        self.value = value
+        self.value = owned(value)
 
     def __eq__(self, other):
         return Bool(self.value == other.value)
@@ -593,8 +996,8 @@ class Ref:
 
 class Named:
     def __init__(self, key, value):
-        self.key = key
-        self.value = value
+        self.key = owned(key)
+        self.value = owned(value)
 
     def __str__(self):
         return f"{self.key} => {self.value}"
@@ -605,22 +1008,28 @@ class Named:
     def copy(self):
         return Named(self.key.copy(), self.value.copy())
 
+    def __eq__(self, other):
+        return Bool(values_equal(self, other))
+
+    def __ne__(self, other):
+        return Bool(not values_equal(self, other))
+
     def object_ref(self):
         return self
 
     def assgin(self, value):
-        self.value = value
+        self.value = owned(value)
 
     def check_key(self, key):
         return self.key.value == key.value
     
-    def get_member(self, key):
-        return self.value.get_member(key)
+    def get_member(self, key, cache=None):
+        return self.value.get_member(key, cache)
 
 class Variable:
     # 包装变量，用于在 Context 中存储变量
     def __init__(self, value):
-        self.value = value
+        self.value = owned(value)
 
     def __str__(self):
         return f"Variable({self.value})"
@@ -641,7 +1050,7 @@ class Variable:
 class Wrap:
     # 包装变量，用于在 Context 中存储变量
     def __init__(self, value):
-        self.value = value
+        self.value = owned(value)
 
     def __str__(self):
         return f"Wrap({self.value})"
@@ -656,4 +1065,4 @@ class Wrap:
         return self
 
     def assgin(self, value):
-        self.value = value
+        self.value = owned(value)
@@ -1,17 +1,136 @@
 from .ast import XLangASTNode, XLangASTNodeTypes
 from ..ir.IR import IRType, IR, Functions
+from ..ir.optimizer import optimize
 from typing import List
 
 
+def collect_let_names(node, names):
+    """收集会在当前帧中 let 的变量名，不进入新建帧的 BODY 和函数体"""
+    if not isinstance(node, XLangASTNode):
+        return names
+    if node.node_type == XLangASTNodeTypes.BODY:
+        return names
+    if node.node_type == XLangASTNodeTypes.FUNCTION_DEF:
+        return collect_let_names(node.children[0], names)
+    if node.node_type == XLangASTNodeTypes.LET:
+        names.add(node.children[0].children)
+    if isinstance(node.children, XLangASTNode):
+        collect_let_names(node.children, names)
+    elif isinstance(node.children, list):
+        for child in node.children:
+            collect_let_names(child, names)
+    return names
+
+
+def child_nodes(node):
+    """节点的直接子节点，忽略运算符、修饰符等字符串"""
+    if isinstance(node.children, XLangASTNode):
+        return [node.children]
+    if isinstance(node.children, list):
+        return [child for child in node.children if isinstance(child, XLangASTNode)]
+    return []
+
+
+def references_variable(node, name):
+    """节点中是否出现名为 name 的变量"""
+    if node.node_type == XLangASTNodeTypes.VARIABLE and node.children == name:
+        return True
+    return any(references_variable(child, name) for child in child_nodes(node))
+
+
+def collect_inline_candidates(root):
+    """
+    找出编译单元中可以内联的函数
+
+    变量只被 := 定义一次、值是函数定义、从未被赋值，并且除了定义之外只作为被调用的函数出现，
+    函数本身也不引用该变量（不递归）。使用 import 的编译单元中变量可能被导入的代码修改，
+    不进行内联
+
+    Returns:
+        变量名 -> 函数定义节点
+    """
+    lets = {}
+    escaped = set()  # 被赋值或者以调用之外的方式使用的变量
+    has_import = False
+
+    def visit(node):
+        nonlocal has_import
+        node_type = node.node_type
+        children = child_nodes(node)
+        if node_type == XLangASTNodeTypes.MODIFY and node.children[0] == "import":
+            has_import = True
+        elif node_type == XLangASTNodeTypes.VARIABLE:
+            escaped.add(node.children)
+        elif node_type == XLangASTNodeTypes.LET:
+            lets.setdefault(node.children[0].children, []).append(node.children[1])
+            children = children[1:]
+        elif node_type == XLangASTNodeTypes.ASSIGN:
+            if node.children[0].node_type == XLangASTNodeTypes.VARIABLE:
+                escaped.add(node.children[0].children)
+        elif node_type == XLangASTNodeTypes.FUNCTION_CALL:
+            if node.children[0].node_type == XLangASTNodeTypes.VARIABLE:
+                children = children[1:]
+        for child in children:
+            visit(child)
+
+    visit(root)
+    if has_import:
+        return {}
+    candidates = {}
+    for name, values in lets.items():
+        if len(values) != 1 or name in escaped:
+            continue
+        value = values[0]
+        if value.node_type != XLangASTNodeTypes.FUNCTION_DEF:
+            continue
+        if references_variable(value, name):
+            continue
+        candidates[name] = value
+    return candidates
+
+
+def is_bool_expression(node):
+    """节点的值是否一定是 Bool：布尔字面量、not 以及 and/or 的结果"""
+    if node.node_type == XLangASTNodeTypes.BOOLEN:
+        return True
+    if node.node_type == XLangASTNodeTypes.OPERATION:
+        if len(node.children) == 2:
+            return node.children[0] == "not"
+        return node.children[1] in ("and", "or")
+    return False
+
+
+class VariableScope:
+    # 编译期的变量作用域，与运行时的一个帧对应
+    def __init__(self, names, conditional_depth):
+        self.names = names  # 该帧中可能被 let 的所有变量名
+        self.slots = {}  # 变量名 -> 槽位
+        self.defined = set()  # 在当前位置一定已经 let 过的变量名
+        self.conditional_depth = conditional_depth  # 进入该帧时的条件嵌套深度
+        self.inline_functions = {}  # 变量名 -> 可以内联的函数签名
+
+
 class IRGenerator:
 
-    def __init__(self, functions, namespace="__MAIN__"):
+    def __init__(
+        self, functions, namespace="__MAIN__", optimization_level=0, inline_threshold=24
+    ):
         self.function_signture_counter = 0
         self.namespace = namespace
         self.functions = functions
         self.scope_stack = []  # 元素形式: (类型, 附加信息)
         # 类型可以是: 'loop', 'frame', 'function'等
         self.label_counter = 0
+        self.variable_scopes = []  # 当前函数内的变量作用域，最后一个对应栈顶帧
+        self.conditional_depth = 0  # 当前代码所处的条件分支/循环体嵌套深度
+        self.optimization_level = optimization_level  # 见 xlang.ir.optimizer.optimize
+        # 当前节点是否处于语句位置：从当前帧底到栈顶的值在之后都不会再被使用
+        self.at_frame_base = False
+        self.function_body = False  # 生成的是否是函数体，主程序中没有可以复用的函数帧
+        # 函数体不超过该指令数时在调用处内联，见 xlang.ir.optimizer.inline_calls
+        self.inline_threshold = inline_threshold
+        # 编译单元中可以内联的函数，由最外层的 generate 计算并传给函数体的生成器
+        self.inline_candidates = None
 
     def label_generator(self):
         self.label_counter += 1
@@ -21,6 +140,53 @@ class IRGenerator:
         self.function_signture_counter += 1
         return f"{self.namespace}::__function_{self.function_signture_counter}__"
 
+    def resolve_variable(self, name):
+        """
+        尝试在编译期确定变量所在的帧和槽位
+
+        只有在某个帧中一定已经 let 过、且更内层的帧都不可能 let 同名变量时才能确定，
+        否则返回 None，运行时按名字查找
+
+        Returns:
+            (帧深度, 槽位) 或 None
+        """
+        for depth, scope in enumerate(reversed(self.variable_scopes)):
+            if name in scope.defined:
+                return depth, scope.slots[name]
+            if name in scope.names:
+                return None
+        return None
+
+    def let_variable(self, name):
+        """为当前帧中 let 的变量分配槽位，无条件执行的 let 之后该变量可以静态访问"""
+        scope = self.variable_scopes[-1]
+        if name not in scope.slots:
+            scope.slots[name] = len(scope.slots)
+        if self.conditional_depth == scope.conditional_depth:
+            scope.defined.add(name)
+        return scope.slots[name]
+
+    def inline_signature(self, func_node):
+        """被调用的函数可以在调用处内联时返回其签名，否则返回 None"""
+        if self.optimization_level < 3 or not self.inline_candidates:
+            return None
+        if func_node.node_type != XLangASTNodeTypes.VARIABLE:
+            return None
+        name = func_node.children
+        if name not in self.inline_candidates:
+            return None
+        # 只有静态确定的变量一定来自唯一的那次定义
+        location = self.resolve_variable(name)
+        if location is None:
+            return None
+        scope = self.variable_scopes[-1 - location[0]]
+        signature = scope.inline_functions.get(name)
+        if signature is None:
+            return None
+        if len(self.functions.function_instructions[signature]) > self.inline_threshold:
+            return None
+        return signature
+
     def generate_debug_info(self, node: XLangASTNode) -> IR:
         return IR(IRType.DEBUG_INFO, {
             "code_position": node.node_position,
@@ -31,18 +197,44 @@ class IRGenerator:
 
         debug_info = self.generate_debug_info(node)
 
+        # 子节点默认不处于语句位置，需要的分支在生成子节点前重新设置
+        at_frame_base = self.at_frame_base
+        self.at_frame_base = False
+
         if node_type == XLangASTNodeTypes.BODY:
             irs = []
             irs.append(debug_info)
+            names = set()
+            for child in node.children:
+                collect_let_names(child, names)
+
+            # 处于语句位置且不声明变量的代码块不新建帧：帧中不会有变量，
+            # 块内 RESET_STACK 清除的也只是之后不会再使用的值。
+            # 省略的帧不记入 scope_stack 与 variable_scopes，break/continue
+            # 弹出的帧数和变量的帧深度都与运行时一致
+            if (
+                self.optimization_level >= 1
+                and at_frame_base
+                and not names
+                and node.children
+            ):
+                for child in node.children:
+                    self.at_frame_base = True
+                    irs.extend(self.generate_without_redirect(child))
+                return irs
+
             irs.append(IR(IRType.NEW_FRAME))
 
             # 记录进入新作用域
             self.scope_stack.append(("frame", None))
+            self.variable_scopes.append(VariableScope(names, self.conditional_depth))
 
             for child in node.children:
+                self.at_frame_base = True
                 irs.extend(self.generate_without_redirect(child))
 
             # 离开作用域
+            self.variable_scopes.pop()
             self.scope_stack.pop()
 
             irs.append(IR(IRType.POP_FRAME))
@@ -61,8 +253,14 @@ class IRGenerator:
             # 解析函数体IR
             signture = self.function_signature_generator(node)
 
-            generator = IRGenerator(self.functions, signture)
-            body_ir = generator.generate(node.children[1])
+            generator = IRGenerator(
+                self.functions,
+                signture,
+                self.optimization_level,
+                self.inline_threshold,
+            )
+            generator.inline_candidates = self.inline_candidates
+            body_ir = generator.generate(node.children[1], function_body=True)
             body_ir.append(IR(IRType.RETURN_NONE))
             # 生成函数定义IR
 
@@ -83,14 +281,27 @@ class IRGenerator:
         elif node_type == XLangASTNodeTypes.VARIABLE:
             irs = []
             irs.append(debug_info)
-            irs.append(IR(IRType.GET_VAL, node.children))
+            location = self.resolve_variable(node.children)
+            if location is None:
+                irs.append(IR(IRType.GET_VAL, node.children))
+            else:
+                irs.append(IR(IRType.GET_SLOT, [node.children, location[0], location[1]]))
             return irs
 
         elif node_type == XLangASTNodeTypes.LET:
             irs = []
             irs.append(debug_info)
-            irs.extend(self.generate_without_redirect(node.children[1]))
-            irs.append(IR(IRType.LET_VAL, node.children[0].children))
+            value = self.generate_without_redirect(node.children[1])
+            irs.extend(value)
+            name = node.children[0].children
+            if self.variable_scopes:
+                irs.append(IR(IRType.LET_SLOT, [name, self.let_variable(name)]))
+                if self.inline_candidates and name in self.inline_candidates:
+                    # 函数定义的最后一条指令是 LOAD_LAMBDA
+                    signature = value[-1].value[0]
+                    self.variable_scopes[-1].inline_functions[name] = signature
+            else:
+                irs.append(IR(IRType.LET_VAL, name))
             return irs
 
         elif node_type == XLangASTNodeTypes.FUNCTION_CALL:
@@ -98,7 +309,7 @@ class IRGenerator:
             irs.append(debug_info)
             for child in node.children:
                 irs.extend(self.generate_without_redirect(child))
-            irs.append(IR(IRType.CALL_LAMBDA))
+            irs.append(IR(IRType.CALL_LAMBDA, self.inline_signature(node.children[0])))
             return irs
 
         elif node_type == XLangASTNodeTypes.OPERATION:
@@ -108,6 +319,9 @@ class IRGenerator:
                 irs.extend(self.generate_without_redirect(node.children[1]))
                 irs.append(IR(IRType.UNARY_OP, node.children[0]))
                 return irs
+            if node.children[1] in ("and", "or"):
+                irs.extend(self.generate_short_circuit(node))
+                return irs
             irs.extend(self.generate_without_redirect(node.children[0]))
             irs.extend(self.generate_without_redirect(node.children[2]))
             irs.append(IR(IRType.BINARAY_OP, node.children[1]))
@@ -131,6 +345,14 @@ class IRGenerator:
             irs = []
             irs.append(debug_info)
             irs.extend(self.generate_without_redirect(node.children))
+            if (
+                self.optimization_level >= 1
+                and self.function_body
+                and node.children.node_type == XLangASTNodeTypes.FUNCTION_CALL
+                and irs[-1].value is None
+            ):
+                # 函数体中 return f(...) 是尾调用，可以内联的调用保持原样
+                irs[-1] = IR(IRType.TAIL_CALL)
             irs.append(IR(IRType.RETURN))
             return irs
 
@@ -180,6 +402,7 @@ class IRGenerator:
             irs.append(debug_info)
             for child in node.children:
                 irs.append(IR(IRType.RESET_STACK))
+                self.at_frame_base = True
                 irs.extend(self.generate_without_redirect(child))
             return irs
         elif node_type == XLangASTNodeTypes.NULL:
@@ -199,7 +422,11 @@ class IRGenerator:
                 irs = []
                 irs.append(debug_info)
                 irs.extend(self.generate_without_redirect(node.children[0]))
+                self.conditional_depth += 1
+                # 条件已经被 JUMP_IF_FALSE 弹出，分支与 if 本身处于相同的位置
+                self.at_frame_base = at_frame_base
                 body = self.generate_without_redirect(node.children[1])
+                self.conditional_depth -= 1
                 label = self.label_generator()
                 else_label = self.label_generator()
                 irs.append(IR(IRType.REDIRECT_JUMP_IF_FALSE, label))
@@ -213,8 +440,12 @@ class IRGenerator:
                 irs = []
                 irs.append(debug_info)
                 irs.extend(self.generate_without_redirect(node.children[0]))
+                self.conditional_depth += 1
+                self.at_frame_base = at_frame_base
                 body = self.generate_without_redirect(node.children[1])
+                self.at_frame_base = at_frame_base
                 else_body = self.generate_without_redirect(node.children[2])
+                self.conditional_depth -= 1
                 label = self.label_generator()
                 else_label = self.label_generator()
                 irs.append(IR(IRType.REDIRECT_JUMP_IF_FALSE, label))
@@ -293,6 +524,8 @@ class IRGenerator:
             self.scope_stack.append(("loop", (while_head, while_end))) # 头尾标签
 
             irs.append(IR(IRType.REDIRECT_LABEL, while_head))
+            # 条件中可能被 break 跳过的 let 不能在循环之后静态访问
+            defined = set(self.variable_scopes[-1].defined) if self.variable_scopes else None
             # 生成条件代码
             condition = self.generate_without_redirect(node.children[0])
             irs.extend(condition)
@@ -301,8 +534,15 @@ class IRGenerator:
             irs.append(IR(IRType.REDIRECT_JUMP_IF_FALSE, while_med)) 
 
             # 生成循环体代码
+            self.conditional_depth += 1
+            # 循环体之下只多出之前几轮循环体留下的值，
+            # 这些值在 while 结束后同样不会再被使用
+            self.at_frame_base = at_frame_base
             body = self.generate_without_redirect(node.children[1])
+            self.conditional_depth -= 1
             irs.extend(body)
+            if defined is not None:
+                self.variable_scopes[-1].defined = defined
 
             # 循环结束后跳回条件判断
             irs.append(IR(IRType.REDIRECT_JUMP, while_head))
@@ -350,9 +590,56 @@ class IRGenerator:
         else:
             raise Exception(f"Unknown node type: {node_type}")
 
+    def generate_truth_jump(self, node, jump_if, label) -> List[IR]:
+        """
+        计算 node 并在其真值等于 jump_if 时跳转到 label
+
+        值不一定是 Bool 时先用 not 求出真值再反向跳转，与 BINARAY_OP 中
+        and/or 对操作数求真值的方式一致
+        """
+        irs = self.generate_without_redirect(node)
+        if is_bool_expression(node):
+            jump_if_true = jump_if
+        else:
+            irs.append(IR(IRType.UNARY_OP, "not"))
+            jump_if_true = not jump_if
+        if jump_if_true:
+            irs.append(IR(IRType.REDIRECT_JUMP_IF_TRUE, label))
+        else:
+            irs.append(IR(IRType.REDIRECT_JUMP_IF_FALSE, label))
+        return irs
+
+    def generate_short_circuit(self, node) -> List[IR]:
+        """
+        and/or 编译为条件跳转，左侧已经决定结果时不再计算右侧
+
+        a and b: 任意一侧为假时跳到 false 标签，否则结果为 true
+        a or b: 任意一侧为真时跳到 true 标签，否则结果为 false
+        """
+        short_circuit = node.children[1] == "or"  # 跳转时的结果
+        decided_label = self.label_generator()
+        end_label = self.label_generator()
+        irs = []
+        irs.extend(
+            self.generate_truth_jump(node.children[0], short_circuit, decided_label)
+        )
+        # 右侧只在左侧没有决定结果时计算，其中的 let 与条件分支中的一样不一定执行
+        self.conditional_depth += 1
+        irs.extend(
+            self.generate_truth_jump(node.children[2], short_circuit, decided_label)
+        )
+        self.conditional_depth -= 1
+        irs.append(IR(IRType.LOAD_BOOL, not short_circuit))
+        irs.append(IR(IRType.REDIRECT_JUMP, end_label))
+        irs.append(IR(IRType.REDIRECT_LABEL, decided_label))
+        irs.append(IR(IRType.LOAD_BOOL, short_circuit))
+        irs.append(IR(IRType.REDIRECT_LABEL, end_label))
+        return irs
+
     def redirect_jump(self, irs: List[IR]) -> List[IR]:
         """
-        重定向所有跳转指令，将REDIRECT_JUMP和REDIRECT_JUMP_IF_FALSE转换为JUMP_OFFSET和JUMP_IF_FALSE
+        重定向所有跳转指令，将REDIRECT_JUMP、REDIRECT_JUMP_IF_FALSE和REDIRECT_JUMP_IF_TRUE
+        转换为JUMP_OFFSET、JUMP_IF_FALSE和JUMP_IF_TRUE
 
         Args:
             irs: IR指令列表
@@ -376,19 +663,26 @@ class IRGenerator:
                 if label not in label_map:
                     raise ValueError(f"Label not found: {label}")
                 offset = label_map[label] - i - 1
-                reduced_irs[i] = IR(IRType.JUMP_OFFSET, offset)
+                reduced_irs[i] = IR(IRType.JUMP_OFFSET, offset, ir.position)
             elif ir.ir_type == IRType.REDIRECT_JUMP_IF_FALSE:
                 label = ir.value
                 if label not in label_map:
                     raise ValueError(f"Label not found: {label}")
                 offset = label_map[label] - i - 1
-                reduced_irs[i] = IR(IRType.JUMP_IF_FALSE, offset)
+                reduced_irs[i] = IR(IRType.JUMP_IF_FALSE, offset, ir.position)
+            elif ir.ir_type == IRType.REDIRECT_JUMP_IF_TRUE:
+                label = ir.value
+                if label not in label_map:
+                    raise ValueError(f"Label not found: {label}")
+                offset = label_map[label] - i - 1
+                reduced_irs[i] = IR(IRType.JUMP_IF_TRUE, offset, ir.position)
 
         return reduced_irs
 
-    def retain_latest_debug_info(self, irs: List[IR]) -> List[IR]:
+    def attach_debug_info(self, irs: List[IR]) -> List[IR]:
         """
-        移除相邻的debug_info指令，只保留最新的一个
+        移除DEBUG_INFO标记，将其记录的源代码位置写入后续指令的position中，
+        执行时不再需要逐条处理调试信息
 
         Args:
             irs: 原始IR指令列表
@@ -396,28 +690,36 @@ class IRGenerator:
         Returns:
             处理后的IR指令列表
         """
-        if not irs:
-            return []
-
         result = []
-        last_was_debug = False
+        position = None
 
         for ir in irs:
             if ir.ir_type == IRType.DEBUG_INFO:
-                if last_was_debug:
-                    # 如果前一条也是DEBUG_INFO，则替换它
-                    result[-1] = ir
-                else:
-                    # 否则添加此DEBUG_INFO
-                    result.append(ir)
-                    last_was_debug = True
-            else:
-                # 非DEBUG_INFO指令直接添加
-                result.append(ir)
-                last_was_debug = False
+                if ir.value["code_position"] is not None:
+                    position = ir.value["code_position"]
+                continue
+            ir.position = position
+            result.append(ir)
 
         return result
-    def generate(self, node) -> List[IR]:
+
+    def generate(self, node, function_body=False) -> List[IR]:
+        # 函数体（或主程序）直接运行在调用时建立的帧中
+        # 函数体进入时栈一定位于帧底，主程序则可能在已有的栈上执行
+        self.at_frame_base = function_body
+        self.function_body = function_body
+        if self.inline_candidates is None:
+            self.inline_candidates = collect_inline_candidates(node)
+        self.variable_scopes.append(
+            VariableScope(collect_let_names(node, set()), self.conditional_depth)
+        )
         irs = self.generate_without_redirect(node)
-        irs = self.retain_latest_debug_info(irs)
-        return self.redirect_jump(irs)
+        self.variable_scopes.pop()
+        irs = self.attach_debug_info(irs)
+        irs = self.redirect_jump(irs)
+        return optimize(
+            irs,
+            self.optimization_level,
+            stack_at_base=function_body,
+            functions=self.functions,
+        )
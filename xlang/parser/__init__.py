@@ -1,12 +1,17 @@
 from .lexer import XLangTokenizer
 from .ast import Gather, XLangASTParser
+from .pratt import XLangPrattParser
 
 
-def build_ast(doc):
+def build_ast(doc, legacy=False):
+    # legacy=True 时使用逐个尝试匹配器的旧解析器，便于对比两者生成的语法树
     tokenizer = XLangTokenizer()
     tokens = tokenizer.parse(doc)
     gather = Gather(tokens)
     gathered = gather.gather()
-    parser = XLangASTParser(gathered)
+    if legacy:
+        parser = XLangASTParser(gathered)
+    else:
+        parser = XLangPrattParser(gathered)
     ast = parser.parse_without_body()
     return ast
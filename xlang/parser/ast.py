@@ -1,69 +1,61 @@
-from .lexer import XLangTokenizer, XLangTokenType
+from .lexer import XLangTokenizer, XLangTokenType, XLangTokenView
 import enum
 from enum import auto
 
 
 class NextToken:
-    # 用于获取下一个token list的类，自动匹配括号
+    # 用于获取下一个token list的类，括号的匹配关系由 match_brackets 预先算好
 
     def __init__(self, tokens):
+        if not isinstance(tokens, XLangTokenView):
+            tokens = XLangTokenView(tokens)
         self.tokens = tokens
         self.index = 0
 
     def next(self, start_idx: int):
-        stack = []
-        next_tokens = []
-        if start_idx >= len(self.tokens):
-            return next_tokens
-        while True:
-            if (
-                self.tokens[start_idx]["token"] in ("{", "[", "(")
-                and self.tokens[start_idx]["type"] == XLangTokenType.TokenType_SYMBOL
-            ):
-                stack.append(self.tokens[start_idx]["token"])
-                next_tokens.append(self.tokens[start_idx])
-            elif (
-                self.tokens[start_idx]["token"] in ("}", "]", ")")
-                and self.tokens[start_idx]["type"] == XLangTokenType.TokenType_SYMBOL
-            ):
-                if len(stack) == 0:
-                    return next_tokens
-                    # raise Exception('Unmatched bracket')
-                poped = stack.pop()
-                if (
-                    (poped == "{" and self.tokens[start_idx]["token"] != "}")
-                    or (poped == "[" and self.tokens[start_idx]["token"] != "]")
-                    or (poped == "(" and self.tokens[start_idx]["token"] != ")")
-                ):
-                    raise Exception("Unmatched bracket")
-
-                next_tokens.append(self.tokens[start_idx])
-            else:
-                next_tokens.append(self.tokens[start_idx])
-            start_idx += 1
-            if len(stack) == 0 or start_idx >= len(self.tokens):
-                break
-        return next_tokens
+        # 返回从 start_idx 开始的 token 组，没有更多 token 组时返回空视图
+        tokens = self.tokens
+        start = tokens.start + start_idx
+        if start >= tokens.end:
+            return tokens.view(tokens.end, tokens.end)
+        # 未闭合的括号在视图末尾截断
+        return tokens.view(start, min(tokens.ends[start], tokens.end))
 
 
 class Gather:
     # 将token list中的token按照括号匹配进行分组，方便后续处理
     def __init__(self, tokens):
+        if not isinstance(tokens, XLangTokenView):
+            tokens = XLangTokenView(tokens)
         self.tokens = tokens
 
     def gather(self):
+        # 借助括号匹配表直接跳到每个 token 组的末尾，不再逐个 token 扫描
+        # 单个 token 的分组仍然用 list 表示，解析器对它们的访问最频繁
+        tokens = self.tokens
+        token_list = tokens.tokens
+        ends = tokens.ends
+        end = tokens.end
         gathered = []
-        offset = 0
-        while next_token := NextToken(self.tokens).next(offset):
-            gathered.append(next_token)
-            offset += len(next_token)
+        offset = tokens.start
+        while offset < end:
+            group_end = ends[offset]
+            if group_end == offset + 1:
+                gathered.append([token_list[offset]])
+            elif group_end == offset:
+                break  # 多余的右括号
+            else:
+                if group_end > end:
+                    group_end = end
+                gathered.append(XLangTokenView(token_list, ends, offset, group_end))
+            offset = group_end
         return gathered
 
 
 def _is_body(token_list):
     if len(token_list) < 2:
         return False
-    return token_list[0]["token"] == "{" and token_list[-1]["token"] == "}"
+    return token_list[0].token == "{" and token_list[-1].token == "}"
 
 
 def _unwrap_body(token_list):
@@ -75,7 +67,7 @@ def _unwrap_body(token_list):
 def _is_pair(token_list):
     if len(token_list) < 2:
         return False
-    return token_list[0]["token"] == "[" and token_list[-1]["token"] == "]"
+    return token_list[0].token == "[" and token_list[-1].token == "]"
 
 
 def _unwrap_pair(token_list):
@@ -87,7 +79,7 @@ def _unwrap_pair(token_list):
 def _is_tuple(token_list):
     if len(token_list) < 2:
         return False
-    return token_list[0]["token"] == "(" and token_list[-1]["token"] == ")"
+    return token_list[0].token == "(" and token_list[-1].token == ")"
 
 
 def _unwrap_tuple(token_list):
@@ -100,8 +92,8 @@ def _is_let(token_list):
     if len(token_list) != 1:
         return False
     return (
-        token_list[0]["token"] == ":="
-        and token_list[0]["type"] == XLangTokenType.TokenType_SYMBOL
+        token_list[0].token == ":="
+        and token_list[0].type == XLangTokenType.TokenType_SYMBOL
     )
 
 
@@ -109,21 +101,21 @@ def _is_assign(token_list):
     if len(token_list) != 1:
         return False
     return (
-        token_list[0]["token"] == "="
-        and token_list[0]["type"] == XLangTokenType.TokenType_SYMBOL
+        token_list[0].token == "="
+        and token_list[0].type == XLangTokenType.TokenType_SYMBOL
     )
 
 
 def _concat(token_list):
-    return "".join([token["token"] for token in token_list])
+    return "".join([token.token for token in token_list])
 
 
 def _is_to(token_list):
     if len(token_list) != 1:
         return False
     return (
-        token_list[0]["token"] == "->"
-        and token_list[0]["type"] == XLangTokenType.TokenType_SYMBOL
+        token_list[0].token == "->"
+        and token_list[0].type == XLangTokenType.TokenType_SYMBOL
     )
 
 
@@ -131,8 +123,8 @@ def _is_separator(token_list):
     if len(token_list) != 1:
         return False
     return (
-        token_list[0]["token"] == ";"
-        and token_list[0]["type"] == XLangTokenType.TokenType_SYMBOL
+        token_list[0].token == ";"
+        and token_list[0].type == XLangTokenType.TokenType_SYMBOL
     )
 
 
@@ -140,29 +132,29 @@ def _is_comma(token_list):
     if len(token_list) != 1:
         return False
     return (
-        token_list[0]["token"] == ","
-        and token_list[0]["type"] == XLangTokenType.TokenType_SYMBOL
+        token_list[0].token == ","
+        and token_list[0].type == XLangTokenType.TokenType_SYMBOL
     )
 
 
 def _is_string(token_list):
     if len(token_list) != 1:
         return False
-    return token_list[0]["type"] == XLangTokenType.TokenType_STRING
+    return token_list[0].type == XLangTokenType.TokenType_STRING
 
 
 def _is_number(token_list):
     if len(token_list) != 1:
         return False
-    return token_list[0]["type"] == XLangTokenType.TokenType_NUMBER
+    return token_list[0].type == XLangTokenType.TokenType_NUMBER
 
 
 def _is_symbol(token_list, symbol):
     if len(token_list) != 1:
         return False
     return (
-        token_list[0]["token"] == symbol
-        and token_list[0]["type"] == XLangTokenType.TokenType_SYMBOL
+        token_list[0].token == symbol
+        and token_list[0].type == XLangTokenType.TokenType_SYMBOL
     )
 
 
@@ -170,8 +162,8 @@ def _is_identifier(token_list, symbol):
     if len(token_list) != 1:
         return False
     return (
-        token_list[0]["type"] == XLangTokenType.TokenType_IDENTIFIER
-        and token_list[0]["token"] == symbol
+        token_list[0].type == XLangTokenType.TokenType_IDENTIFIER
+        and token_list[0].token == symbol
     )
 
 
@@ -319,7 +311,7 @@ class XLangSeparator:
             XLangASTNode(
                 XLangASTNodeTypes.SEPARATOR,
                 separated + [node],
-                self.token_list[start_idx][0]["position"],
+                self.token_list[start_idx][0].position,
             ),
             last_offset + node_offset,
         )
@@ -343,7 +335,7 @@ class XLangReturn:
             XLangASTNode(
                 XLangASTNodeTypes.RETURN,
                 guess,
-                self.token_list[start_idx][0]["position"],
+                self.token_list[start_idx][0].position,
             ),
             offset + 1,
         )
@@ -386,7 +378,7 @@ class XLangTuple:
             XLangASTNode(
                 XLangASTNodeTypes.TUPLE,
                 separated + [node],
-                self.token_list[start_idx][0]["position"],
+                self.token_list[start_idx][0].position,
             ),
             last_offset + node_offset,
         )
@@ -429,7 +421,7 @@ class XLangLet:
             XLangASTNode(
                 XLangASTNodeTypes.LET,
                 [left_node, right_node],
-                self.token_list[start_idx][0]["position"],
+                self.token_list[start_idx][0].position,
             ),
             offset + 2,
         )
@@ -477,7 +469,7 @@ class XLangAssign:
             XLangASTNode(
                 XLangASTNodeTypes.ASSIGN,
                 [left_node, right_guess],
-                self.token_list[start_idx][0]["position"],
+                self.token_list[start_idx][0].position,
             ),
             offset + right_offset + 1,  # +1 是因为 = 符号
         )
@@ -513,7 +505,7 @@ class XLangNamedArgument:
             XLangASTNode(
                 XLangASTNodeTypes.NAMED_ARGUMENT,
                 [left_node, right_node],
-                self.token_list[start_idx][0]["position"],
+                self.token_list[start_idx][0].position,
             ),
             offset + 2,
         )
@@ -547,7 +539,7 @@ class XLangKeyVal:
             XLangASTNode(
                 XLangASTNodeTypes.KEY_VAL,
                 [left_node, right_node],
-                self.token_list[start_idx][0]["position"],
+                self.token_list[start_idx][0].position,
             ),
             offset + 2,
         )
@@ -578,7 +570,7 @@ class XLangWhile:
             XLangASTNode(
                 XLangASTNodeTypes.WHILE,
                 [condition, body_guess],
-                self.token_list[start_idx][0]["position"],
+                self.token_list[start_idx][0].position,
             ),
             offset + 2,
         )
@@ -617,7 +609,7 @@ class XLangIF:
                 XLangASTNode(
                     XLangASTNodeTypes.IF,
                     [condition, true_condition, false_node],
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 ),
                 4 + false_offset,
             )
@@ -626,7 +618,7 @@ class XLangIF:
             XLangASTNode(
                 XLangASTNodeTypes.IF,
                 [condition, true_condition],
-                self.token_list[start_idx][0]["position"],
+                self.token_list[start_idx][0].position,
             ),
             3,
         )
@@ -659,7 +651,7 @@ class XLangControlFlow:
                 XLangASTNode(
                     XLangASTNodeTypes.BREAK,
                     right,
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 ),
                 offset + 1,
             )
@@ -679,7 +671,7 @@ class XLangControlFlow:
                 XLangASTNode(
                     XLangASTNodeTypes.CONTINUE,
                     right,
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 ),
                 offset + 1,
             )
@@ -704,7 +696,7 @@ class XLangOr:
         while offset >= 0:
             pos = start_idx + offset
             if _is_identifier(self.token_list[pos], "or"):
-                operation = self.token_list[pos][0]["token"]
+                operation = self.token_list[pos][0].token
                 operation_pos = pos
                 break
             offset -= 1
@@ -753,7 +745,7 @@ class XLangAnd:
         while offset >= 0:
             pos = start_idx + offset
             if _is_identifier(self.token_list[pos], "and"):
-                operation = self.token_list[pos][0]["token"]
+                operation = self.token_list[pos][0].token
                 operation_pos = pos
                 break
             offset -= 1
@@ -831,7 +823,7 @@ class XLangOperatorLevel2:
                 or _is_symbol(self.token_list[pos], "==")
                 or _is_symbol(self.token_list[pos], "!=")
             ):
-                operation = self.token_list[pos][0]["token"]
+                operation = self.token_list[pos][0].token
                 operation_pos = pos
                 break
             offset -= 1
@@ -882,7 +874,7 @@ class XLangOperatorLevel1:
             if _is_symbol(self.token_list[pos], "+") or _is_symbol(
                 self.token_list[pos], "-"
             ):
-                operation = self.token_list[pos][0]["token"]
+                operation = self.token_list[pos][0].token
                 operation_pos = pos
                 # 判断是否为一元运算符
                 is_unary = False
@@ -895,8 +887,8 @@ class XLangOperatorLevel1:
                     prev_token = self.token_list[operation_pos - 1]
                     if (
                         len(prev_token) == 1
-                        and prev_token[0]["type"] == XLangTokenType.TokenType_SYMBOL
-                        and prev_token[0]["token"]
+                        and prev_token[0].type == XLangTokenType.TokenType_SYMBOL
+                        and prev_token[0].token
                         in [
                             "+",
                             "-",
@@ -933,9 +925,9 @@ class XLangOperatorLevel1:
         # 特殊处理一元运算符（+x, -x）的情况
         if len(left_tokens) == 0 or (
             operation_pos > start_idx
-            and self.token_list[operation_pos - 1][0]["type"]
+            and self.token_list[operation_pos - 1][0].type
             == XLangTokenType.TokenType_SYMBOL
-            and self.token_list[operation_pos - 1][0]["token"]
+            and self.token_list[operation_pos - 1][0].token
             in [
                 "+",
                 "-",
@@ -961,7 +953,7 @@ class XLangOperatorLevel1:
                 XLangASTNode(
                     XLangASTNodeTypes.OPERATION,
                     [operation, right_node],
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 ),
                 len(self.token_list) - start_idx,
             )
@@ -1006,7 +998,7 @@ class XLangOperatorLevel0:
                 or _is_symbol(self.token_list[pos], "/")
                 or _is_symbol(self.token_list[pos], "%")
             ):
-                operation = self.token_list[pos][0]["token"]
+                operation = self.token_list[pos][0].token
                 operation_pos = pos
                 break
             offset -= 1
@@ -1066,7 +1058,7 @@ class XLangFunctionDef:
             XLangASTNode(
                 XLangASTNodeTypes.FUNCTION_DEF,
                 [left_node, right_node],
-                self.token_list[start_idx][0]["position"],
+                self.token_list[start_idx][0].position,
             ),
             3,
         )
@@ -1081,16 +1073,14 @@ class XLangModifier:
     def match(self, start_idx):
         if start_idx + 1 >= len(self.token_list):
             return None, 0
-        if len(self.token_list[start_idx]) == 1 and self.token_list[start_idx][0][
-            "token"
-        ] in ["copy", "ref", "deref", "keyof", "valueof", "selfof", "assert", "import", "wrap"]:
+        if len(self.token_list[start_idx]) == 1 and self.token_list[start_idx][0].token in ["copy", "ref", "deref", "keyof", "valueof", "selfof", "assert", "import", "wrap"]:
             node, offset = node_matcher.match(self.token_list, start_idx + 1)
             if node == None:
                 return None, 0
             return (
                 XLangASTNode(
                     XLangASTNodeTypes.MODIFY,
-                    [self.token_list[start_idx][0]["token"], node],
+                    [self.token_list[start_idx][0].token, node],
                 ),
                 offset + 1,
             )
@@ -1153,7 +1143,7 @@ class XLangMemberAccess:
                 XLangASTNode(
                     XLangASTNodeTypes.INDEX_OF,
                     [left_node, index_node],
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 ),
                 access_pos - start_idx + 1,
             )
@@ -1168,20 +1158,20 @@ class XLangMemberAccess:
                 args_node = XLangASTNode(
                     XLangASTNodeTypes.TUPLE,
                     [],
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 )
             elif args_node.node_type != XLangASTNodeTypes.TUPLE:
                 args_node = XLangASTNode(
                     XLangASTNodeTypes.TUPLE,
                     [args_node],
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 )
 
             return (
                 XLangASTNode(
                     XLangASTNodeTypes.FUNCTION_CALL,
                     [left_node, args_node],
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 ),
                 access_pos - start_idx + 1,
             )
@@ -1200,14 +1190,14 @@ class XLangMemberAccess:
                 attr_name = XLangASTNode(
                     XLangASTNodeTypes.STRING,
                     right_node.children,
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 )
 
             return (
                 XLangASTNode(
                     XLangASTNodeTypes.GET_ATTR,
                     [left_node, attr_name],
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 ),
                 access_pos - start_idx + 1 + right_offset,
             )
@@ -1227,7 +1217,7 @@ class XLangVariable:
                     XLangASTNode(
                         XLangASTNodeTypes.TUPLE,
                         [],
-                        self.token_list[start_idx][0]["position"],
+                        self.token_list[start_idx][0].position,
                     ),
                     1,
                 )
@@ -1242,7 +1232,7 @@ class XLangVariable:
                     XLangASTParser(
                         Gather(_unwrap_body(self.token_list[start_idx])).gather()
                     ).parse(),
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 ),
                 1,
             )
@@ -1251,7 +1241,7 @@ class XLangVariable:
                 XLangASTNode(
                     XLangASTNodeTypes.STRING,
                     _concat(self.token_list[start_idx]),
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 ),
                 1,
             )
@@ -1260,7 +1250,7 @@ class XLangVariable:
                 XLangASTNode(
                     XLangASTNodeTypes.NUMBER,
                     _concat(self.token_list[start_idx]),
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 ),
                 1,
             )
@@ -1269,7 +1259,7 @@ class XLangVariable:
                 XLangASTNode(
                     XLangASTNodeTypes.BOOLEN,
                     True,
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 ),
                 1,
             )
@@ -1278,7 +1268,7 @@ class XLangVariable:
                 XLangASTNode(
                     XLangASTNodeTypes.BOOLEN,
                     False,
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 ),
                 1,
             )
@@ -1287,7 +1277,7 @@ class XLangVariable:
                 XLangASTNode(
                     XLangASTNodeTypes.NULL,
                     None,
-                    self.token_list[start_idx][0]["position"],
+                    self.token_list[start_idx][0].position,
                 ),
                 1,
             )
@@ -1295,7 +1285,7 @@ class XLangVariable:
             XLangASTNode(
                 XLangASTNodeTypes.VARIABLE,
                 _concat(self.token_list[start_idx]),
-                self.token_list[start_idx][0]["position"],
+                self.token_list[start_idx][0].position,
             ),
             1,
         )
@@ -1327,7 +1317,7 @@ class XLangASTParser:
         return XLangASTNode(
             XLangASTNodeTypes.SEPARATOR,
             self.parse(),
-            self.token_list[start_idx][0]["position"],
+            self.token_list[start_idx][0].position,
         )
     def parse_without_body(self, start_idx=0) -> XLangASTNode:
         if len(self.token_list) == 0:
@@ -1339,5 +1329,5 @@ class XLangASTParser:
         return XLangASTNode(
             XLangASTNodeTypes.SEPARATOR, # 用于表示没有body的情况，仅仅是一组表达式
             self.parse(),
-            self.token_list[start_idx][0]["position"],
+            self.token_list[start_idx][0].position,
         )
@@ -1,434 +1,222 @@
 import re
 import base64
+from sys import intern
 
 DEBUG = False
 
 
 class XLangTokenType:
-    TokenType_COMMENT = "COMMENT"
-    TokenType_NUMBER = "NUMBER"
-    TokenType_STRING = "STRING"
-    TokenType_SYMBOL = "SYMBOL"
-    TokenType_IDENTIFIER = "IDENTIFIER"
-    TokenType_BASE64 = "BASE64"
+    TokenType_COMMENT = 0
+    TokenType_NUMBER = 1
+    TokenType_STRING = 2
+    TokenType_SYMBOL = 3
+    TokenType_IDENTIFIER = 4
+    TokenType_BASE64 = 5
+
+    # 按类型编号索引的名称，用于输出
+    names = ("COMMENT", "NUMBER", "STRING", "SYMBOL", "IDENTIFIER", "BASE64")
+
+
+class XLangToken:
+    # 词法分析得到的token，token 是文本，type 是 XLangTokenType 中的编号，position 是起始下标
+    __slots__ = ("token", "type", "position")
+
+    def __init__(self, token, type, position):
+        self.token = token
+        self.type = type
+        self.position = position
+
+    def __eq__(self, other):
+        if not isinstance(other, XLangToken):
+            return NotImplemented
+        return (
+            self.token == other.token
+            and self.type == other.type
+            and self.position == other.position
+        )
+
+    def __repr__(self):
+        return f"{XLangTokenType.names[self.type]}({self.token!r}, {self.position})"
+
+
+_OPERATORS = frozenset(
+    (
+        "+",
+        "-",
+        "*",
+        "/",
+        "\\",
+        "%",
+        "&",
+        "!",
+        "^",
+        "~",
+        "=",
+        "==",
+        ">",
+        "<",
+        "<=",
+        ">=",
+        "!=",
+        "?=",
+        "|",
+        "?",
+        ":>",
+        "#",
+        "&&",
+        ",",
+        ".",
+        "\n",
+        ":",
+        "->",
+        "<<",
+        ">>",
+        "/*",
+        "*/",
+        ";",
+        " ",
+        ":=",
+        "|>",
+        "<|",
+        "::",
+        "=>",
+        "++",
+        "||",
+        '"""',
+        "'''",
+    )
+)
+_BRACKETS = frozenset(("(", ")", "[", "]", "{", "}"))
+
+# 转义序列：\u 吃掉之后最多4个十六进制数字，不足4个时在 _unescape 中报错，其余转义只吃一个字符
+_ESCAPE = r"\\(?:u[0-9a-fA-F]{0,4}|[^u])"
+
+
+def _build_master_pattern():
+    # 分支顺序与逐字符实现中的尝试顺序一致：注释、数字、字符串、base64、运算符、标识符，
+    # 最常见的标识符被提前到数字之后，并排除了字符串的起始
+    # 每个分支的外层命名组覆盖整个token（用于取位置），内层组是token的值
+    symbols = sorted(
+        (
+            op
+            for op in _OPERATORS | _BRACKETS
+            if op.strip() and op not in ('"""', "'''")
+        ),
+        key=len,
+        reverse=True,
+    )
+    # 标识符在空白、引号以及任意运算符的起始处结束，所有多字符运算符的首字符本身都是运算符
+    breakers = "".join(
+        re.escape(op) for op in sorted(_OPERATORS | _BRACKETS) if len(op) == 1
+    )
+    branches = (
+        r"(?P<LINE_COMMENT>//(?P<LINE_COMMENT_VALUE>[^\n\r]*))",
+        r"(?P<BLOCK_COMMENT>/\*(?P<BLOCK_COMMENT_VALUE>[\s\S]*?)(?:\*/|\Z))",
+        r"(?P<NUMBER>\d*\.?\d+(?:[eE][-+]?\d+)?)",
+        # 以 R" $" “ 开头时是字符串
+        "(?P<IDENTIFIER>(?!R\"|\\$\"|“)[^ \t\n\r'\"" + breakers + "]+)",
+        r'(?P<RAW>R"(?P<RAW_DIVIDER>[^(]*)\((?P<RAW_VALUE>(?:'
+        + _ESCAPE
+        + r'|(?!\)(?P=RAW_DIVIDER)")[^\\])*)\)(?P=RAW_DIVIDER)")',
+        r'(?P<TRIPLE_DOUBLE>"""(?P<TRIPLE_DOUBLE_VALUE>(?:[^"\\]|"(?!"")|'
+        + _ESCAPE
+        + r')*)""")',
+        r"(?P<TRIPLE_SINGLE>'''(?P<TRIPLE_SINGLE_VALUE>(?:[^'\\]|'(?!'')|"
+        + _ESCAPE
+        + r")*)''')",
+        # 三引号未闭合时不能退化为空字符串
+        r'(?P<DOUBLE>(?!""")"(?P<DOUBLE_VALUE>(?:[^"\\]|' + _ESCAPE + r')*)")',
+        r"(?P<SINGLE>(?!''')'(?P<SINGLE_VALUE>(?:[^'\\]|" + _ESCAPE + r")*)')",
+        r"(?P<CURLY>“(?P<CURLY_VALUE>(?:[^”\\]|" + _ESCAPE + r")*)”)",
+        r'(?P<BASE64>\$"(?P<BASE64_VALUE>(?:[^"\\]|' + _ESCAPE + r')*)")',
+        # 未闭合的字符串
+        r"(?P<UNTERMINATED>R\"|\"\"\"|'''|[\"'“]|\$\")",
+        "(?P<SYMBOL>" + "|".join(re.escape(op) for op in symbols) + ")",
+    )
+    # 先跳过空白，剩余部分只有空白时匹配失败
+    return re.compile(r"[ \t\n\r]*(?:" + "|".join(branches) + ")")
+
+
+_MASTER_PATTERN = _build_master_pattern()
+_ESCAPE_PATTERN = re.compile(r"\\(u[0-9a-fA-F]{0,4}|[\s\S])")
+
+# 分支名 -> (token类型, 值所在的组, 可以被转义的引号)
+_BRANCHES = {
+    "LINE_COMMENT": (XLangTokenType.TokenType_COMMENT, "LINE_COMMENT_VALUE", None),
+    "BLOCK_COMMENT": (XLangTokenType.TokenType_COMMENT, "BLOCK_COMMENT_VALUE", None),
+    "NUMBER": (XLangTokenType.TokenType_NUMBER, "NUMBER", None),
+    "RAW": (XLangTokenType.TokenType_STRING, "RAW_VALUE", '"'),
+    "TRIPLE_DOUBLE": (XLangTokenType.TokenType_STRING, "TRIPLE_DOUBLE_VALUE", '"'),
+    "TRIPLE_SINGLE": (XLangTokenType.TokenType_STRING, "TRIPLE_SINGLE_VALUE", '"'),
+    "DOUBLE": (XLangTokenType.TokenType_STRING, "DOUBLE_VALUE", '"'),
+    "SINGLE": (XLangTokenType.TokenType_STRING, "SINGLE_VALUE", "'"),
+    "CURLY": (XLangTokenType.TokenType_STRING, "CURLY_VALUE", "“"),
+    "BASE64": (XLangTokenType.TokenType_BASE64, "BASE64_VALUE", '"'),
+    "SYMBOL": (XLangTokenType.TokenType_SYMBOL, "SYMBOL", None),
+    "IDENTIFIER": (XLangTokenType.TokenType_IDENTIFIER, "IDENTIFIER", None),
+}
+
+
+def _unescape(text, quote):
+    # 处理字符串中的转义序列，quote 是可以被转义的引号
+    if "\\" not in text:
+        return text
+
+    def replace(match_):
+        escape = match_.group(1)
+        escape_char = escape[0]
+        if escape_char == "n":
+            return "\n"
+        if escape_char == "t":
+            return "\t"
+        if escape_char in (quote, "\\"):
+            return escape_char
+        if escape_char == "u":
+            if len(escape) != 5:
+                raise Exception("Invalid unicode escape: \\" + escape)
+            return chr(int(escape[1:], 16))
+        return "\\" + escape
+
+    return _ESCAPE_PATTERN.sub(replace, text)
 
 
 class XLangLexer:
     def tokenize(self, str):
+        # 单个预编译的正则表达式依次匹配每个token，位置为token首字符的下标
         tokens = []
-        currpos = 0
-
-        def skip_space():
-            nonlocal currpos
-            while currpos < len(str) and str[currpos] in (" ", "\t", "\n", "\r"):
-                currpos += 1
-
-        def next_line():
-            nonlocal currpos
-            while currpos < len(str) and str[currpos] not in ("\n", "\r"):
-                currpos += 1
-
-        def test_string(test_str):
-            nonlocal currpos
-            if currpos + len(test_str) > len(str):
-                return False
-            return str[currpos : currpos + len(test_str)] == test_str
-
-        def test_number(pos):
-            number_pattern = re.compile(r"^\d*\.?\d+([eE][-+]?\d+)?")
-            match_ = number_pattern.match(str[pos:])
-            return match_.end() if match_ else 0
-
-        def read_number():
-            nonlocal currpos
-            length = test_number(currpos)
-            if length:
-                current_token = str[currpos : currpos + length]
-                currpos += length
-                return current_token
-            return None
-
-        def read_base64():
-            nonlocal currpos
-            current_token = ""
-            if test_string('$"'):
-                currpos += 2
-                while currpos < len(str):
-                    if str[currpos] == "\\":
-                        currpos += 1
-                        if currpos < len(str):
-                            escape_char = str[currpos]
-                            if escape_char == "n":
-                                current_token += "\n"
-                            elif escape_char == "t":
-                                current_token += "\t"
-                            elif escape_char in ('"', "\\"):
-                                current_token += escape_char
-                            elif escape_char == "u":
-                                try:
-                                    currpos += 1
-                                    if currpos < len(str):
-                                        hex_str = str[currpos : currpos + 4]
-                                        current_token += chr(int(hex_str, 16))
-                                        currpos += 3
-                                    else:
-                                        return None  # Error: unexpected end of string
-                                except ValueError:
-                                    return None
-                            else:
-                                current_token += "\\" + escape_char
-                            currpos += 1
-                        else:
-                            return None  # Error: unexpected end of string
-                    elif str[currpos] == '"':
-                        currpos += 1
-                        return current_token
-                    else:
-                        current_token += str[currpos]
-                        currpos += 1
-
-        def read_string():
-            nonlocal currpos
-            current_token = ""
-            if test_string('R"'):
-                currpos += 2
-                divider = ""
-                while currpos < len(str) and str[currpos] != "(":
-                    divider += str[currpos]
-                    currpos += 1
-                if currpos < len(str):
-                    currpos += 1  # skip '('
-                    end_divider = ")" + divider + '"'
-                    while currpos < len(str) and not test_string(end_divider):
-                        if str[currpos] == "\\":  # Handle escape sequences
-                            currpos += 1
-                            if currpos < len(str):
-                                escape_char = str[currpos]
-                                if escape_char == "n":
-                                    current_token += "\n"
-                                elif escape_char == "t":
-                                    current_token += "\t"
-                                elif escape_char in ('"', "\\"):
-                                    current_token += escape_char
-                                elif escape_char == "u":
-                                    try:
-                                        currpos += 1
-                                        if currpos < len(str):
-                                            hex_str = str[currpos : currpos + 4]
-                                            current_token += chr(int(hex_str, 16))
-                                            currpos += 3
-                                        else:
-                                            return (
-                                                None  # Error: unexpected end of string
-                                            )
-                                    except ValueError:
-                                        return None
-                                else:
-                                    current_token += (
-                                        "\\" + escape_char
-                                    )  # Keep unrecognized escape sequences
-                                currpos += 1
-                            else:
-                                return None  # Error: unexpected end of string
-                        else:
-                            current_token += str[currpos]
-                            currpos += 1
-                    if currpos < len(str):
-                        currpos += len(end_divider)  # Skip the closing delimiter
-                        return current_token
-            if test_string('"""'):
-                currpos += 3
-                while currpos < len(str):
-                    if test_string('"""'):
-                        currpos += 3
-                        return current_token
-                    if str[currpos] == "\\":
-                        currpos += 1
-                        if currpos < len(str):
-                            escape_char = str[currpos]
-                            if escape_char == "n":
-                                current_token += "\n"
-                            elif escape_char == "t":
-                                current_token += "\t"
-                            elif escape_char in ('"', "\\"):
-                                current_token += escape_char
-                            elif escape_char == "u":
-                                try:
-                                    currpos += 1
-                                    if currpos < len(str):
-                                        hex_str = str[currpos : currpos + 4]
-                                        current_token += chr(int(hex_str, 16))
-                                        currpos += 3
-                                    else:
-                                        return None
-                                except ValueError:
-                                    return None
-                            else:
-                                current_token += "\\" + escape_char
-                            currpos += 1
-                        else:
-                            return None
-                    else:
-                        current_token += str[currpos]
-                        currpos += 1
-
-            if test_string("'''"):
-                currpos += 3
-                while currpos < len(str):
-                    if test_string("'''"):
-                        currpos += 3
-                        return current_token
-                    if str[currpos] == "\\":
-                        currpos += 1
-                        if currpos < len(str):
-                            escape_char = str[currpos]
-                            if escape_char == "n":
-                                current_token += "\n"
-                            elif escape_char == "t":
-                                current_token += "\t"
-                            elif escape_char in ('"', "\\"):
-                                current_token += escape_char
-                            elif escape_char == "u":
-                                try:
-                                    currpos += 1
-                                    if currpos < len(str):
-                                        hex_str = str[currpos : currpos + 4]
-                                        current_token += chr(int(hex_str, 16))
-                                        currpos += 3
-                                    else:
-                                        return None
-                                except ValueError:
-                                    return None
-                            else:
-                                current_token += "\\" + escape_char
-                            currpos += 1
-                        else:
-                            return None
-                    else:
-                        current_token += str[currpos]
-                        currpos += 1
-            match_pair = {
-                '"': '"',
-                "'": "'",
-                "“": "”",
-                # Add more pairs as needed
-            }
-            start_char = str[currpos]
-            if start_char in match_pair:
-                currpos += 1
-                while currpos < len(str):
-                    if str[currpos] == "\\":
-                        currpos += 1
-                        if currpos < len(str):
-                            escape_char = str[currpos]
-                            if escape_char == "n":
-                                current_token += "\n"
-                            elif escape_char == "t":
-                                current_token += "\t"
-                            elif escape_char in (start_char, "\\"):
-                                current_token += escape_char
-                            elif escape_char == "u":
-                                try:
-                                    currpos += 1
-                                    if currpos < len(str):
-                                        hex_str = str[currpos : currpos + 4]
-                                        current_token += chr(int(hex_str, 16))
-                                        currpos += 3
-                                    else:
-                                        return None  # Error: unexpected end of string
-                                except ValueError:
-                                    return None
-                            else:
-                                current_token += "\\" + escape_char
-                            currpos += 1
-                        else:
-                            return None  # Error: unexpected end of string
-                    elif str[currpos] == match_pair[start_char]:
-                        currpos += 1
-                        return current_token
-                    else:
-                        current_token += str[currpos]
-                        currpos += 1
-
-            return None
-
-        def read_token():
-            nonlocal currpos
-            current_token = ""
-            while currpos < len(str):
-                if str[currpos] in (" ", "\t", "\n", "\r", "'", '"'):
-                    break
-                if currpos < len(str) - 2:
-                    three_char = str[currpos : currpos + 3]
-                    if self.is_operator(three_char, 0):
-                        break
-                if currpos < len(str) - 1:
-                    two_char = str[currpos : currpos + 2]
-                    if self.is_operator(two_char, 0):
-                        break
-                one_char = str[currpos]
-                if self.is_operator(one_char, 0):
-                    break
-                current_token += one_char
-                currpos += 1
-            return current_token
-
-        def read_operator():
-            nonlocal currpos
-            if currpos < len(str) - 2:
-                three_char = str[currpos : currpos + 3]
-                if self.is_operator(three_char, 0):
-                    currpos += 3
-                    return three_char
-            if currpos < len(str) - 1:
-                two_char = str[currpos : currpos + 2]
-                if self.is_operator(two_char, 0):
-                    currpos += 2
-                    return two_char
-            if currpos < len(str):
-                one_char = str[currpos]
-                if self.is_operator(one_char, 0):
-                    currpos += 1
-                    return one_char
-            return None
-
-        def read_comment():
-            nonlocal currpos
-            current_token = ""
-            if test_string("//"):
-                currpos += 2
-                while currpos < len(str) and str[currpos] not in ("\n", "\r"):
-                    current_token += str[currpos]
-                    currpos += 1
-                return current_token
-            if test_string("/*"):
-                currpos += 2
-                while currpos < len(str) and not test_string("*/"):
-                    current_token += str[currpos]
-                    currpos += 1
-                if currpos < len(str):
-                    currpos += 2  # Skip closing */
-                return current_token
-            return None
-
-        while True:
-            skip_space()
-            if currpos >= len(str):
-                break
-
-            token = None
-            position = currpos
-
-            if (comment := read_comment()) is not None:
-                tokens.append(
-                    {
-                        "token": comment,
-                        "type": XLangTokenType.TokenType_COMMENT,
-                        "position": position,
-                    }
-                )
-            elif (number := read_number()) is not None:
-                tokens.append(
-                    {
-                        "token": number,
-                        "type": XLangTokenType.TokenType_NUMBER,
-                        "position": position,
-                    }
-                )
-            elif (string := read_string()) is not None:
-                tokens.append(
-                    {
-                        "token": string,
-                        "type": XLangTokenType.TokenType_STRING,
-                        "position": position,
-                    }
-                )
-            elif (string := read_base64()) is not None:
-                tokens.append(
-                    {
-                        "token": string,
-                        "type": XLangTokenType.TokenType_BASE64,
-                        "position": position,
-                    }
-                )
-            elif (operator := read_operator()) is not None:
-                tokens.append(
-                    {
-                        "token": operator,
-                        "type": XLangTokenType.TokenType_SYMBOL,
-                        "position": position,
-                    }
-                )
-            else:
-                token = read_token()
-                if token:
-                    tokens.append(
-                        {
-                            "token": token,
-                            "type": XLangTokenType.TokenType_IDENTIFIER,
-                            "position": position,
-                        }
+        append = tokens.append
+        branches = _BRANCHES
+        # 除空白外每个位置都能被某个分支匹配，因此 finditer 不会跳过任何字符
+        for match_ in _MASTER_PATTERN.finditer(str):
+            kind = match_.lastgroup
+            if kind == "UNTERMINATED":
+                if match_.group(kind) in ('R"', '"""', "'''"):
+                    raise Exception(
+                        "Unterminated string at position: ", match_.start(kind)
                     )
-
+                # 未闭合的普通字符串会吞掉剩余的全部内容
+                break
+            token_type, value_group, quote = branches[kind]
+            value = match_.group(value_group)
+            if quote is not None:
+                value = _unescape(value, quote)
+            elif token_type != XLangTokenType.TokenType_COMMENT:
+                # 运算符、标识符与数字大量重复，驻留后共享同一个字符串对象
+                value = intern(value)
+            append(XLangToken(value, token_type, match_.start(kind)))
         return tokens
 
     def is_operator(self, t, type):
-        l = t in {
-            "+",
-            "-",
-            "*",
-            "/",
-            "\\",
-            "%",
-            "&",
-            "!",
-            "^",
-            "~",
-            "=",
-            "==",
-            ">",
-            "<",
-            "<=",
-            ">=",
-            "!=",
-            "?=",
-            "|",
-            "?",
-            ":>",
-            "#",
-            "&&",
-            ",",
-            ".",
-            "\n",
-            ":",
-            "->",
-            "<<",
-            ">>",
-            "/*",
-            "*/",
-            ";",
-            " ",
-            ":=",
-            "|>",
-            "<|",
-            "::",
-            "=>",
-            "++",
-            "||",
-            ">>",
-            "<<",
-            '"""',
-            "'''",
-        }
+        l = t in _OPERATORS
         if type == 0:
-            l = l or (t in {"(", ")", "[", "]", "{", "}"})
+            l = l or t in _BRACKETS
         return l
 
     def reject_comments(self, tokens):
         return [
             token
             for token in tokens
-            if token["type"] != XLangTokenType.TokenType_COMMENT
+            if token.type != XLangTokenType.TokenType_COMMENT
         ]
 
     def concat_multi_line_string(self, tokens):
@@ -436,31 +224,29 @@ class XLangLexer:
         multi_line_string = None
         start_positon = None
         for token in tokens:
-            if token["type"] == XLangTokenType.TokenType_STRING:
+            if token.type == XLangTokenType.TokenType_STRING:
                 if multi_line_string is None:
-                    multi_line_string = token["token"]
-                    start_positon = token["position"]
+                    multi_line_string = token.token
+                    start_positon = token.position
                 else:
-                    multi_line_string += token["token"]
+                    multi_line_string += token.token
             else:
                 if multi_line_string is not None:
                     new_tokens.append(
-                        {
-                            "token": multi_line_string,
-                            "type": XLangTokenType.TokenType_STRING,
-                            "position": start_positon,
-                        }
+                        XLangToken(
+                            multi_line_string,
+                            XLangTokenType.TokenType_STRING,
+                            start_positon,
+                        )
                     )
                     multi_line_string = None
                     start_positon = None
                 new_tokens.append(token)
         if multi_line_string is not None:
             new_tokens.append(
-                {
-                    "token": multi_line_string,
-                    "type": XLangTokenType.TokenType_STRING,
-                    "position": start_positon,
-                }
+                XLangToken(
+                    multi_line_string, XLangTokenType.TokenType_STRING, start_positon
+                )
             )
         return new_tokens
 
@@ -470,23 +256,23 @@ class XLangLexer:
         offset = 0
         while offset < len(tokens):
             if (
-                tokens[offset]["token"] == "-"
-                and tokens[offset]["type"] == XLangTokenType.TokenType_SYMBOL
+                tokens[offset].token == "-"
+                and tokens[offset].type == XLangTokenType.TokenType_SYMBOL
             ):
                 if (
                     offset + 1 < len(tokens)
-                    and tokens[offset + 1]["type"] == XLangTokenType.TokenType_NUMBER
+                    and tokens[offset + 1].type == XLangTokenType.TokenType_NUMBER
                     and (
                         offset == 0
-                        or tokens[offset - 1]["type"] == XLangTokenType.TokenType_SYMBOL
+                        or tokens[offset - 1].type == XLangTokenType.TokenType_SYMBOL
                     )
                 ):
                     new_tokens.append(
-                        {
-                            "token": "-" + tokens[offset + 1]["token"],
-                            "type": XLangTokenType.TokenType_NUMBER,
-                            "position": tokens[offset]["position"],
-                        }
+                        XLangToken(
+                            "-" + tokens[offset + 1].token,
+                            XLangTokenType.TokenType_NUMBER,
+                            tokens[offset].position,
+                        )
                     )
                     offset += 2
                     continue
@@ -495,11 +281,94 @@ class XLangLexer:
         return new_tokens
 
 
+_OPEN_BRACKETS = {"(": ")", "[": "]", "{": "}"}
+_CLOSE_BRACKETS = frozenset((")", "]", "}"))
+
+
+def match_brackets(tokens):
+    """
+    线性扫描一次 token 序列，返回每个下标开始的 token 组的结束下标（不含）
+    左括号对应到与之匹配的右括号之后，未闭合时对应到序列末尾；
+    多余的右括号对应到自身，表示分组到此为止，之后的 token 不再被读取；
+    其余 token 对应到下一个下标
+    """
+    length = len(tokens)
+    ends = list(range(1, length + 1))
+    stack = []
+    for idx in range(length):
+        token = tokens[idx]
+        if token.type != XLangTokenType.TokenType_SYMBOL:
+            continue
+        if token.token in _OPEN_BRACKETS:
+            stack.append(idx)
+        elif token.token in _CLOSE_BRACKETS:
+            if not stack:
+                ends[idx] = idx
+                break
+            open_idx = stack.pop()
+            if _OPEN_BRACKETS[tokens[open_idx].token] != token.token:
+                raise Exception("Unmatched bracket")
+            ends[open_idx] = idx + 1
+    for open_idx in stack:
+        ends[open_idx] = length
+    return ends
+
+
+class XLangTokenView:
+    """
+    token 序列中 [start, end) 区间的只读视图，切片得到的仍然是共享同一序列的视图
+    ends 是 match_brackets 的结果，在同一份源码的所有视图之间共享
+    """
+
+    __slots__ = ("tokens", "ends", "start", "end")
+
+    def __init__(self, tokens, ends=None, start=0, end=None):
+        self.tokens = tokens
+        self.ends = match_brackets(tokens) if ends is None else ends
+        self.start = start
+        self.end = len(tokens) if end is None else end
+
+    def view(self, start, end):
+        # start 与 end 是在整个序列中的下标
+        return XLangTokenView(self.tokens, self.ends, start, end)
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.end - self.start)
+            if step != 1:
+                raise ValueError("XLangTokenView does not support slice steps")
+            return XLangTokenView(
+                self.tokens,
+                self.ends,
+                self.start + start,
+                self.start + max(start, stop),
+            )
+        if index < 0:
+            index += self.end
+        else:
+            index += self.start
+        if index < self.start or index >= self.end:
+            raise IndexError("token index out of range")
+        return self.tokens[index]
+
+    def __iter__(self):
+        tokens = self.tokens
+        for idx in range(self.start, self.end):
+            yield tokens[idx]
+
+    def __repr__(self):
+        return repr(self.tokens[self.start : self.end])
+
+
 class XLangTokenizer:
     def __init__(self):
         self.lexer = XLangLexer()
 
     def parse(self, text):
+        # 返回整个 token 序列的视图，括号匹配表在这里一次算好
         tokens = self.lexer.tokenize(text)
         tokens = self.lexer.reject_comments(tokens)
-        return tokens
+        return XLangTokenView(tokens)
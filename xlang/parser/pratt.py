@@ -0,0 +1,565 @@
+from .lexer import XLangTokenType
+from .ast import (
+    Gather,
+    XLangASTNode,
+    XLangASTNodeTypes,
+    _is_body,
+    _unwrap_body,
+    _is_pair,
+    _unwrap_pair,
+    _is_tuple,
+    _unwrap_tuple,
+    _is_let,
+    _is_assign,
+    _is_to,
+    _is_separator,
+    _is_comma,
+    _is_string,
+    _is_number,
+    _is_symbol,
+    _is_identifier,
+    _concat,
+)
+
+# 优先级与 ast.py 中 NodeMatcher 注册的优先级一致，数值越大结合越松
+PRIORITY_TOP = 100
+PRIORITY_SEPARATOR = 70
+PRIORITY_RETURN = 60
+PRIORITY_TUPLE = 59
+PRIORITY_LET = 40
+PRIORITY_ASSIGN = 30
+PRIORITY_NAMED_ARGUMENT = 23
+PRIORITY_KEY_VAL = 22
+PRIORITY_WHILE = 21
+PRIORITY_CONTROL_FLOW = 20
+PRIORITY_IF = 19
+PRIORITY_OR = 14
+PRIORITY_AND = 13
+PRIORITY_NOT = 12
+PRIORITY_COMPARE = 11
+PRIORITY_ADD = 10
+PRIORITY_MUL = 9
+PRIORITY_FUNCTION_DEF = 4
+PRIORITY_MODIFIER = 3
+PRIORITY_MEMBER_ACCESS = 2
+PRIORITY_ATOM = 0
+
+_SYMBOL_PRIORITY = {
+    ";": PRIORITY_SEPARATOR,
+    ",": PRIORITY_TUPLE,
+    "=": PRIORITY_ASSIGN,
+    ">": PRIORITY_COMPARE,
+    "<": PRIORITY_COMPARE,
+    ">=": PRIORITY_COMPARE,
+    "<=": PRIORITY_COMPARE,
+    "==": PRIORITY_COMPARE,
+    "!=": PRIORITY_COMPARE,
+    "+": PRIORITY_ADD,
+    "-": PRIORITY_ADD,
+    "*": PRIORITY_MUL,
+    "/": PRIORITY_MUL,
+    "%": PRIORITY_MUL,
+}
+
+_IDENTIFIER_PRIORITY = {
+    "or": PRIORITY_OR,
+    "and": PRIORITY_AND,
+}
+
+_MODIFIERS = (
+    "copy",
+    "ref",
+    "deref",
+    "keyof",
+    "valueof",
+    "selfof",
+    "assert",
+    "import",
+    "wrap",
+)
+
+
+def _infix_priority(group):
+    # 返回中缀运算符的优先级，不是中缀运算符时返回None
+    if len(group) != 1:
+        return None
+    token = group[0]
+    if token.type == XLangTokenType.TokenType_SYMBOL:
+        return _SYMBOL_PRIORITY.get(token.token)
+    if token.type == XLangTokenType.TokenType_IDENTIFIER:
+        return _IDENTIFIER_PRIORITY.get(token.token)
+    return None
+
+
+def _is_unary(group):
+    return _is_symbol(group, "+") or _is_symbol(group, "-")
+
+
+def _is_access(group):
+    return _is_pair(group) or _is_tuple(group) or _is_symbol(group, ".")
+
+
+class XLangPrattParser:
+    """
+    单遍优先级爬升解析器，输入与 XLangASTParser 相同（Gather 之后的 token list），
+    生成的 XLangASTNode 树与 NodeMatcher 逐个尝试匹配器的结果一致。
+
+    对应关系：
+    - ; , = or and 比较 +- */% 是中缀运算符，按优先级爬升，左结合（= 右结合）
+    - return、xxx :=、xxx =>、xxx :、while、break/continue、if、not、一元 +-、
+      (xxx) -> {xxx}、修饰符是前缀结构，只在区间开头识别，右侧延伸到区间末尾
+    - 前缀结构之后只能接比它结合更松的运算符，这与旧解析器"先按更松的运算符切分"等价
+    - [] () . 是后缀访问，只能跟在原子之后
+    """
+
+    def __init__(self, token_list):
+        self.token_list = token_list
+        self.offset = 0
+
+    def parse(self) -> list:  # 返回一个list，每个元素是一个XLangASTNode
+        ret = []
+        while self.offset < len(self.token_list):
+            node, offset, _ = self.expression(self.offset)
+            if offset < len(self.token_list):
+                self.check_partial(offset)
+            ret.append(node)
+            self.offset = max(offset, self.offset + 1)
+        return ret
+
+    def parse_body(self, start_idx=0) -> XLangASTNode:
+        if len(self.token_list) == 0:
+            return XLangASTNode(
+                XLangASTNodeTypes.SEPARATOR,  # 用于表示没有body的情况，仅仅是一组表达式
+                [XLangASTNode(XLangASTNodeTypes.NULL, None, 0)],
+                0,
+            )
+        return XLangASTNode(
+            XLangASTNodeTypes.SEPARATOR,
+            self.parse(),
+            self.token_list[start_idx][0].position,
+        )
+
+    def parse_without_body(self, start_idx=0) -> XLangASTNode:
+        if len(self.token_list) == 0:
+            return XLangASTNode(
+                XLangASTNodeTypes.SEPARATOR,  # 用于表示没有body的情况，仅仅是一组表达式
+                [XLangASTNode(XLangASTNodeTypes.NULL, None, 0)],
+                0,
+            )
+        return XLangASTNode(
+            XLangASTNodeTypes.SEPARATOR,  # 用于表示没有body的情况，仅仅是一组表达式
+            self.parse(),
+            self.token_list[start_idx][0].position,
+        )
+
+    def parse_unwrapped(self) -> XLangASTNode:
+        # 括号内只取第一个表达式，剩余部分与旧解析器一样被忽略
+        node, offset, _ = self.expression(0)
+        if offset < len(self.token_list):
+            self.check_partial(offset)
+        return node
+
+    def check_partial(self, offset):
+        # 表达式只匹配了一部分时，如果后面还有 ; , = ，旧解析器会先按它们切分，
+        # 当前表达式所在的段不是最后一段，必须完整匹配，因此报错
+        for group in self.token_list[offset:]:
+            if _is_separator(group):
+                raise Exception(
+                    "Invalid separator: Left side can't be fully matched: ",
+                    self.token_list[:offset],
+                )
+            if _is_comma(group):
+                raise Exception(
+                    "Invalid tuple: Left side can't be fully matched: ",
+                    self.token_list[:offset],
+                )
+            if _is_assign(group):
+                raise Exception(
+                    "Invalid assign: Left side can't be fully matched: ",
+                    self.token_list[:offset],
+                )
+
+    def position(self, idx):
+        return self.token_list[idx][0].position
+
+    def available(self, idx, priority, bound):
+        # idx 处的 token 是否仍属于优先级为 priority 的前缀结构所在的区间
+        if idx >= len(self.token_list):
+            return False
+        infix = _infix_priority(self.token_list[idx])
+        return infix is None or (infix <= priority and infix < bound)
+
+    def single(self, idx) -> XLangASTNode:
+        # 单独解析一个 token 组，相当于 node_matcher.match([token_list[idx]], 0)
+        node, _, _ = XLangPrattParser([self.token_list[idx]]).expression(0)
+        return node
+
+    def expression(self, start, bound=PRIORITY_TOP):
+        """
+        从 start 开始解析一个表达式，遇到优先级不小于 bound 的中缀运算符时停止
+        返回 (节点, 结束位置, 节点所处的优先级)
+        """
+        node, offset, level = self.prefix(start, bound)
+        return self.infix(start, node, offset, level, bound)
+
+    def prefix(self, start, bound):
+        token_list = self.token_list
+        if start >= len(token_list):
+            return XLangASTNode(XLangASTNodeTypes.NONE, None), start, PRIORITY_ATOM
+        group = token_list[start]
+
+        # 区间以中缀运算符开头时左侧为空
+        if _infix_priority(group) is not None and not _is_unary(group):
+            return XLangASTNode(XLangASTNodeTypes.NONE, None), start, PRIORITY_ATOM
+
+        # return xxx
+        if _is_identifier(group, "return") and self.available(
+            start + 1, PRIORITY_RETURN, bound
+        ):
+            right, offset, _ = self.expression(
+                start + 1, min(bound, PRIORITY_RETURN)
+            )
+            return (
+                XLangASTNode(XLangASTNodeTypes.RETURN, right, self.position(start)),
+                offset,
+                PRIORITY_RETURN,
+            )
+
+        # xxx := xxx, xxx => xxx, xxx: xxx
+        if start + 1 < len(token_list):
+            node_type = None
+            if _is_let(token_list[start + 1]):
+                node_type, priority = XLangASTNodeTypes.LET, PRIORITY_LET
+            elif _is_symbol(token_list[start + 1], "=>"):
+                node_type, priority = (
+                    XLangASTNodeTypes.NAMED_ARGUMENT,
+                    PRIORITY_NAMED_ARGUMENT,
+                )
+            elif _is_symbol(token_list[start + 1], ":"):
+                node_type, priority = XLangASTNodeTypes.KEY_VAL, PRIORITY_KEY_VAL
+            # := => : 之后的 + - 总是一元运算符
+            if node_type is not None and (
+                self.available(start + 2, priority, bound)
+                or (start + 2 < len(token_list) and _is_unary(token_list[start + 2]))
+            ):
+                left = self.single(start)
+                if node_type == XLangASTNodeTypes.LET and left.node_type not in (
+                    XLangASTNodeTypes.VARIABLE,
+                    XLangASTNodeTypes.STRING,
+                ):
+                    raise Exception(
+                        "Invalid let: Left side must be a variable or a string: ",
+                        [group],
+                    )
+                if (
+                    node_type == XLangASTNodeTypes.NAMED_ARGUMENT
+                    and left.node_type == XLangASTNodeTypes.VARIABLE
+                ):
+                    left.node_type = XLangASTNodeTypes.STRING  # 将变量名转换为字符串
+                right, offset, _ = self.expression(start + 2, min(bound, priority))
+                return (
+                    XLangASTNode(node_type, [left, right], self.position(start)),
+                    offset,
+                    priority,
+                )
+
+        # while xxx xxx
+        if (
+            _is_identifier(group, "while")
+            and self.available(start + 1, PRIORITY_WHILE, bound)
+            and self.available(start + 2, PRIORITY_WHILE, bound)
+        ):
+            condition = self.single(start + 1)
+            body, offset, _ = self.expression(start + 2, min(bound, PRIORITY_WHILE))
+            return (
+                XLangASTNode(
+                    XLangASTNodeTypes.WHILE, [condition, body], self.position(start)
+                ),
+                offset,
+                PRIORITY_WHILE,
+            )
+
+        # break xxx, continue xxx
+        if _is_identifier(group, "break") or _is_identifier(group, "continue"):
+            right, offset, _ = self.expression(
+                start + 1, min(bound, PRIORITY_CONTROL_FLOW)
+            )
+            if offset < len(token_list):
+                infix = _infix_priority(token_list[offset])
+                if infix is None or (
+                    infix <= PRIORITY_CONTROL_FLOW and infix < bound
+                ):
+                    raise Exception(
+                        "Invalid break: Right side can't be fully matched: ",
+                        token_list[start + 1 :],
+                    )
+            node_type = (
+                XLangASTNodeTypes.BREAK
+                if group[0].token == "break"
+                else XLangASTNodeTypes.CONTINUE
+            )
+            return (
+                XLangASTNode(node_type, right, self.position(start)),
+                offset,
+                PRIORITY_CONTROL_FLOW,
+            )
+
+        # if xxx xxx else xxx
+        if (
+            _is_identifier(group, "if")
+            and self.available(start + 1, PRIORITY_IF, bound)
+            and self.available(start + 2, PRIORITY_IF, bound)
+        ):
+            condition = self.single(start + 1)
+            true_condition = self.single(start + 2)
+            if start + 3 < len(token_list) and _is_identifier(
+                token_list[start + 3], "else"
+            ):
+                false_node, offset, _ = self.expression(
+                    start + 4, min(bound, PRIORITY_IF)
+                )
+                return (
+                    XLangASTNode(
+                        XLangASTNodeTypes.IF,
+                        [condition, true_condition, false_node],
+                        self.position(start),
+                    ),
+                    offset,
+                    PRIORITY_IF,
+                )
+            return (
+                XLangASTNode(
+                    XLangASTNodeTypes.IF,
+                    [condition, true_condition],
+                    self.position(start),
+                ),
+                start + 3,
+                PRIORITY_IF,
+            )
+
+        # not xxx
+        if _is_identifier(group, "not"):
+            right, offset, _ = self.expression(start + 1, min(bound, PRIORITY_NOT))
+            return (
+                XLangASTNode(XLangASTNodeTypes.OPERATION, ["not", right]),
+                offset,
+                PRIORITY_NOT,
+            )
+
+        # 一元运算符 +x, -x
+        if _is_unary(group):
+            right, offset, _ = self.expression(start + 1, min(bound, PRIORITY_ADD))
+            return (
+                XLangASTNode(
+                    XLangASTNodeTypes.OPERATION,
+                    [group[0].token, right],
+                    self.position(start),
+                ),
+                offset,
+                PRIORITY_ATOM,
+            )
+
+        # (xxx) -> {xxx}
+        if (
+            _is_tuple(group)
+            and start + 1 < len(token_list)
+            and _is_to(token_list[start + 1])
+            and self.available(start + 2, PRIORITY_FUNCTION_DEF, bound)
+        ):
+            left = self.single(start)
+            right = XLangPrattParser([token_list[start + 2]]).parse_body(start_idx=0)
+            return (
+                XLangASTNode(
+                    XLangASTNodeTypes.FUNCTION_DEF, [left, right], self.position(start)
+                ),
+                start + 3,
+                PRIORITY_FUNCTION_DEF,
+            )
+
+        # modifier xxx
+        if (
+            len(group) == 1
+            and group[0].token in _MODIFIERS
+            and self.available(start + 1, PRIORITY_MODIFIER, bound)
+        ):
+            right, offset, _ = self.expression(
+                start + 1, min(bound, PRIORITY_MODIFIER)
+            )
+            return (
+                XLangASTNode(XLangASTNodeTypes.MODIFY, [group[0].token, right]),
+                offset,
+                PRIORITY_MODIFIER,
+            )
+
+        return self.postfix(start)
+
+    def postfix(self, start):
+        """匹配原子以及其后的成员访问"""
+        atom = self.atom(self.token_list[start])
+        node, offset = self.access(start, atom, start + 1)
+        if node is None:
+            return atom, start + 1, PRIORITY_MEMBER_ACCESS
+        return node, offset, PRIORITY_MEMBER_ACCESS
+
+    def access(self, start, node, offset):
+        """
+        从 offset 开始向 node 追加成员访问：xxx[xxx] 和 xxx.xxx 和 xxx(xxx)
+        旧解析器在无法完整匹配时整体回退，这种情况返回 (None, offset)
+        """
+        token_list = self.token_list
+        while offset < len(token_list):
+            group = token_list[offset]
+            if _is_pair(group):
+                # 处理索引访问，索引必须完整匹配
+                index_parser = XLangPrattParser(Gather(_unwrap_pair(group)).gather())
+                index_node, index_offset, _ = index_parser.expression(0)
+                if index_offset < len(index_parser.token_list):
+                    index_parser.check_partial(index_offset)
+                    return None, offset
+                node = XLangASTNode(
+                    XLangASTNodeTypes.INDEX_OF,
+                    [node, index_node],
+                    self.position(start),
+                )
+                offset += 1
+            elif _is_tuple(group):
+                # 处理函数调用
+                args_node = self.single(offset)
+                if args_node.node_type != XLangASTNodeTypes.TUPLE:
+                    args_node = XLangASTNode(
+                        XLangASTNodeTypes.TUPLE,
+                        [args_node],
+                        self.position(start),
+                    )
+                node = XLangASTNode(
+                    XLangASTNodeTypes.FUNCTION_CALL,
+                    [node, args_node],
+                    self.position(start),
+                )
+                offset += 1
+            elif _is_symbol(group, "."):
+                # 处理属性访问
+                if offset + 1 >= len(token_list):
+                    return None, offset
+                right_node = self.single(offset + 1)
+                # 成员名只能是单个标识符，(b) 与 [b] 虽然解析为变量，旧解析器也不接受
+                if (
+                    len(token_list[offset + 1]) != 1
+                    or right_node.node_type != XLangASTNodeTypes.VARIABLE
+                    or (
+                        offset + 2 < len(token_list)
+                        and (
+                            _is_let(token_list[offset + 2])
+                            or _is_symbol(token_list[offset + 2], "=>")
+                            or _is_symbol(token_list[offset + 2], ":")
+                        )
+                    )
+                ):
+                    raise Exception(
+                        "Invalid attribute: Right side must be a variable: ",
+                        token_list[offset + 1 :],
+                    )
+                attr_name = XLangASTNode(
+                    XLangASTNodeTypes.STRING,
+                    right_node.children,
+                    self.position(start),
+                )
+                node = XLangASTNode(
+                    XLangASTNodeTypes.GET_ATTR,
+                    [node, attr_name],
+                    self.position(start),
+                )
+                offset += 2
+            else:
+                break
+        if offset < len(token_list) and _infix_priority(token_list[offset]) is None:
+            # 旧解析器以区间内最后一个成员访问为准，它之前的部分必须完整匹配，
+            # 所以后面还有成员访问时整体回退
+            for group in token_list[offset:]:
+                if _is_separator(group) or _is_comma(group) or _is_assign(group):
+                    break
+                if _is_access(group):
+                    return None, offset
+        return node, offset
+
+    def atom(self, group) -> XLangASTNode:
+        # 匹配变量、字面量和括号
+        if _is_tuple(group) or _is_pair(group):
+            unwarped = _unwrap_tuple(group)
+            if len(unwarped) == 0:
+                return XLangASTNode(
+                    XLangASTNodeTypes.TUPLE, [], group[0].position
+                )
+            return XLangPrattParser(Gather(unwarped).gather()).parse_unwrapped()
+        if _is_body(group):
+            return XLangASTNode(
+                XLangASTNodeTypes.BODY,
+                XLangPrattParser(Gather(_unwrap_body(group)).gather()).parse(),
+                group[0].position,
+            )
+        if _is_string(group):
+            return XLangASTNode(
+                XLangASTNodeTypes.STRING, _concat(group), group[0].position
+            )
+        if _is_number(group):
+            return XLangASTNode(
+                XLangASTNodeTypes.NUMBER, _concat(group), group[0].position
+            )
+        if _is_identifier(group, "true"):
+            return XLangASTNode(XLangASTNodeTypes.BOOLEN, True, group[0].position)
+        if _is_identifier(group, "false"):
+            return XLangASTNode(
+                XLangASTNodeTypes.BOOLEN, False, group[0].position
+            )
+        if _is_identifier(group, "null"):
+            return XLangASTNode(XLangASTNodeTypes.NULL, None, group[0].position)
+        return XLangASTNode(
+            XLangASTNodeTypes.VARIABLE, _concat(group), group[0].position
+        )
+
+    def infix(self, start, node, offset, level, bound):
+        token_list = self.token_list
+        while offset < len(token_list):
+            group = token_list[offset]
+            priority = _infix_priority(group)
+            if priority is None and level == PRIORITY_ATOM and _is_access(group):
+                # 运算的右侧被前缀结构截断时，旧解析器回退为对整个左侧做成员访问
+                accessed, accessed_offset = self.access(start, node, offset)
+                if accessed is None:
+                    break
+                node, offset = accessed, accessed_offset
+                level = PRIORITY_MEMBER_ACCESS
+                continue
+            if priority is None or priority < level or priority >= bound:
+                break
+            if priority == PRIORITY_SEPARATOR or priority == PRIORITY_TUPLE:
+                # ; 和 , 把区间切成多段，最后一段允许只匹配一部分
+                children = [node]
+                while (
+                    offset < len(token_list)
+                    and _infix_priority(token_list[offset]) == priority
+                ):
+                    child, offset, _ = self.expression(offset + 1, priority)
+                    children.append(child)
+                node = XLangASTNode(
+                    XLangASTNodeTypes.SEPARATOR
+                    if priority == PRIORITY_SEPARATOR
+                    else XLangASTNodeTypes.TUPLE,
+                    children,
+                    self.position(start),
+                )
+                level = priority
+            elif priority == PRIORITY_ASSIGN:
+                # = 右结合，右侧允许只匹配一部分
+                right, offset, _ = self.expression(offset + 1, PRIORITY_ASSIGN + 1)
+                node = XLangASTNode(
+                    XLangASTNodeTypes.ASSIGN, [node, right], self.position(start)
+                )
+                level = PRIORITY_ASSIGN
+            else:
+                right, offset, _ = self.expression(offset + 1, priority)
+                node = XLangASTNode(
+                    XLangASTNodeTypes.OPERATION, [node, group[0].token, right]
+                )
+                level = PRIORITY_ATOM
+        return node, offset, level
@@ -70,9 +70,9 @@ class XLangCompleter(Completer):
         items = {}  # 使用字典存储变量名和对应的说明
 
         # 从所有帧中收集变量名及其值
-        for frame, is_func, _, hidden in self.context.frames:
-            if not hidden and isinstance(frame, dict):
-                for var_name, var_value in frame.items():
+        for frame in self.context.frames:
+            if not frame.hidden:
+                for var_name, var_value in frame.variables.items():
                     # 只添加新变量或更新较新帧中的变量
                     if var_name not in items:
                         description = self._get_description(var_value)
@@ -154,6 +154,17 @@ def multiline_input(session, prompt=">>> ", continuation_prompt="... "):
     return "\n".join(lines)
 
 
+def print_instruction_counts(xlang, code, ir, optimization_level):
+    # 输出到 stderr，保证 stdout 上的 IR 仍然是合法的 JSON
+    before = xlang.compile(code, optimization_level=0).instruction_count()
+    after = ir.instruction_count()
+    print(
+        f"Instructions: {before} before optimization, {after} after "
+        f"(optimization level {optimization_level})",
+        file=sys.stderr,
+    )
+
+
 def main():
     """X Lang command line tool entry point"""
     parser = argparse.ArgumentParser(
@@ -171,9 +182,22 @@ def main():
     parser.add_argument(
         "--ast", action="store_true", help="Output abstract syntax tree"
     )
+    parser.add_argument(
+        "--legacy-parser",
+        action="store_true",
+        help="Use the legacy parser for --ast (for comparing syntax trees)",
+    )
     parser.add_argument(
         "--ir", action="store_true", help="Output intermediate representation"
     )
+    parser.add_argument(
+        "-O",
+        "--optimization-level",
+        type=int,
+        default=2,
+        help="IR optimization level (0 disables optimization, "
+        "3 also inlines small functions, default 2)",
+    )
     parser.add_argument("--time", action="store_true", help="Show execution time")
 
     args = parser.parse_args()
@@ -191,13 +215,20 @@ def main():
             start_time = time.time()
 
             if args.ast:
-                ast = xlang.parse(args.code)
+                ast = xlang.parse(args.code, legacy=args.legacy_parser)
                 print(json.dumps(ast.to_dict(), ensure_ascii=False))
             elif args.ir:
-                ir = xlang.compile(args.code)
+                ir = xlang.compile(
+                    args.code, optimization_level=args.optimization_level
+                )
                 print(json.dumps(ir.export_to_dict(), ensure_ascii=False))
+                print_instruction_counts(
+                    xlang, args.code, ir, args.optimization_level
+                )
             else:
-                result = xlang.execute(args.code)
+                result = xlang.execute(
+                    args.code, optimization_level=args.optimization_level
+                )
                 if result is not None:
                     print(result)
 
@@ -219,7 +250,7 @@ def main():
 
             # If output file is specified, compile to .xir
             if args.output:
-                ir = xlang.compile(code)
+                ir = xlang.compile(code, optimization_level=args.optimization_level)
                 # Ensure output directory exists
                 output_dir = os.path.dirname(os.path.abspath(args.output))
                 if output_dir:
@@ -229,14 +260,15 @@ def main():
                     out_file.write(json.dumps(ir.export_to_dict(), ensure_ascii=False))
                 print(f"Compiled to: {args.output}")
             elif args.ast:
-                ast = xlang.parse(code)
+                ast = xlang.parse(code, legacy=args.legacy_parser)
                 print(json.dumps(ast.to_dict(), ensure_ascii=False))
             elif args.ir:
-                ir = xlang.compile(code)
+                ir = xlang.compile(code, optimization_level=args.optimization_level)
                 print(json.dumps(ir.export_to_dict(), ensure_ascii=False))
+                print_instruction_counts(xlang, code, ir, args.optimization_level)
             else:
                 # Direct execution
-                result = xlang.execute(code)
+                result = xlang.execute(code, optimization_level=args.optimization_level)
                 if result is not None:
                     print(result)
 
@@ -306,7 +338,7 @@ def main():
                         current_frame = context.frames[-1]
                         if current_frame:
                             print("Variables in current scope:")
-                            for var_name, var_value in current_frame[0].items():
+                            for var_name, var_value in current_frame.variables.items():
                                 print(f"  {var_name} = {var_value}")
                         else:
                             print("No variables in current scope")
@@ -315,7 +347,10 @@ def main():
                     # 执行代码
                     start_time = time.time()
                     result = interpreter.execute_with_context(
-                        user_input, context, stack
+                        user_input,
+                        context,
+                        stack,
+                        optimization_level=args.optimization_level,
                     )
 
                     # 更新补全器的上下文
@@ -23,6 +23,10 @@ class XLang:
             return None
         elif isinstance(x_value, Tuple):
             return [self.x_to_python(v) for v in x_value.value]
+        elif isinstance(x_value, Map):
+            return {
+                self.x_to_python(k): self.x_to_python(v) for k, v in x_value.items()
+            }
         elif isinstance(x_value, Variable):
             return self.x_to_python(x_value.value)
         elif isinstance(x_value, KeyValue):
@@ -41,7 +45,7 @@ class XLang:
 
     def python_to_x(self, py_value):
         """将Python值转换为X语言值"""
-        from xlang.ir.variable import Int, Float, Bool, String, Tuple, KeyValue, NoneType
+        from xlang.ir.variable import Int, Float, Bool, String, Tuple, Map, NoneType
 
         if isinstance(py_value, int):
             return Int(py_value)
@@ -56,18 +60,27 @@ class XLang:
         elif isinstance(py_value, list):
             return Tuple([self.python_to_x(v) for v in py_value])
         elif isinstance(py_value, dict):
-            values = [
-                KeyValue(self.python_to_x(k), self.python_to_x(v))
-                for k, v in py_value.items()
-            ]
-            return Tuple(values)
+            result = Map()
+            for k, v in py_value.items():
+                result.set_member(self.python_to_x(k), self.python_to_x(v))
+            return result
         raise TypeError(f"Cant convert Python type: {type(py_value)}")
 
-    def compile(self, code, namespace="__MAIN__"):
-        """编译X语言代码并返回IR"""
+    def compile(
+        self, code, namespace="__MAIN__", optimization_level=2, inline_threshold=24
+    ):
+        """
+        编译X语言代码并返回IR，optimization_level 为 0 时不做优化，
+        为 3 时内联函数体不超过 inline_threshold 条指令的函数
+        """
         ast = build_ast(code)
         functions = Functions()
-        generator = IRGenerator(functions=functions, namespace=namespace)
+        generator = IRGenerator(
+            functions=functions,
+            namespace=namespace,
+            optimization_level=optimization_level,
+            inline_threshold=inline_threshold,
+        )
         IRs = generator.generate(ast)
         IRs.append(IR(IRType.RETURN_NONE))
         functions.add("__main__", IRs)
@@ -82,16 +95,23 @@ class XLang:
         input_reader=input,
         open_func=open,
         should_stop_func=None,
+        optimization_level=2,
+        inline_threshold=24,
+        adaptive=True,
         **kwargs,
     ):
-        """执行X语言代码并返回结果"""
+        """执行X语言代码并返回结果，adaptive 为 True 时在运行中按操作数类型特化指令"""
         ast = build_ast(code)
         functions = Functions()
-        generator = IRGenerator(functions=functions)
+        generator = IRGenerator(
+            functions=functions,
+            optimization_level=optimization_level,
+            inline_threshold=inline_threshold,
+        )
         IRs = generator.generate(ast)
         IRs.append(IR(IRType.RETURN_NONE))
         functions.add("__main__", IRs)
-        executor = IRExecutor(code, error_printer, output_printer, input_reader, should_stop_func, open_func)
+        executor = IRExecutor(code, error_printer, output_printer, input_reader, should_stop_func, open_func, adaptive)
         executor_args = {}
         for k, v in kwargs.items():
             executor_args[k] = self.python_to_x(v)
@@ -109,20 +129,27 @@ class XLang:
         input_reader=input,
         open_func=open,
         should_stop_func=None,
+        optimization_level=2,
+        inline_threshold=24,
+        adaptive=True,
     ):
         """使用给定的上下文和堆栈执行X语言代码"""
         ast = build_ast(code)
         functions = Functions()
-        generator = IRGenerator(functions=functions)
+        generator = IRGenerator(
+            functions=functions,
+            optimization_level=optimization_level,
+            inline_threshold=inline_threshold,
+        )
         IRs = generator.generate(ast)
         functions.add("__main__", IRs)
-        executor = IRExecutor(code, error_printer, output_printer, input_reader, should_stop_func, open_func)
+        executor = IRExecutor(code, error_printer, output_printer, input_reader, should_stop_func, open_func, adaptive)
         result = executor.execute_with_provided_context(functions, entry, context, stack)
         return result
 
     def create_builtins_for_context(self, context, output_printer=print, input_reader=input):
         create_builtins(context, output_printer, input_reader)
 
-    def parse(self, code):
-        """解析X语言代码并返回AST"""
-        return build_ast(code)
+    def parse(self, code, legacy=False):
+        """解析X语言代码并返回AST，legacy=True 时使用旧解析器"""
+        return build_ast(code, legacy=legacy)